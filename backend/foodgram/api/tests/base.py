@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import Follow
+
+User = get_user_model()
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests',
+    },
+    'metrics': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests-metrics',
+    },
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class APITestCase(TestCase):
+    """Общие данные тестов API: пользователи, тэги, ингридиенты
+    и рецепты; кеши в памяти очищаются перед каждым тестом."""
+
+    @classmethod
+    def create_user(cls, username: str):
+        return User.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            password='password', first_name=username, last_name=username,
+        )
+
+    @classmethod
+    def create_recipe(cls, author, number: int, tags, ingredients):
+        recipe = Recipe.objects.create(
+            author=author, name=f'Рецепт {number}', text='Описание',
+            cooking_time=number % 50 + 1,
+        )
+        recipe.tags.set(tags)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                             amount=number + position + 1)
+            for position, ingredient in enumerate(ingredients)
+        )
+        return recipe
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('reader')
+        cls.authors = [cls.create_user(f'author{i}') for i in range(4)]
+        cls.tags = [
+            Tag.objects.create(name=slug, color='#E26C2D', slug=slug)
+            for slug in ('breakfast', 'lunch', 'dinner')
+        ]
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('соль', 'сахар', 'морская соль', 'мука', 'масло')
+        )
+        cls.recipes = [
+            cls.create_recipe(
+                cls.authors[number % len(cls.authors)], number,
+                cls.tags[number % 3:number % 3 + 2],
+                cls.ingredients[number % 3:number % 3 + 3],
+            )
+            for number in range(12)
+        ]
+        for recipe in cls.recipes[::3]:
+            recipe.favorited.add(cls.user)
+            recipe.in_shopping_cart.add(cls.user)
+        for author in cls.authors:
+            Follow.objects.create(follower=cls.user, author=author)
+
+    def setUp(self):
+        for alias in caches:
+            caches[alias].clear()
+        self.client = APIClient()
+        self.auth_client = APIClient()
+        self.auth_client.force_authenticate(self.user)
@@ -0,0 +1,54 @@
+import shutil
+import tempfile
+
+from unittest import mock
+
+from django.test import override_settings
+
+from api.tests.base import APITestCase
+from core import benchmark
+from recipes.models import Recipe
+
+
+class BenchmarkRunTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def test_create_scenario_succeeds(self):
+        recipes = Recipe.objects.count()
+        context = benchmark.BenchmarkContext(self.user, seed=0)
+        with self.assertNumQueries(0):
+            call = benchmark.SCENARIOS['recipes-create'][1](context)
+        self.assertTrue(call[2]['image'].startswith('data:image/jpeg'))
+        result = benchmark.run(
+            self.user, ['recipes-retrieve', 'recipes-create'],
+            iterations=3, warmup=1, seed=0,
+        )
+        self.assertEqual(result['meta']['failed'], [])
+        created = result['scenarios']['recipes-create']
+        self.assertEqual(created['statuses'], {'201': 3})
+        self.assertEqual(created['error_rate'], 0)
+        self.assertEqual(Recipe.objects.count(), recipes)
+
+    def test_errors_flag_scenario(self):
+        missing = (True, lambda context: ('get', '/api/recipes/0/', None))
+        with mock.patch.dict(
+            benchmark.SCENARIOS, {'recipes-retrieve': missing}
+        ):
+            result = benchmark.run(
+                self.user, ['recipes-retrieve'],
+                iterations=2, warmup=0, seed=0,
+            )
+        scenario = result['scenarios']['recipes-retrieve']
+        self.assertEqual(scenario['error_rate'], 1)
+        self.assertTrue(scenario['failed'])
+        self.assertEqual(result['meta']['failed'], ['recipes-retrieve'])
+        lines, regressed = benchmark.compare(result, result, 0.2)
+        self.assertTrue(regressed)
+        self.assertIn('замер недействителен', lines[0])
@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from api.tests.base import APITestCase
+from recipes import counters
+from recipes.models import Recipe
+from users.models import Follow
+
+
+class CounterTests(APITestCase):
+    """Счётчики, обновляемые сигналами, совпадают с фактическими
+    после каждого изменения отметок, подписок и рецептов."""
+
+    def assert_no_drift(self):
+        for counter in counters.COUNTERS:
+            with self.subTest(counter=counter.field):
+                self.assertEqual(counters.recount(counter, dry_run=True), 0)
+
+    def test_fixture_counters(self):
+        self.assert_no_drift()
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(recipe.carts_count, 1)
+
+    def test_marks_from_recipe_side(self):
+        recipe = self.recipes[1]
+        others = [self.user, *self.authors[:2]]
+        recipe.favorited.add(*others)
+        recipe.in_shopping_cart.add(*others)
+        self.assert_no_drift()
+        recipe.favorited.remove(self.authors[0])
+        self.assert_no_drift()
+        recipe.favorited.clear()
+        recipe.in_shopping_cart.clear()
+        self.assert_no_drift()
+        recipe.refresh_from_db()
+        self.assertEqual(
+            (recipe.favorites_count, recipe.carts_count), (0, 0)
+        )
+
+    def test_marks_from_user_side(self):
+        self.user.favorited_recipes.add(*self.recipes[1:4])
+        self.user.in_cart_recipes.add(*self.recipes[1:4])
+        self.assert_no_drift()
+        self.user.favorited_recipes.remove(self.recipes[0])
+        self.assert_no_drift()
+        self.user.favorited_recipes.clear()
+        self.user.in_cart_recipes.clear()
+        self.assert_no_drift()
+        self.assertFalse(
+            Recipe.objects.filter(favorites_count__gt=0).exists()
+        )
+
+    def test_follow_create_delete(self):
+        author = self.authors[0]
+        for follower in self.authors[1:]:
+            Follow.objects.create(follower=follower, author=author)
+        self.assert_no_drift()
+        author.refresh_from_db()
+        self.assertEqual(author.followers_count, 4)
+        Follow.objects.get(follower=self.user, author=author).delete()
+        self.assert_no_drift()
+        author.refresh_from_db()
+        self.assertEqual(author.followers_count, 3)
+
+    def test_recipe_create_delete(self):
+        author = self.authors[0]
+        recipe = self.create_recipe(
+            author, 100, self.tags[:1], self.ingredients[:1]
+        )
+        self.assert_no_drift()
+        recipe.favorited.add(self.user)
+        recipe.delete()
+        self.assert_no_drift()
+
+    def test_recount_fixes_bulk_changes(self):
+        """bulk_create и QuerySet.delete обходят сигналы;
+        команда пересчёта возвращает счётчики к фактическим."""
+
+        counters.Favorited.objects.bulk_create(
+            counters.Favorited(foodgramuser=author, recipe=self.recipes[1])
+            for author in self.authors
+        )
+        Follow.objects.filter(author=self.authors[0]).delete()
+        self.assertGreater(counters.recount(counters.FAVORITES,
+                                            dry_run=True), 0)
+        call_command('recount_counters', stdout=StringIO())
+        self.assert_no_drift()
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipes[1].pk).favorites_count, 4
+        )
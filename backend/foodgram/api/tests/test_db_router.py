@@ -0,0 +1,108 @@
+from unittest import mock
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.tests.base import APITestCase
+from core import db_router
+from recipes.models import Recipe, Tag
+
+REPLICA = 'replica_1'
+
+
+class ReplicaRoutingTests(APITestCase):
+    """Реплика - второй псевдоним подключения к той же тестовой
+    базе, поэтому видны и данные, и выбор роутера."""
+
+    def setUp(self):
+        super().setUp()
+        connections[REPLICA] = connections[DEFAULT_DB_ALIAS]
+        self.addCleanup(delattr, connections._connections, REPLICA)
+        replicas = mock.patch.dict(
+            settings.DB_REPLICA_SETTINGS, REPLICAS=[REPLICA]
+        )
+        replicas.start()
+        self.addCleanup(replicas.stop)
+        self.reads = []
+        router = db_router.ReplicaRouter
+        original = router.db_for_read
+
+        def recording(router, model, **hints):
+            alias = original(router, model, **hints)
+            self.reads.append((model, alias or DEFAULT_DB_ALIAS))
+            return alias
+
+        spy = mock.patch.object(router, 'db_for_read', recording)
+        spy.start()
+        self.addCleanup(spy.stop)
+        self.token = Token.objects.create(user=self.user)
+
+    def _client(self, token=None) -> APIClient:
+        client = APIClient()
+        if token is not None:
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def _aliases(self, model) -> set:
+        return {alias for read, alias in self.reads if read is model}
+
+    def _page_alias(self) -> str:
+        """База запроса страницы - первого чтения рецептов
+        (недостающие карточки собираются с основной базы)."""
+
+        return next(alias for read, alias in self.reads if read is Recipe)
+
+    def test_reads_go_to_replica(self):
+        response = self.client.get('/api/recipes/', {'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._page_alias(), REPLICA)
+
+    def test_writes_go_to_primary(self):
+        response = self._client(self.token).post('/api/recipes/', {
+            'name': 'Новый', 'text': 'Описание', 'cooking_time': 5,
+            'tags': [self.tags[0].pk], 'image': None,
+            'ingredients': [{'id': self.ingredients[0].pk, 'amount': 3}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self._aliases(Tag), {DEFAULT_DB_ALIAS})
+        self.assertEqual(
+            Recipe.objects.get(name='Новый').author_id, self.user.pk
+        )
+
+    def test_use_primary(self):
+        routing = db_router.RequestRouting(request=None)
+        routing._replica = REPLICA
+        token = db_router._routing.set(routing)
+        self.addCleanup(db_router._routing.reset, token)
+        self.assertEqual(Recipe.objects.all().db, REPLICA)
+        with db_router.use_primary():
+            self.assertEqual(Recipe.objects.all().db, DEFAULT_DB_ALIAS)
+        self.assertEqual(Recipe.objects.all().db, REPLICA)
+
+    def test_read_after_write_in_request(self):
+        routing = db_router.RequestRouting(request=None)
+        routing._replica = REPLICA
+        token = db_router._routing.set(routing)
+        self.addCleanup(db_router._routing.reset, token)
+        self.assertEqual(Recipe.objects.all().db, REPLICA)
+        Recipe.objects.filter(pk=self.recipes[0].pk).update(name='Другое')
+        self.assertEqual(Recipe.objects.all().db, DEFAULT_DB_ALIAS)
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipes[0].pk).name, 'Другое'
+        )
+
+    def test_client_pinned_after_write(self):
+        writer = self._client(self.token)
+        response = writer.post(
+            f'/api/recipes/{self.recipes[1].pk}/favorite/'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.reads.clear()
+        writer.get('/api/recipes/', {'limit': 3})
+        self.assertEqual(self._aliases(Recipe), {DEFAULT_DB_ALIAS})
+        self.reads.clear()
+        other = self._client(Token.objects.create(user=self.authors[0]))
+        other.get('/api/recipes/', {'limit': 3})
+        self.assertEqual(self._page_alias(), REPLICA)
@@ -0,0 +1,68 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.tests.base import APITestCase
+from core import tasks
+from recipes import feed
+from recipes.models import FeedEntry, Recipe
+
+
+def run_queued_tasks() -> None:
+    for job in tasks.claim(100):
+        tasks.execute(job)
+
+
+@mock.patch.dict(settings.TASK_SETTINGS, ENABLED=True)
+class FeedTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.follower = self.create_user('follower')
+        self.follower_client = APIClient()
+        self.follower_client.force_authenticate(self.follower)
+        self.author = self.authors[0]
+
+    def _subscribe(self, method: str) -> None:
+        response = getattr(self.follower_client, method)(
+            f'/api/users/{self.author.pk}/subscribe/'
+        )
+        self.assertLess(response.status_code, 300)
+
+    def _feed_authors(self) -> set:
+        return set(FeedEntry.objects.filter(
+            user=self.follower
+        ).values_list('author_id', flat=True))
+
+    def test_backfill_after_follow(self):
+        self._subscribe('post')
+        run_queued_tasks()
+        self.assertEqual(self._feed_authors(), {self.author.pk})
+
+    def test_backfill_after_unfollow_does_nothing(self):
+        self._subscribe('post')
+        self._subscribe('delete')
+        run_queued_tasks()
+        self.assertEqual(self._feed_authors(), set())
+
+    def test_pull_keeps_recipes_committed_after_mark(self):
+        self._subscribe('post')
+        run_queued_tasks()
+        with mock.patch.dict(feed.feed_conf, FANOUT_LIMIT=0):
+            self.follower_client.get('/api/recipes/feed/')
+            # Запись начата до отметки подгрузки, зафиксирована после.
+            recipe = self.create_recipe(
+                self.author, 100, self.tags[:1], self.ingredients[:1]
+            )
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=timezone.now() - timedelta(seconds=5)
+            )
+            response = self.follower_client.get(
+                '/api/recipes/feed/', {'limit': 50}
+            )
+        self.assertIn(
+            recipe.pk, [item['id'] for item in response.json()['results']]
+        )
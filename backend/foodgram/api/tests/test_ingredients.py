@@ -0,0 +1,75 @@
+from api.tests.base import APITestCase
+from core.filters import search_ingredients
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+
+class IngredientSearchTests(APITestCase):
+
+    def test_search_ranks_prefix_first(self):
+        response = self.client.get('/api/ingredients/', {'name': 'сол'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['name'] for item in response.json()],
+            ['соль', 'морская соль'],
+        )
+
+    def test_retrieve_ignores_search(self):
+        ingredient = self.ingredients[1]
+        response = self.client.get(
+            f'/api/ingredients/{ingredient.pk}/', {'name': 'x'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], ingredient.name)
+
+    def test_database_search_supports_get(self):
+        found = search_ingredients(Ingredient.objects.all(), 'СОЛ')
+        self.assertEqual(
+            [ingredient.name for ingredient in found],
+            ['соль', 'морская соль'],
+        )
+        self.assertEqual(
+            found.get(pk=self.ingredients[2].pk).name, 'морская соль'
+        )
+
+
+class IngredientIndexOrderTests(APITestCase):
+    """Индекс в памяти и запрос к базе возвращают результаты
+    поиска в одном порядке."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in (
+                ('Sugar', 'г'), ('salt', 'г'), ('Sea salt', 'г'),
+                ('salt', 'кг'), ('Basalt', 'г'), ('sal', 'г'),
+                ('SALTY snack', 'шт'),
+            )
+        )
+
+    def setUp(self):
+        super().setUp()
+        ingredient_index.invalidate()
+
+    def test_same_order(self):
+        for query in ('s', 'sal', 'salt', 'SALT', 'a', 'соль', 'x'):
+            with self.subTest(query=query):
+                from_db = [
+                    (ingredient.pk, ingredient.name)
+                    for ingredient in search_ingredients(
+                        Ingredient.objects.all(), query
+                    )
+                ]
+                from_index = [
+                    (item['id'], item['name'])
+                    for item in ingredient_index.search(query)
+                ]
+                self.assertEqual(from_index, from_db)
+
+    def test_case_insensitive_name_order(self):
+        names = [
+            item['name'] for item in ingredient_index.search('s')
+        ][:4]
+        self.assertEqual(names, ['sal', 'salt', 'salt', 'SALTY snack'])
@@ -0,0 +1,30 @@
+from api.tests.base import APITestCase
+
+
+class PantryMatchTests(APITestCase):
+
+    def _match(self, **params):
+        return self.auth_client.get('/api/recipes/match/', {
+            'ingredients': ','.join(
+                str(ingredient.pk) for ingredient in self.ingredients
+            ),
+            **params,
+        })
+
+    def test_all_ingredients_cover_every_recipe(self):
+        response = self._match(min_coverage='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {card['id'] for card in response.json()},
+            {recipe.pk for recipe in self.recipes},
+        )
+        self.assertEqual(
+            {card['coverage'] for card in response.json()}, {1}
+        )
+
+    def test_invalid_min_coverage_rejected(self):
+        for value in ('-5', '7', '1.01', 'nan', 'inf', '-inf', 'abc'):
+            with self.subTest(min_coverage=value):
+                response = self._match(min_coverage=value)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('errors', response.json())
@@ -0,0 +1,32 @@
+from unittest import mock
+
+from django.conf import settings
+from django.test import Client
+
+from api.tests.base import APITestCase
+
+
+class MetricsAccessTests(APITestCase):
+
+    def test_without_token_only_staff(self):
+        with mock.patch.dict(settings.METRICS_SETTINGS, TOKEN=''):
+            self.assertEqual(self.client.get('/metrics/').status_code, 404)
+            browser = Client()
+            browser.force_login(self.create_user('admin'))
+            self.assertEqual(browser.get('/metrics/').status_code, 404)
+            self.user.is_staff = True
+            self.user.save(update_fields=('is_staff',))
+            browser.force_login(self.user)
+            self.assertEqual(browser.get('/metrics/').status_code, 200)
+
+    def test_with_token(self):
+        with mock.patch.dict(settings.METRICS_SETTINGS, TOKEN='secret'):
+            self.assertEqual(self.client.get('/metrics/').status_code, 401)
+            self.assertEqual(self.client.get(
+                '/metrics/', HTTP_AUTHORIZATION='Bearer wrong'
+            ).status_code, 401)
+            response = self.client.get(
+                '/metrics/', HTTP_AUTHORIZATION='Bearer secret'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'# TYPE', response.content)
@@ -0,0 +1,57 @@
+import base64
+import json
+
+from api.tests.base import APITestCase
+
+
+def encode_cursor(position) -> str:
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+class KeysetPaginationTests(APITestCase):
+    urls = ('/api/recipes/', '/api/users/subscriptions/')
+    cursor_urls = urls + ('/api/recipes/feed/',)
+
+    def _walk(self, url: str, limit: int) -> list:
+        ids = []
+        response = self.auth_client.get(url, {'cursor': '', 'limit': limit})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            ids.extend(item['id'] for item in data['results'])
+            if not data['next']:
+                return ids
+            response = self.auth_client.get(data['next'])
+
+    def test_cursor_pages_cover_every_item_once(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                expected = [
+                    item['id'] for item in self.auth_client.get(
+                        url, {'limit': 100}
+                    ).json()['results']
+                ]
+                self.assertEqual(sorted(self._walk(url, 5)), sorted(expected))
+
+    def test_malformed_cursor_is_not_found(self):
+        cursors = (
+            'not-base64!',
+            encode_cursor({'pub_date': 1}),
+            encode_cursor([1]),
+            encode_cursor(['x', 'y']),
+            encode_cursor(['2023-01-01T00:00:00Z', 'y']),
+            encode_cursor([None, 1]),
+            encode_cursor([[1], {}]),
+        )
+        for url in self.cursor_urls:
+            for cursor in cursors:
+                with self.subTest(url=url, cursor=cursor):
+                    response = self.auth_client.get(url, {'cursor': cursor})
+                    self.assertEqual(response.status_code, 404)
+
+    def test_cursor_values_are_parsed(self):
+        cursor = encode_cursor(['2999-01-01T00:00:00+00:00', '1000000'])
+        for url in self.cursor_urls:
+            with self.subTest(url=url):
+                response = self.auth_client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
@@ -0,0 +1,48 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.tests.base import APITestCase
+from core.cache import recipe_cards, user_flags
+from recipes import documents
+from recipes.models import Recipe, RecipeDocument
+
+
+class QueryCountTests(APITestCase):
+    """Число SQL-запросов страницы не зависит от её размера
+    и recipes_limit: нет запросов на каждый рецепт или автора."""
+
+    def _reset(self, built: bool) -> None:
+        """Пустые кеши; сохранённые карточки рецептов есть
+        у всех рецептов (built) или ни у одного."""
+
+        recipe_cards.invalidate_all()
+        user_flags.invalidate_all()
+        if built:
+            documents.refresh(Recipe.objects.values_list('pk', flat=True))
+        else:
+            RecipeDocument.objects.all().delete()
+
+    def _assert_constant(self, url: str, variants) -> None:
+        for built in (False, True):
+            self._reset(built)
+            with CaptureQueriesContext(connection) as queries:
+                self.auth_client.get(url, variants[0])
+            for params in variants[1:]:
+                with self.subTest(url=url, params=params, built=built):
+                    self._reset(built)
+                    with self.assertNumQueries(len(queries)):
+                        response = self.auth_client.get(url, params)
+                    self.assertEqual(response.status_code, 200)
+
+    def test_recipe_list(self):
+        self._assert_constant('/api/recipes/', (
+            {'limit': 2}, {'limit': 10}, {'limit': 6, 'is_favorited': 1},
+        ))
+
+    def test_subscriptions(self):
+        self._assert_constant('/api/users/subscriptions/', (
+            {'limit': 1, 'recipes_limit': 1},
+            {'limit': 4, 'recipes_limit': 1},
+            {'limit': 4, 'recipes_limit': 3},
+            {'limit': 2},
+        ))
@@ -0,0 +1,40 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from api.tests.base import APITestCase
+from core import query_plans
+
+
+class QueryPlanTests(APITestCase):
+    """Список рецептов со всеми сочетаниями фильтров читает
+    таблицы по индексам, без полного просмотра."""
+
+    def test_no_violations(self):
+        sample = query_plans.samples()
+        self.assertEqual(sample['author'], self.authors[0].pk)
+        self.assertEqual(len(sample['tags']), 2)
+        results = query_plans.check(sample)
+        self.assertEqual(
+            len(results), 2 * len(list(query_plans.combinations()))
+        )
+        violations = [
+            (result['query'], result['filters'], result['violations'])
+            for result in results if result['violations']
+        ]
+        self.assertEqual(violations, [])
+
+    def test_explain_detects_scan(self):
+        _, scans = query_plans.explain(
+            ('SELECT id FROM recipes WHERE text = %s', ('Описание',))
+        )
+        self.assertEqual(scans, ['recipes'])
+        _, scans = query_plans.explain(
+            ('SELECT id FROM recipes WHERE id = %s', (1,))
+        )
+        self.assertEqual(scans, [])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('Полных просмотров нет', out.getvalue())
@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.tests.base import APITestCase
+from api.v1.serializers import RecipeReadSerializer
+from core.renderers import FastJSONRenderer
+from recipes import documents
+from recipes.models import Recipe, RecipeDocument
+
+IMAGE = 'recipes/images/ab/abcdef.png'
+VARIANTS = {
+    'source': IMAGE,
+    'variants': {
+        'thumb': {
+            'webp': 'recipes/variants/ab/abcdef/thumb.webp',
+            'jpeg': 'recipes/variants/ab/abcdef/thumb.jpeg',
+        },
+    },
+}
+
+
+class RecipeCardContractTests(APITestCase):
+    """Карточки из .values() с FastJSONRenderer побайтно совпадают
+    с RecipeReadSerializer и JSONRenderer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Recipe.objects.filter(pk=cls.recipes[0].pk).update(
+            image=IMAGE, image_variants=VARIANTS
+        )
+        # Изображение ещё обрабатывается: вариантов нет.
+        Recipe.objects.filter(pk=cls.recipes[1].pk).update(
+            image='recipes/images/cd/cdef.png', image_variants=VARIANTS
+        )
+        Recipe.objects.filter(pk=cls.recipes[2].pk).update(
+            name='Рецепт   «с кавычками» "и" \\ 🍲',
+            text='Строка\nвторая\tс табуляцией',
+        )
+
+    def _expected(self, user) -> bytes:
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        recipes = Recipe.objects.with_read_data(user).order_by(
+            '-pub_date', '-id'
+        )
+        return JSONRenderer().render(RecipeReadSerializer(
+            recipes, many=True, context={'request': request}
+        ).data)
+
+    def test_anonymous_cards(self):
+        recipe_ids = [recipe.pk for recipe in self.recipes]
+        expected = documents.serialize_cards(recipe_ids, compiled=False)
+        compiled = documents.serialize_cards(recipe_ids, compiled=True)
+        self.assertEqual(
+            FastJSONRenderer().render([compiled[pk] for pk in recipe_ids]),
+            JSONRenderer().render([expected[pk] for pk in recipe_ids]),
+        )
+
+    def test_api_responses(self):
+        clients = (
+            (self.client, AnonymousUser()),
+            (self.auth_client, self.user),
+        )
+        for compiled in (True, False):
+            for client, user in clients:
+                with self.subTest(compiled=compiled, user=user), \
+                        mock.patch.dict(settings.RECIPE_CARD_SETTINGS,
+                                        COMPILED=compiled):
+                    self.setUp()
+                    RecipeDocument.objects.all().delete()
+                    response = client.get('/api/recipes/', {'limit': 100})
+                    self.assertEqual(
+                        FastJSONRenderer().render(response.data['results']),
+                        self._expected(user),
+                    )
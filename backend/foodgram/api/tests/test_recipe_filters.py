@@ -0,0 +1,63 @@
+from api.tests.base import APITestCase
+
+
+class TagFilterTests(APITestCase):
+    """В данных тестов рецепт с номером n отмечен тэгами
+    tags[n % 3:n % 3 + 2]: breakfast и lunch, lunch и dinner
+    или только dinner."""
+
+    def _ids(self, response) -> list:
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        ids = [recipe['id'] for recipe in body['results']]
+        self.assertEqual(len(ids), body['count'])
+        return sorted(ids)
+
+    def _expected(self, *remainders) -> list:
+        return sorted(
+            recipe.pk for number, recipe in enumerate(self.recipes)
+            if number % 3 in remainders
+        )
+
+    def _get(self, **params):
+        return self.client.get(
+            '/api/recipes/', {'limit': 50, **params}
+        )
+
+    def test_any_tag_by_default(self):
+        ids = self._ids(self._get(tags=['breakfast', 'lunch']))
+        self.assertEqual(ids, self._expected(0, 1))
+        self.assertEqual(
+            self._ids(self._get(tags=['breakfast', 'lunch'],
+                                tags_match='any')),
+            ids,
+        )
+
+    def test_all_tags(self):
+        self.assertEqual(
+            self._ids(self._get(tags=['breakfast', 'lunch'],
+                                tags_match='all')),
+            self._expected(0),
+        )
+        self.assertEqual(
+            self._ids(self._get(tags=['lunch', 'dinner'],
+                                tags_match='all')),
+            self._expected(1),
+        )
+        self.assertEqual(
+            self._ids(self._get(tags=['breakfast', 'dinner'],
+                                tags_match='all')),
+            [],
+        )
+
+    def test_single_tag_same_for_both_modes(self):
+        for match in ('any', 'all'):
+            with self.subTest(tags_match=match):
+                self.assertEqual(
+                    self._ids(self._get(tags=['dinner'], tags_match=match)),
+                    self._expected(1, 2),
+                )
+
+    def test_unknown_match_mode_rejected(self):
+        response = self._get(tags=['breakfast'], tags_match='some')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,127 @@
+import base64
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+from PIL import Image
+
+from api.tests.base import APITestCase
+from api.v1.serializers import RecipeWriteSerializer
+from recipes import images
+
+
+def png_payload() -> str:
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), (200, 10, 10)).save(buffer, 'PNG')
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class RecipeImageUploadTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.media_root = media_root
+        self.payload = png_payload()
+        digest = hashlib.sha256(base64.b64decode(self.payload)).hexdigest()
+        self.name = images.original_name(digest, 'png')
+
+    def _body(self, image: str, **fields) -> dict:
+        return {
+            'name': 'С картинкой', 'text': 'Описание', 'cooking_time': 5,
+            'tags': [self.tags[0].pk],
+            'ingredients': [{'id': self.ingredients[0].pk, 'amount': 3}],
+            'image': image, **fields,
+        }
+
+    def _stored(self) -> list:
+        return [
+            os.path.relpath(os.path.join(root, name), self.media_root)
+            for root, _, names in os.walk(self.media_root)
+            for name in names
+        ]
+
+    def test_upload_stores_original(self):
+        response = self.auth_client.post('/api/recipes/', self._body(
+            f'data:image/png;base64,{self.payload}'
+        ), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self._stored(), [self.name])
+
+    def test_whitespace_anywhere_in_payload(self):
+        # Перенос после первых 80 символов сдвигает границы частей.
+        payload = self.payload[:100] + '\n' + self.payload[100:]
+        with mock.patch.dict(images.image_conf, DECODE_CHUNK_SIZE=64):
+            response = self.auth_client.post(
+                '/api/recipes/', self._body(payload), format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self._stored(), [self.name])
+
+    def test_invalid_characters_rejected(self):
+        payload = self.payload[:100] + '!' + self.payload[100:]
+        response = self.auth_client.post(
+            '/api/recipes/', self._body(payload), format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.json())
+
+    def test_nothing_stored_when_validation_fails(self):
+        response = self.auth_client.post('/api/recipes/', self._body(
+            self.payload, tags=[]
+        ), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._stored(), [])
+
+    def _fail_write(self):
+        failing = mock.patch.object(
+            RecipeWriteSerializer, '_set_ingridients_in_recipe',
+            side_effect=RuntimeError,
+        )
+        with failing, self.assertRaises(RuntimeError):
+            self.auth_client.post(
+                '/api/recipes/', self._body(self.payload), format='json'
+            )
+
+    def test_file_kept_when_write_fails(self):
+        """Файл мог понадобиться параллельному запросу с тем же
+        изображением, поэтому при откате записи он остаётся."""
+
+        self._fail_write()
+        self.assertEqual(self._stored(), [self.name])
+        self.assertEqual(images.drop_orphans(), [])
+        self.assertEqual(self._stored(), [self.name])
+
+    def test_orphan_dropped_after_grace(self):
+        self._fail_write()
+        self.assertEqual(images.drop_orphans(grace=0), [self.name])
+        self.assertEqual(self._stored(), [])
+
+    def test_referenced_image_not_dropped(self):
+        response = self.auth_client.post('/api/recipes/', self._body(
+            self.payload
+        ), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(images.drop_orphans(grace=0), [])
+        self.assertIn(self.name, self._stored())
+
+    def test_orphan_variants_dropped(self):
+        self._fail_write()
+        images.build_variants(self.name)
+        self.assertGreater(len(self._stored()), 1)
+        out = io.StringIO()
+        with mock.patch.dict(images.image_conf, ORPHAN_GRACE=0):
+            call_command('build_image_variants', '--drop-orphans',
+                         stdout=out)
+        self.assertEqual(self._stored(), [])
+        self.assertIn('Удалено изображений без рецептов: 1', out.getvalue())
@@ -0,0 +1,110 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.tests.base import APITestCase
+from recipes.models import Ingredient, Recipe
+
+
+class RecipeWriteTests(APITestCase):
+    """Ингридиенты рецепта пишутся пакетно: число запросов
+    создания и изменения не зависит от числа ингридиентов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.pantry = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Продукт {number}', measurement_unit='г')
+            for number in range(30)
+        )
+
+    def _body(self, amounts: dict, **fields) -> dict:
+        return {
+            'name': 'Новый', 'text': 'Описание', 'cooking_time': 5,
+            'image': None,
+            'tags': [self.tags[0].pk, self.tags[1].pk],
+            'ingredients': [
+                {'id': pk, 'amount': amount}
+                for pk, amount in amounts.items()
+            ],
+            **fields,
+        }
+
+    def _amounts(self, size: int, start: int = 0) -> dict:
+        return {
+            ingredient.pk: number + 1
+            for number, ingredient in enumerate(
+                self.pantry[start:start + size]
+            )
+        }
+
+    def _queries(self, method: str, url: str, body: dict) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.auth_client, method)(
+                url, body, format='json'
+            )
+        self.assertLess(response.status_code, 300, response.content)
+        return len(queries)
+
+    def _stored(self, recipe_id: int) -> dict:
+        return dict(Recipe.objects.get(
+            pk=recipe_id
+        ).recipe_ingredients.values_list('ingredient_id', 'amount'))
+
+    def test_create_queries_constant(self):
+        small = self._queries('post', '/api/recipes/', self._body(
+            self._amounts(2)
+        ))
+        large = self._queries('post', '/api/recipes/', self._body(
+            self._amounts(25)
+        ))
+        self.assertEqual(small, large)
+
+    def test_update_queries_constant(self):
+        counts = []
+        for size in (3, 25):
+            amounts = self._amounts(size)
+            recipe_id = self.auth_client.post(
+                '/api/recipes/', self._body(amounts), format='json'
+            ).json()['id']
+            changed = dict(amounts)
+            first = next(iter(changed))
+            changed[first] += 100
+            counts.append(self._queries(
+                'patch', f'/api/recipes/{recipe_id}/', self._body(changed)
+            ))
+            self.assertEqual(self._stored(recipe_id), changed)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_update_adds_changes_and_removes(self):
+        amounts = self._amounts(6)
+        recipe_id = self.auth_client.post(
+            '/api/recipes/', self._body(amounts), format='json'
+        ).json()['id']
+        ids = list(amounts)
+        changed = {ids[0]: 500, ids[1]: amounts[ids[1]], **self._amounts(
+            2, start=10
+        )}
+        response = self.auth_client.patch(
+            f'/api/recipes/{recipe_id}/', self._body(changed), format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._stored(recipe_id), changed)
+        self.assertEqual(
+            {item['id']: item['amount']
+             for item in response.json()['ingredients']},
+            changed,
+        )
+
+    def test_invalid_ingredients_rejected(self):
+        pk = self.pantry[0].pk
+        for ingredients in (
+            [{'id': pk, 'amount': 1}, {'id': pk, 'amount': 2}],
+            [{'id': 10 ** 6, 'amount': 1}],
+            [],
+        ):
+            with self.subTest(ingredients=ingredients):
+                response = self.auth_client.post('/api/recipes/', {
+                    **self._body({}), 'ingredients': ingredients,
+                }, format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('ingredients', response.json())
@@ -0,0 +1,82 @@
+import math
+
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.conf import settings
+
+from api.tests.base import APITestCase
+from recipes import recommendations
+from recipes.models import RecipeSimilarity
+
+
+class SimilarityTests(APITestCase):
+    """Сходство рецептов - косинус векторов отметок, у которых
+    и скалярные произведения, и нормы считаются по корзинам,
+    урезанным до MAX_BASKET новейших рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for number, author in enumerate(cls.authors):
+            for recipe in cls.recipes[number:number + 6]:
+                recipe.favorited.add(author)
+            cls.recipes[number].in_shopping_cart.add(author)
+
+    def setUp(self):
+        super().setUp()
+        patched = mock.patch.dict(
+            settings.RECOMMENDATION_SETTINGS, MAX_BASKET=3, MIN_SUPPORT=1
+        )
+        patched.start()
+        self.addCleanup(patched.stop)
+
+    def expected(self) -> dict:
+        conf = settings.RECOMMENDATION_SETTINGS
+        vectors = {}
+        for through, weight_name in recommendations.MARK_KINDS:
+            baskets = {}
+            for user_id, recipe_id in through.objects.values_list(
+                'foodgramuser_id', 'recipe_id'
+            ):
+                baskets.setdefault(user_id, []).append(recipe_id)
+            for user_id, recipe_ids in baskets.items():
+                for recipe_id in sorted(recipe_ids)[-conf['MAX_BASKET']:]:
+                    vectors.setdefault(recipe_id, {})[
+                        (user_id, weight_name)
+                    ] = conf[weight_name]
+        expected = {}
+        for left, a in vectors.items():
+            for right, b in vectors.items():
+                dot = sum(a[key] * b[key] for key in a.keys() & b.keys())
+                if left != right and dot:
+                    expected[left, right] = dot / math.sqrt(
+                        sum(v * v for v in a.values())
+                        * sum(v * v for v in b.values())
+                    )
+        return expected
+
+    def stored(self) -> dict:
+        return {
+            (recipe_id, neighbour_id): score
+            for recipe_id, neighbour_id, score in
+            RecipeSimilarity.objects.values_list(
+                'recipe_id', 'neighbour_id', 'score'
+            )
+        }
+
+    def assert_scores(self, actual: dict, expected: dict):
+        self.assertEqual(actual.keys(), expected.keys())
+        for pair, score in expected.items():
+            self.assertAlmostEqual(actual[pair], score, msg=pair)
+
+    def test_build_matches_capped_cosine(self):
+        recommendations.build()
+        self.assert_scores(self.stored(), self.expected())
+
+    def test_update_matches_build(self):
+        recommendations.build()
+        self.user.favorited_recipes.add(self.recipes[10])
+        RecipeSimilarity.objects.all().delete()
+        recommendations.update(datetime(2000, 1, 1, tzinfo=timezone.utc))
+        self.assert_scores(self.stored(), self.expected())
@@ -0,0 +1,14 @@
+from django.urls import path
+
+from api.v1 import async_views
+
+# Имена маршрутов совпадают с именами роутера DRF: reverse() под ASGI
+# даёт те же адреса.
+urlpatterns = [
+    path('recipes/', async_views.recipe_list, name='recipes-list'),
+    path('recipes/<int:pk>/', async_views.recipe_detail,
+         name='recipes-detail'),
+    path('tags/', async_views.tag_list, name='tags-list'),
+    path('ingredients/', async_views.ingredient_list,
+         name='ingredients-list'),
+]
@@ -0,0 +1,190 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from rest_framework.request import Request
+
+from api.v1.recipe_cards import card_version, render_recipe_cards
+from api.v1.serializers import IngredientSerializer, TagSerializer
+from api.v1.views import IngredientViewSet, RecipeViewSet, TagViewSet
+from core.asgi import (
+    RENDERER_FORMAT, AsyncUnsupportedError, async_read_view, json_response,
+)
+from core.cache import reference_lists
+from core.conditional import make_etag, patch_conditional_headers
+from core.db_router import use_primary
+from core.filters import (
+    IngredientSearchFilter, RecipeFilter, search_ingredients,
+)
+from core.pagination import FoodGramPagination
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient, Recipe, Tag
+
+search_conf = settings.INGREDIENT_SEARCH_SETTINGS
+pagination_conf = settings.PAGINATION_SETTINGS
+
+RECIPE_LIST_PARAMS = frozenset((
+    FoodGramPagination.page_query_param,
+    FoodGramPagination.page_size_query_param,
+    *RecipeFilter.base_filters,
+))
+
+render_cards = sync_to_async(render_recipe_cards)
+
+
+async def _paginate(paginator: FoodGramPagination, rows, request: Request):
+    """Страница как у FoodGramPagination.paginate_queryset;
+    None, если размер страницы не задан."""
+
+    page_size = paginator.get_page_size(request)
+    if not page_size:
+        return None
+    django_paginator = paginator.django_paginator_class(rows, page_size)
+    if pagination_conf['COUNT_MODE'] == 'exact':
+        django_paginator.count = await rows.acount()
+    else:
+        await sync_to_async(lambda: django_paginator.count)()
+    try:
+        paginator.page = django_paginator.page(
+            paginator.get_page_number(request, django_paginator)
+        )
+    except InvalidPage:
+        raise AsyncUnsupportedError
+    paginator.request = request
+    paginator.keyset_ordering = None
+    return paginator.page
+
+
+@async_read_view('recipes', 'list', RECIPE_LIST_PARAMS)
+async def recipe_list(request):
+    """Список рецептов с фильтрами RecipeFilter и постраничной
+    пагинацией, как RecipeViewSet.list."""
+
+    filterset = RecipeFilter(
+        request.GET, queryset=Recipe.objects.all(), request=request
+    )
+    if not await sync_to_async(filterset.is_valid)():
+        raise AsyncUnsupportedError
+    rows = filterset.qs.values('id', 'pub_date')
+    paginator = FoodGramPagination()
+    page = await _paginate(paginator, rows, Request(request))
+    if page is not None:
+        rows = page.object_list
+    cards = await render_cards(
+        [row['id'] async for row in rows.aiterator()], request
+    )
+    if page is None:
+        return json_response(cards)
+    return json_response(paginator.get_paginated_response(cards).data)
+
+
+@async_read_view('recipes', 'retrieve')
+async def recipe_detail(request, pk: int):
+    """Карточка рецепта с теми же валидаторами условного GET,
+    что у RecipeViewSet.retrieve."""
+
+    version = await card_version(pk, request.user).afirst()
+    if version is None:
+        raise AsyncUnsupportedError
+    anonymous = request.user.is_anonymous
+    modified = max(version[:2])
+    last_modified = (
+        int(modified.timestamp()) if anonymous and modified else None
+    )
+    etag = make_etag(request, version, RENDERER_FORMAT)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        cards = await render_cards([pk], request)
+        if not cards:
+            raise AsyncUnsupportedError
+        response = json_response(cards[0])
+    return patch_conditional_headers(
+        response, etag, last_modified, anonymous,
+        RecipeViewSet.public_max_age,
+    )
+
+
+async def _version(model, field: str) -> tuple:
+    version = await model.objects.order_by().aaggregate(
+        count=Count('pk'), modified=Max(field)
+    )
+    return tuple(version.values())
+
+
+async def _cached_list(request, prefix: str, load):
+    """Список из кеша справочников (общего с CachedListMixin)."""
+
+    key = f'{prefix}:{request.get_full_path()}'
+    data = (await sync_to_async(reference_lists.get_many)([key])).get(key)
+    if data is None:
+        with use_primary():
+            data = await load()
+        await sync_to_async(reference_lists.set_many)({key: data})
+    return data
+
+
+async def _reference_list(request, viewset, version, load):
+    """Ответ справочника с условным GET, как у ConditionalGetMixin."""
+
+    etag = make_etag(request, version, RENDERER_FORMAT)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = json_response(await load())
+    return patch_conditional_headers(
+        response, etag, None, request.user.is_anonymous,
+        viewset.public_max_age,
+    )
+
+
+async def _load_tags():
+    return TagSerializer(
+        [tag async for tag in Tag.objects.all()], many=True
+    ).data
+
+
+@async_read_view('tags', 'list')
+async def tag_list(request):
+    version = await _version(Tag, TagViewSet.modified_field)
+    return await _reference_list(
+        request, TagViewSet, version, lambda: _cached_list(
+            request, TagViewSet.list_cache_prefix, _load_tags
+        ),
+    )
+
+
+def _search_index(name: str):
+    return ingredient_index.search(name) if name else ingredient_index.all()
+
+
+async def _search_ingredients(name: str):
+    queryset = Ingredient.objects.all()
+    if name:
+        queryset = search_ingredients(queryset, name)
+    return IngredientSerializer(
+        [ingredient async for ingredient in queryset], many=True
+    ).data
+
+
+@async_read_view('ingredients', 'list')
+async def ingredient_list(request):
+    """Поиск ингридиентов (?name=): по индексу в памяти,
+    если он включён, иначе запросом к базе."""
+
+    name = request.GET.get(IngredientSearchFilter.search_param, '').strip()
+    if search_conf['IN_MEMORY_INDEX']:
+        version = await sync_to_async(lambda: ingredient_index.version)()
+        return await _reference_list(
+            request, IngredientViewSet, version,
+            lambda: sync_to_async(_search_index)(name),
+        )
+    version = await _version(Ingredient, IngredientViewSet.modified_field)
+    return await _reference_list(
+        request, IngredientViewSet, version,
+        lambda: _cached_list(
+            request, IngredientViewSet.list_cache_prefix,
+            lambda: _search_ingredients(name),
+        ),
+    )
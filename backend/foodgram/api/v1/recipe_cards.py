@@ -0,0 +1,99 @@
+from django.db.models import Exists, OuterRef
+
+from core.cache import recipe_cards, user_flag_key, user_flags
+from core.db_router import use_primary
+from recipes import documents
+from recipes.models import Recipe
+from users.models import Follow
+
+FLAG_QUERIES: dict = {
+    'favorites': lambda user: user.favorited_recipes.values_list(
+        'pk', flat=True
+    ),
+    'cart': lambda user: user.in_cart_recipes.values_list('pk', flat=True),
+    'followings': lambda user: Follow.objects.filter(
+        follower=user
+    ).values_list('author_id', flat=True),
+}
+
+
+def get_flag_sets(user) -> dict:
+    """Множества id избранных рецептов, рецептов в корзине
+    и авторов, на которых подписан пользователь.
+    Хранятся в кеше до изменения соответствующих связей."""
+
+    if user.is_anonymous:
+        return {name: frozenset() for name in FLAG_QUERIES}
+    cached = user_flags.get_many(
+        user_flag_key(user.pk, name) for name in FLAG_QUERIES
+    )
+    flags, missing = {}, {}
+    with use_primary():
+        for name, query in FLAG_QUERIES.items():
+            key = user_flag_key(user.pk, name)
+            if key not in cached:
+                cached[key] = missing[key] = frozenset(query(user))
+            flags[name] = cached[key]
+    user_flags.set_many(missing)
+    return flags
+
+
+def _personalize(card: dict, flags: dict, request) -> dict:
+    card = dict(card)
+    author = card['author']
+    card['author'] = dict(
+        author, is_subscribed=author['id'] in flags['followings']
+    )
+    card['is_favorited'] = card['id'] in flags['favorites']
+    card['is_in_shopping_cart'] = card['id'] in flags['cart']
+    if card['image']:
+        card['image'] = request.build_absolute_uri(card['image'])
+    card['image_variants'] = {
+        variant: {
+            fmt: request.build_absolute_uri(url)
+            for fmt, url in formats.items()
+        }
+        for variant, formats in card['image_variants'].items()
+    }
+    return card
+
+
+def render_recipe_cards(recipe_ids, request) -> list:
+    """Представления рецептов в формате RecipeReadSerializer.
+    Общая для всех пользователей часть карточки берётся из кеша,
+    затем из сохранённых карточек (recipes.documents); отсутствующие
+    собираются одним набором запросов. К ней добавляются флаги
+    текущего пользователя."""
+
+    recipe_ids = list(recipe_ids)
+    cards = recipe_cards.get_many(recipe_ids)
+    missing = [pk for pk in recipe_ids if pk not in cards]
+    if missing:
+        with use_primary():
+            fresh = documents.load(missing)
+            unbuilt = [pk for pk in missing if pk not in fresh]
+            if unbuilt:
+                fresh.update(documents.build(unbuilt))
+        recipe_cards.set_many(fresh)
+        cards.update(fresh)
+    flags = get_flag_sets(request.user)
+    return [
+        _personalize(cards[pk], flags, request)
+        for pk in recipe_ids if pk in cards
+    ]
+
+
+def card_version(recipe_id, user):
+    """Запрос версии карточки рецепта для условных GET: даты
+    изменения рецепта и автора и флаги текущего пользователя."""
+
+    queryset = Recipe.objects.filter(pk=recipe_id).with_flags(user)
+    fields = ['updated_at', 'author__updated_at']
+    if user.is_authenticated:
+        queryset = queryset.annotate(
+            is_subscribed=Exists(Follow.objects.filter(
+                follower=user, author=OuterRef('author')
+            ))
+        )
+        fields += ['is_favorited', 'is_in_shopping_cart', 'is_subscribed']
+    return queryset.values_list(*fields)
@@ -1,9 +1,12 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
+from core.fields import StreamingBase64ImageField
+from core.loaders import FlagListSerializer, get_flag_loader
+from recipes import images
 from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
 
 User = get_user_model()
@@ -28,34 +31,61 @@ class UserProfileSerializer(UserSerializer):
 
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
+    def prime_flags(self, authors):
+        get_flag_loader(self.context.get('request')).prime(
+            'followings', (author.pk for author in authors)
+        )
+
     def get_is_subscribed(self, obj):
         """Определяет наличие подписки.
         Показывает, подписан ли текущий пользователь
         на пользователя, чей профиль просматривается"""
 
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return user.followings.filter(author=obj).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return get_flag_loader(self.context.get('request')).load(
+            'followings', obj.pk
+        )
 
     class Meta:
         model = User
         fields = ('id', 'username', 'email',
                   'first_name', 'last_name', 'is_subscribed')
+        list_serializer_class = FlagListSerializer
+
+
+class ImageVariantsMixin(serializers.Serializer):
+    """Ссылки на уменьшенные копии изображения рецепта
+    ({вариант: {формат: url}}); пусто, пока копии не готовы."""
 
+    image_variants = serializers.SerializerMethodField(read_only=True)
 
-class RecipeShortSerializer(serializers.ModelSerializer):
+    def get_image_variants(self, obj):
+        urls = images.variant_urls(obj)
+        request = self.context.get('request')
+        if request is None:
+            return urls
+        return {
+            variant: {
+                fmt: request.build_absolute_uri(url)
+                for fmt, url in formats.items()
+            }
+            for variant, formats in urls.items()
+        }
+
+
+class RecipeShortSerializer(ImageVariantsMixin, serializers.ModelSerializer):
     """Сериализатор получения сокращенного представления рецептов."""
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class FollowSerializer(UserProfileSerializer):
     """Сериализатор подписок пользователей."""
     recipes_count = serializers.IntegerField(read_only=True)
-    recipes = RecipeShortSerializer(many=True)
+    recipes = RecipeShortSerializer(many=True, source='latest_recipes')
 
     class Meta(UserProfileSerializer.Meta):
         fields = ('id', 'username', 'email',
@@ -71,7 +101,7 @@ class TagSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Tag
-        fields = '__all__'
+        fields = ('id', 'name', 'color', 'slug')
         read_only_fields = ('id', 'name', 'color', 'slug')
 
 
@@ -80,7 +110,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Ingredient
-        fields = '__all__'
+        fields = ('id', 'name', 'measurement_unit')
         read_only_fields = ('id', 'name', 'measurement_unit')
 
 
@@ -96,7 +126,7 @@ class RecipeIngredientReadSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(ImageVariantsMixin, serializers.ModelSerializer):
     """Сериализатор получения рецептов."""
 
     author = UserProfileSerializer(read_only=True)
@@ -109,27 +139,35 @@ class RecipeReadSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        exclude = ('pub_date', 'favorited', 'in_shopping_cart')
-
-    def _check_exist(self, obj, model):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return model.objects.filter(
-            foodgramuser=user, recipe=obj
-        ).exists()
+        exclude = ('pub_date', 'updated_at', 'favorited', 'in_shopping_cart',
+                   'favorites_count', 'carts_count', 'search_document',
+                   'search_vector', 'marks_changed_at')
+
+        list_serializer_class = FlagListSerializer
+
+    def prime_flags(self, recipes):
+        loader = get_flag_loader(self.context.get('request'))
+        recipe_ids = [recipe.pk for recipe in recipes]
+        loader.prime('favorites', recipe_ids)
+        loader.prime('cart', recipe_ids)
+        loader.prime('followings', (recipe.author_id for recipe in recipes))
+
+    def _check_exist(self, obj, name, annotation):
+        if hasattr(obj, annotation):
+            return getattr(obj, annotation)
+        return get_flag_loader(self.context.get('request')).load(
+            name, obj.pk
+        )
 
     def get_is_favorited(self, obj):
-        return self._check_exist(obj, Recipe.favorited.through)
+        return self._check_exist(obj, 'favorites', 'is_favorited')
 
     def get_is_in_shopping_cart(self, obj):
-        return self._check_exist(obj, Recipe.in_shopping_cart.through)
+        return self._check_exist(obj, 'cart', 'is_in_shopping_cart')
 
 
 class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField()
 
     class Meta:
         model = RecipeIngredient
@@ -143,7 +181,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         queryset=Tag.objects.all(), many=True
     )
     ingredients = RecipeIngredientWriteSerializer(many=True)
-    image = Base64ImageField(allow_null=True)
+    image = StreamingBase64ImageField(allow_null=True)
 
     def validate_tags(self, value):
         if len(value) == 0:
@@ -162,37 +200,71 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Дублирование ингридиентов не допускается!'
             )
+        existing = set(Ingredient.objects.filter(
+            id__in=ingridient_set
+        ).values_list('id', flat=True))
+        missing = ingridient_set - existing
+        if missing:
+            raise serializers.ValidationError(
+                'Ингридиенты не найдены: '
+                f'{", ".join(map(str, sorted(missing)))}'
+            )
         return value
 
-    def _add_ingridient_in_recipe(self, ingredients, obj):
-        for ingredient in ingredients:
-            RecipeIngredient.objects.create(
-                recipe=obj,
-                ingredient=ingredient['id'],
-                amount=ingredient['amount']
-            )
+    def _set_ingridients_in_recipe(self, ingredients, obj, created=False):
+        """Приводит ингридиенты рецепта к переданному списку.
+        Новые записи добавляются одним запросом, изменённые количества
+        обновляются одним запросом, лишние записи удаляются."""
+
+        amounts = {item['id']: item['amount'] for item in ingredients}
+        current = {} if created else {
+            item.ingredient_id: item for item in obj.recipe_ingredients.all()
+        }
+        to_create = [
+            RecipeIngredient(recipe=obj, ingredient_id=id, amount=amount)
+            for id, amount in amounts.items() if id not in current
+        ]
+        to_update = []
+        for id, item in current.items():
+            if id in amounts and item.amount != amounts[id]:
+                item.amount = amounts[id]
+                to_update.append(item)
+        to_delete = current.keys() - amounts.keys()
+        if to_delete:
+            obj.recipe_ingredients.filter(
+                ingredient_id__in=to_delete
+            ).delete()
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ('amount',))
+        if to_create:
+            RecipeIngredient.objects.bulk_create(to_create)
 
     def create(self, validated_data):
-        user = self.context['request'].user
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        recipe = Recipe.objects.create(**validated_data, author=user)
-        recipe.tags.set(tags)
-        self._add_ingridient_in_recipe(ingredients, recipe)
-        return recipe
-
-    def update(self, instance, validated_data):
-        if 'ingredients' in validated_data:
+        with images.stored_image(validated_data), transaction.atomic():
+            user = self.context['request'].user
             ingredients = validated_data.pop('ingredients')
-            instance.ingredients.clear()
-            self._add_ingridient_in_recipe(ingredients, instance)
-        if 'tags' in validated_data:
             tags = validated_data.pop('tags')
-            instance.tags.clear()
-            instance.tags.set(tags)
-        return super().update(instance, validated_data)
+            recipe = Recipe.objects.create(**validated_data, author=user)
+            recipe.tags.set(tags)
+            self._set_ingridients_in_recipe(
+                ingredients, recipe, created=True
+            )
+            return recipe
+
+    def update(self, instance, validated_data):
+        with images.stored_image(validated_data), transaction.atomic():
+            if 'ingredients' in validated_data:
+                ingredients = validated_data.pop('ingredients')
+                self._set_ingridients_in_recipe(ingredients, instance)
+            if 'tags' in validated_data:
+                tags = validated_data.pop('tags')
+                instance.tags.set(tags)
+            return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        instance = Recipe.objects.with_read_data(
+            self.context['request'].user
+        ).get(pk=instance.pk)
         return RecipeReadSerializer(instance, context=self.context).data
 
     class Meta:
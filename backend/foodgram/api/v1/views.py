@@ -1,8 +1,9 @@
-from datetime import datetime
+from collections import defaultdict
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Count, OuterRef, Prefetch, Sum
-from django.http import HttpResponse
+from django.db.models import F
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
@@ -11,18 +12,59 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from api.v1.recipe_cards import card_version, render_recipe_cards
 from api.v1.serializers import (
     FollowSerializer, IngredientSerializer, RecipeReadSerializer,
     RecipeShortSerializer, RecipeWriteSerializer, TagSerializer,
 )
+from core.cache import CachedListMixin
+from core.conditional import ConditionalGetMixin
 from core.filters import IngredientSearchFilter, RecipeFilter
 from core.pagination import FoodGramPagination
 from core.permissions import IsOwnerOrRO
-from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes import (
+    feed as recipe_feed, recommendations, search as recipe_search,
+    shopping_cart,
+)
+from recipes.ingredient_index import ingredient_index
+from recipes.ingredient_match import ingredient_match_index
+from recipes.models import Ingredient, Recipe, Tag
 from users.models import Follow
 
 User = get_user_model()
 
+search_conf = settings.INGREDIENT_SEARCH_SETTINGS
+match_conf = settings.INGREDIENT_MATCH_SETTINGS
+http_cache_conf = settings.HTTP_CACHE_SETTINGS
+
+DEFAULT_RECIPES_LIMIT: int = 3
+
+
+def get_recipes_limit(request) -> int:
+    """Число рецептов автора в ответах о подписках (recipes_limit)."""
+
+    try:
+        limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return DEFAULT_RECIPES_LIMIT
+    return max(limit, 0)
+
+
+def attach_latest_recipes(authors, limit: int):
+    """Подставляет авторам последние limit рецептов (latest_recipes),
+    выбранные одним запросом для всей страницы."""
+
+    authors = list(authors)
+    latest = defaultdict(list)
+    if authors and limit:
+        for recipe in Recipe.objects.latest_by_author(
+            [author.pk for author in authors], limit
+        ):
+            latest[recipe.author_id].append(recipe)
+    for author in authors:
+        author.latest_recipes = latest[author.pk]
+    return authors
+
 
 class FoodGramUserViewSet(UserViewSet):
     pagination_class = FoodGramPagination
@@ -30,6 +72,12 @@ class FoodGramUserViewSet(UserViewSet):
     def get_queryset(self):
         return User.objects.all()
 
+    @property
+    def keyset_ordering(self):
+        if self.action == 'subscriptions':
+            return ('-follow_create_at', '-follow_id')
+        return None
+
     @action(['get'], detail=False, permission_classes=[IsAuthenticated])
     def me(self, request, *args, **kwargs):
         return super().me(request, *args, **kwargs)
@@ -46,10 +94,6 @@ class FoodGramUserViewSet(UserViewSet):
                     data={'errors': 'Нарцисcизм это болезнь!'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            serializer = FollowSerializer(
-                author, context={'request': request}
-            )
-
             _, is_created = Follow.objects.get_or_create(
                 follower=user, author=author
             )
@@ -58,6 +102,10 @@ class FoodGramUserViewSet(UserViewSet):
                     data={'errors': 'Подписка уже оформлена.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            attach_latest_recipes([author], get_recipes_limit(request))
+            serializer = FollowSerializer(
+                author, context={'request': request}
+            )
             return Response(
                 data=serializer.data, status=status.HTTP_201_CREATED
             )
@@ -70,116 +118,299 @@ class FoodGramUserViewSet(UserViewSet):
 
     @action(detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
-        recipes_limit = int(
-            self.request.GET.get('recipes_limit', default=3)
-        )
-        users_recipes = Recipe.objects.filter(
-            author_id=OuterRef('author_id')
-        )[:recipes_limit]
-        prefetch_query = Prefetch(
-            'recipes', queryset=Recipe.objects.filter(id__in=users_recipes)
-        )
         queryset = User.objects.filter(
             followers__follower=request.user
-        ).prefetch_related(prefetch_query).annotate(
-            recipes_count=Count('recipes')
+        ).annotate(
+            follow_create_at=F('followers__create_at'),
+            follow_id=F('followers__id'),
         )
         pages = self.paginate_queryset(queryset)
+        authors = attach_latest_recipes(
+            queryset if pages is None else pages,
+            get_recipes_limit(request),
+        )
         serializer = FollowSerializer(
-            pages, many=True, context={'request': request}
+            authors, many=True, context={'request': request}
         )
+        if pages is None:
+            return Response(serializer.data)
         return self.get_paginated_response(serializer.data)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, CachedListMixin,
+                 viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    list_cache_prefix = 'tags'
+    public_max_age = http_cache_conf['REFERENCE_MAX_AGE']
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, CachedListMixin,
+                        viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (IngredientSearchFilter,)
-    search_fields = ('^name',)
+    list_cache_prefix = 'ingredients'
+    public_max_age = http_cache_conf['REFERENCE_MAX_AGE']
+
+    def get_cache_validators(self, request):
+        if self.action == 'list' and search_conf['IN_MEMORY_INDEX']:
+            version = ingredient_index.version
+            return version, version[1]
+        return super().get_cache_validators(request)
 
+    def _list_from_index(self, request, *args, **kwargs):
+        name = request.query_params.get(
+            IngredientSearchFilter.search_param, ''
+        ).strip()
+        if name:
+            return Response(ingredient_index.search(name))
+        return Response(ingredient_index.all())
+
+    def list(self, request, *args, **kwargs):
+        if not search_conf['IN_MEMORY_INDEX']:
+            return super().list(request, *args, **kwargs)
+        return self.conditional_response(
+            self._list_from_index, request, *args, **kwargs
+        )
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     pagination_class = FoodGramPagination
     permission_classes = (IsOwnerOrRO,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    ordering = ('-id',)
+
+    @property
+    def keyset_ordering(self):
+        if self.action == 'list':
+            return ('-pub_date', '-id')
+        if self.action == 'feed':
+            return ('-pub_date', '-recipe_id')
+        return None
 
     def get_serializer_class(self):
         if self.request.method in ['POST', 'PUT', 'PATCH']:
             return RecipeWriteSerializer
         return RecipeReadSerializer
 
-    def _mark_or_unmark(self, request, model, msg_txt):
+    def get_cache_validators(self, request):
+        """Версия карточки рецепта: даты изменения рецепта и автора
+        и флаги, зависящие от текущего пользователя."""
+
+        if self.action != 'retrieve':
+            return None
+        try:
+            version = card_version(
+                self.kwargs.get('pk'), request.user
+            ).first()
+        except (TypeError, ValueError):
+            return None
+        if version is None:
+            return None
+        return version, max(version[:2])
+
+    def _list_cards(self, request, *args, **kwargs):
+        rows = self.filter_queryset(
+            self.get_queryset()
+        ).values('id', 'pub_date')
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(render_recipe_cards(
+                [row['id'] for row in page], request
+            ))
+        return Response(render_recipe_cards(
+            [row['id'] for row in rows], request
+        ))
+
+    @action(detail=False)
+    def search(self, request):
+        """Поиск рецептов по названию, описанию, тэгам
+        и ингридиентам (?q=), по убыванию релевантности.
+        Совместим с фильтрами и пагинацией списка рецептов."""
+
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                data={'errors': 'Укажите поисковый запрос (q).'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return self._recipe_cards(request, recipe_search.search(
+            self.filter_queryset(self.get_queryset()), query
+        ))
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        """Рецепты авторов, на которых подписан пользователь,
+        новые сначала."""
+
+        rows = recipe_feed.feed_queryset(request.user)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(render_recipe_cards(
+                [row['recipe_id'] for row in page], request
+            ))
+        return Response(render_recipe_cards(
+            [row['recipe_id'] for row in rows], request
+        ))
+
+    def _recipe_cards(self, request, recipe_ids):
+        page = self.paginate_queryset(recipe_ids)
+        if page is not None:
+            return self.get_paginated_response(
+                render_recipe_cards(page, request)
+            )
+        return Response(render_recipe_cards(recipe_ids, request))
+
+    @action(detail=True)
+    def similar(self, request, pk=None):
+        """Похожие рецепты: их чаще всего добавляют в избранное
+        и корзину вместе с этим рецептом."""
+
+        recipe = get_object_or_404(Recipe.objects.only('pk'), pk=pk)
+        return self._recipe_cards(
+            request, recommendations.similar(recipe.pk)
+        )
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def recommended(self, request):
+        """Рецепты, похожие на избранное и корзину пользователя."""
+
+        return self._recipe_cards(
+            request, recommendations.recommended(request.user)
+        )
+
+    @staticmethod
+    def _parse_pantry(request):
+        """id имеющихся ингридиентов и минимальное покрытие;
+        ValueError с текстом ошибки для неверных параметров."""
+
+        values = ','.join(request.query_params.getlist('ingredients'))
+        try:
+            ingredient_ids = {
+                int(value) for value in values.split(',') if value.strip()
+            }
+            min_coverage = float(
+                request.query_params.get('min_coverage', 0)
+            )
+            # nan и inf тоже не проходят сравнение.
+            if not 0 <= min_coverage <= 1:
+                raise ValueError
+        except ValueError:
+            raise ValueError('Ингридиенты - список id через запятую, '
+                             'min_coverage - число от 0 до 1.')
+        if not ingredient_ids:
+            raise ValueError('Укажите ингридиенты.')
+        if len(ingredient_ids) > match_conf['MAX_INGREDIENTS']:
+            raise ValueError('Слишком много ингридиентов '
+                             f'(не более {match_conf["MAX_INGREDIENTS"]}).')
+        return ingredient_ids, min_coverage
+
+    @action(detail=False)
+    def match(self, request):
+        """Рецепты, которые можно приготовить из имеющихся
+        ингридиентов (?ingredients=1,2,3), по убыванию покрытия:
+        доли ингридиентов рецепта, которые есть у пользователя.
+        К карточке добавляются покрытие и недостающие ингридиенты."""
+
+        try:
+            ingredient_ids, min_coverage = self._parse_pantry(request)
+        except ValueError as error:
+            return Response(data={'errors': str(error)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        recipe_ids = ingredient_match_index.match(
+            ingredient_ids, min_coverage
+        )
+        page = self.paginate_queryset(recipe_ids)
+        cards = render_recipe_cards(
+            recipe_ids if page is None else page, request
+        )
+        matched = ingredient_match_index.missing(
+            [card['id'] for card in cards], ingredient_ids
+        )
+        ingredients = Ingredient.objects.in_bulk(
+            {pk for _, items in matched.values() for pk, _ in items}
+        )
+        for card in cards:
+            coverage, missing = matched[card['id']]
+            card['coverage'] = round(coverage, 4)
+            card['missing_ingredients'] = [
+                {
+                    'id': pk,
+                    'name': ingredients[pk].name,
+                    'measurement_unit': ingredients[pk].measurement_unit,
+                    'amount': amount,
+                }
+                for pk, amount in missing if pk in ingredients
+            ]
+        if page is None:
+            return Response(cards)
+        return self.get_paginated_response(cards)
+
+    def _retrieve_card(self, request, *args, **kwargs):
+        try:
+            recipe_id = int(self.kwargs['pk'])
+        except ValueError:
+            raise Http404
+        cards = render_recipe_cards([recipe_id], request)
+        if not cards:
+            raise Http404
+        return Response(cards[0])
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self._list_cards, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self._retrieve_card, request, *args, **kwargs
+        )
+
+    def _mark_or_unmark(self, request, field, msg_txt):
         user = get_object_or_404(User, username=request.user)
         recipe = get_object_or_404(Recipe, id=self.kwargs.get('pk'))
+        marked_by = getattr(recipe, field)
+        is_marked = marked_by.filter(pk=user.pk).exists()
         if request.method == 'POST':
-            serializer = RecipeShortSerializer(
-                recipe, context={'request': request})
-            _, is_create = (
-                model.objects.get_or_create(
-                    foodgramuser=user, recipe=recipe
-                )
-            )
-            if not is_create:
+            if is_marked:
                 return Response(data={'errors': f'Рецепт уже {msg_txt}.'},
                                 status=status.HTTP_400_BAD_REQUEST)
+            marked_by.add(user)
+            serializer = RecipeShortSerializer(
+                recipe, context={'request': request})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        target_recipe = model.objects.filter(
-            foodgramuser=user, recipe=recipe
-        )
-        if not target_recipe:
+        if not is_marked:
             return Response(data={'errors': f'Рецепт не был в {msg_txt}!'},
                             status=status.HTTP_400_BAD_REQUEST)
-        target_recipe.delete()
+        marked_by.remove(user)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['post', 'delete'],
             permission_classes=[IsAuthenticated])
     def favorite(self, request, **kwargs):
-        favorite_recipe = Recipe.favorited.through
         msg_place = 'в избранном'
-        return self._mark_or_unmark(
-            request, favorite_recipe, msg_place
-        )
+        return self._mark_or_unmark(request, 'favorited', msg_place)
 
     @action(detail=True, methods=['post', 'delete'],
             permission_classes=[IsAuthenticated])
     def shopping_cart(self, request, **kwargs):
-        shopping_cart_recipe = Recipe.in_shopping_cart.through
         msg_place = 'в корзине'
-        return self._mark_or_unmark(
-            request, shopping_cart_recipe, msg_place
-        )
+        return self._mark_or_unmark(request, 'in_shopping_cart', msg_place)
 
     @action(detail=False, permission_classes=[IsAuthenticated])
     def download_shopping_cart(self, request):
         user = request.user
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__in_shopping_cart=user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-
-        shopping_list = [f'Список покупок для {user.username} на '
-                         f'{datetime.today().strftime("%d/%m/%y")}\n']
-
-        filename = f'{user.username}_shopping_cart.txt'
-        for ingredient in ingredients:
-            shopping_list.append(
-                f'{ingredient["ingredient__name"]}: '
-                f'{ingredient["amount"]} '
-                f'{ingredient["ingredient__measurement_unit"]}'
+        file_format = request.query_params.get('type', 'txt')
+        if file_format not in shopping_cart.EXPORT_FORMATS:
+            return Response(
+                data={'errors': 'Допустимые форматы: '
+                                f'{", ".join(shopping_cart.EXPORT_FORMATS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        shopping_cart = '\n'.join(shopping_list)
-        response = HttpResponse(
-            shopping_cart, content_type='text/plain; charset=utf-8'
-        )
+        content_type, content = shopping_cart.export(user, file_format)
+        filename = f'{user.username}_shopping_cart.{file_format}'
+        response = StreamingHttpResponse(content, content_type=content_type)
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
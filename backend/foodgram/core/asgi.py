@@ -0,0 +1,128 @@
+import functools
+
+from typing import Optional
+
+from asgiref.sync import (
+    iscoroutinefunction, markcoroutinefunction, sync_to_async,
+)
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.urls import resolve
+from django.utils.cache import patch_vary_headers
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.metrics import ROUTE_ATTR, route_name
+from core.renderers import FastJSONRenderer
+
+asgi_conf = settings.ASGI_SETTINGS
+
+RENDERER_FORMAT: str = FastJSONRenderer.format
+
+
+class AsyncUnsupportedError(Exception):
+    """Запрос не поддерживается асинхронным представлением
+    и передаётся синхронному представлению DRF."""
+
+
+class AsyncRoutesMiddleware:
+    """Под ASGI-сервером подключает ASGI_SETTINGS['URLCONF']:
+    асинхронные представления для горячих эндпоинтов чтения
+    поверх обычных маршрутов. Под WSGI ничего не меняет."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if asgi_conf['ENABLED']:
+            request.urlconf = asgi_conf['URLCONF']
+        return await self.get_response(request)
+
+
+async def authenticate(request):
+    """Пользователь по заголовку Authorization: Token <ключ>,
+    как в TokenAuthentication. Для неверного заголовка или токена
+    AsyncUnsupportedError: ответ об ошибке формирует DRF."""
+
+    header = request.headers.get('Authorization', '').split()
+    keyword = TokenAuthentication.keyword
+    if not header or header[0].lower() != keyword.lower():
+        return AnonymousUser()
+    if len(header) != 2:
+        raise AsyncUnsupportedError
+    token = await Token.objects.select_related('user').filter(
+        key=header[1]
+    ).afirst()
+    if token is None or not token.user.is_active:
+        raise AsyncUnsupportedError
+    return token.user
+
+
+async def sync_fallback(request):
+    """Обработка запроса синхронным представлением из ROOT_URLCONF."""
+
+    match = resolve(request.path_info, urlconf=settings.ROOT_URLCONF)
+    request.resolver_match = match
+    setattr(request, ROUTE_ATTR, route_name(match.func, request))
+    view = sync_to_async(match.func)
+    return await view(request, *match.args, **match.kwargs)
+
+
+def json_response(data, status: int = 200) -> HttpResponse:
+    """Ответ с тем же телом, что отдаёт JSONRenderer DRF."""
+
+    response = HttpResponse(
+        FastJSONRenderer().render(data),
+        content_type=FastJSONRenderer.media_type, status=status,
+    )
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+def _supported(request, params: Optional[frozenset]) -> bool:
+    if request.method != 'GET':
+        return False
+    if 'text/html' in request.headers.get('Accept', ''):
+        return False
+    if params is None:
+        return 'format' not in request.GET
+    return set(request.GET) <= params
+
+
+def async_read_view(basename: str, action: str,
+                    params: Optional[frozenset] = None):
+    """Асинхронное представление для GET-запросов к эндпоинту
+    вьюсета basename. Остальные методы, параметры не из params,
+    формат отличный от JSON и ошибки (AsyncUnsupportedError) обрабатывает
+    синхронный вьюсет. Атрибуты initkwargs и actions дают метрикам
+    то же имя маршрута, что у вьюсета."""
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if not _supported(request, params):
+                    raise AsyncUnsupportedError
+                request.user = await authenticate(request)
+                return await view(request, *args, **kwargs)
+            except AsyncUnsupportedError:
+                return await sync_fallback(request)
+
+        wrapper.csrf_exempt = True
+        wrapper.initkwargs = {'basename': basename}
+        wrapper.actions = {'get': action}
+        return wrapper
+
+    return decorator
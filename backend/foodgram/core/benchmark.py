@@ -0,0 +1,466 @@
+import asyncio
+import base64
+import io
+import json
+import random
+import time
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.parse import quote, unquote
+from urllib.request import Request, urlopen
+
+import numpy as np
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.db import connection, connections
+from django.test import Client
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from core.metrics import QueryRecorder
+from recipes.models import Ingredient, Recipe, Tag
+
+Call = Tuple[str, str, Optional[dict]]
+
+SAMPLE_SIZE: int = 200
+SAFE_CHARS: str = "/?=&%:"
+# Доля ответов не 2xx, при которой замер сценария недействителен:
+# время ошибок не отражает работу эндпоинта.
+MAX_ERROR_RATE: float = 0.5
+IMAGE_SIZE: Tuple[int, int] = (640, 480)
+
+
+def _image_payload(rng: random.Random) -> str:
+    """Изображение рецепта в base64, как его отправляет фронтенд.
+    Одно на прогон: повторные загрузки хранятся одним файлом."""
+
+    buffer = io.BytesIO()
+    color = tuple(rng.randrange(256) for _ in range(3))
+    Image.new('RGB', IMAGE_SIZE, color).save(buffer, 'JPEG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/jpeg;base64,{encoded}'
+
+
+class BenchmarkContext:
+    """Данные для построения запросов сценариев: пользователь,
+    от имени которого идут авторизованные запросы, выборки
+    существующих id, тэгов и начал названий ингридиентов
+    и изображение для создаваемых рецептов. Всё читается
+    заранее, чтобы построение запроса не обращалось к базе."""
+
+    def __init__(self, user, seed: int):
+        self.user = user
+        self.rng = random.Random(seed)
+        self.token = Token.objects.get_or_create(user=user)[0].key
+        self.recipe_ids = list(Recipe.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        )[:SAMPLE_SIZE])
+        self.tag_slugs = list(Tag.objects.values_list('slug', flat=True))
+        self.tag_ids = list(Tag.objects.order_by('pk').values_list(
+            'pk', flat=True
+        )[:2])
+        self.prefixes = sorted({
+            name[:3] for name in Ingredient.objects.order_by('pk').values_list(
+                'name', flat=True
+            )[:SAMPLE_SIZE]
+        })
+        self.ingredient_ids = list(Ingredient.objects.order_by(
+            'pk'
+        ).values_list('pk', flat=True)[:SAMPLE_SIZE])
+        self.image = _image_payload(self.rng)
+        self.created: List[int] = []
+
+
+def _recipes_list(context: BenchmarkContext) -> Call:
+    page = context.rng.randint(1, 5)
+    return 'get', f'/api/recipes/?page={page}&limit=6', None
+
+
+def _recipes_filtered(context: BenchmarkContext) -> Call:
+    slugs = context.rng.sample(
+        context.tag_slugs, min(2, len(context.tag_slugs))
+    )
+    tags = ''.join(f'&tags={slug}' for slug in slugs)
+    return 'get', f'/api/recipes/?limit=6&is_favorited=0{tags}', None
+
+
+def _recipes_retrieve(context: BenchmarkContext) -> Call:
+    recipe_id = context.rng.choice(context.recipe_ids)
+    return 'get', f'/api/recipes/{recipe_id}/', None
+
+
+def _subscriptions(context: BenchmarkContext) -> Call:
+    return 'get', '/api/users/subscriptions/?limit=6&recipes_limit=3', None
+
+
+def _shopping_cart(context: BenchmarkContext) -> Call:
+    return 'get', '/api/recipes/download_shopping_cart/', None
+
+
+def _ingredient_search(context: BenchmarkContext) -> Call:
+    prefix = context.rng.choice(context.prefixes)
+    return 'get', f'/api/ingredients/?name={prefix}', None
+
+
+def _recipe_create(context: BenchmarkContext) -> Call:
+    ingredients = context.rng.sample(
+        context.ingredient_ids, min(8, len(context.ingredient_ids))
+    )
+    return 'post', '/api/recipes/', {
+        'name': f'Замер {context.rng.randint(0, 10 ** 6)}',
+        'text': 'Рецепт для нагрузочного замера.',
+        'cooking_time': context.rng.randint(5, 120),
+        'image': context.image,
+        'tags': context.tag_ids,
+        'ingredients': [
+            {'id': pk, 'amount': context.rng.randint(1, 500)}
+            for pk in ingredients
+        ],
+    }
+
+
+# Сценарий: (нужна ли авторизация, построитель запроса).
+SCENARIOS: Dict[str, Tuple[bool, Callable[[BenchmarkContext], Call]]] = {
+    'recipes-list': (False, _recipes_list),
+    'recipes-list-filtered': (True, _recipes_filtered),
+    'recipes-retrieve': (True, _recipes_retrieve),
+    'users-subscriptions': (True, _subscriptions),
+    'recipes-download_shopping_cart': (True, _shopping_cart),
+    'ingredients-search': (False, _ingredient_search),
+    'recipes-create': (True, _recipe_create),
+}
+
+
+# Сценарии чтения, у которых есть асинхронные представления.
+READ_SCENARIOS: Tuple[str, ...] = (
+    'recipes-list', 'recipes-list-filtered', 'recipes-retrieve',
+    'ingredients-search',
+)
+
+
+def _host() -> str:
+    for host in settings.ALLOWED_HOSTS:
+        if host and host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def _request(client: Client, context, auth: bool, call: Call):
+    method, path, data = call
+    headers = {'HTTP_AUTHORIZATION': f'Token {context.token}'} if auth else {}
+    if data is not None:
+        response = getattr(client, method)(
+            path, json.dumps(data), content_type='application/json',
+            **headers,
+        )
+    else:
+        response = getattr(client, method)(path, **headers)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    if method == 'post' and response.status_code == 201:
+        context.created.append(response.json()['id'])
+    return response
+
+
+def _measure(client: Client, context, auth: bool, call: Call):
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        start = time.perf_counter()
+        response = _request(client, context, auth, call)
+        duration = time.perf_counter() - start
+    return duration, recorder.count, response.status_code
+
+
+def _error_rate(statuses: Counter) -> float:
+    errors = sum(
+        count for code, count in statuses.items() if not 200 <= code < 300
+    )
+    return round(errors / sum(statuses.values()), 3)
+
+
+def _summary(durations: List[float], queries: List[int], statuses) -> dict:
+    p50, p95 = np.percentile(durations, (50, 95)) * 1000
+    error_rate = _error_rate(statuses)
+    queries_p50, queries_p95 = np.percentile(queries, (50, 95))
+    return {
+        'iterations': len(durations),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'mean_ms': round(float(np.mean(durations) * 1000), 3),
+        'max_ms': round(float(np.max(durations) * 1000), 3),
+        'queries_p50': float(queries_p50),
+        'queries_p95': float(queries_p95),
+        'queries_max': int(np.max(queries)),
+        'statuses': {str(code): count for code, count in statuses.items()},
+        'error_rate': error_rate,
+        'failed': error_rate > MAX_ERROR_RATE,
+    }
+
+
+def run(user, scenarios: List[str], iterations: int, warmup: int,
+        seed: int) -> dict:
+    """Прогоняет сценарии через настоящие URL, middleware и вьюсеты
+    DRF в текущем процессе. Для каждого сценария - перцентили
+    времени ответа и числа SQL-запросов; сценарий, в котором
+    ответов не 2xx больше MAX_ERROR_RATE, отмечается failed
+    и попадает в meta['failed']. Созданные при замере рецепты
+    удаляются."""
+
+    context = BenchmarkContext(user, seed)
+    client = Client(HTTP_HOST=_host())
+    results = {}
+    try:
+        for name in scenarios:
+            auth, build = SCENARIOS[name]
+            durations, queries, statuses = [], [], Counter()
+            for number in range(warmup + iterations):
+                duration, count, status = _measure(
+                    client, context, auth, build(context)
+                )
+                if number < warmup:
+                    continue
+                durations.append(duration)
+                queries.append(count)
+                statuses[status] += 1
+            results[name] = _summary(durations, queries, statuses)
+    finally:
+        Recipe.objects.filter(pk__in=context.created).delete()
+    return {
+        'meta': {
+            'database': connection.vendor,
+            'user': user.username,
+            'recipes': Recipe.objects.count(),
+            'iterations': iterations,
+            'warmup': warmup,
+            'seed': seed,
+            'failed': failed_scenarios(results),
+        },
+        'scenarios': results,
+    }
+
+
+def failed_scenarios(results: Dict[str, dict]) -> List[str]:
+    """Сценарии, замер которых недействителен из-за ошибок."""
+
+    return [name for name, result in results.items() if result['failed']]
+
+
+def compare(current: dict, baseline: dict, tolerance: float):
+    """Сравнение с прошлым прогоном: строки отчёта и признак
+    регрессии (p95 вырос больше чем на tolerance, выросло
+    число запросов или сценарий отвечал ошибками)."""
+
+    lines, regressed = [], False
+    for name, result in current['scenarios'].items():
+        if result['failed']:
+            regressed = True
+            lines.append(f'{name}: ошибочных ответов '
+                         f'{result["error_rate"]:.0%}, замер недействителен')
+            continue
+        base = baseline.get('scenarios', {}).get(name)
+        if base is None or base.get('failed'):
+            continue
+        ratio = result['p95_ms'] / base['p95_ms'] if base['p95_ms'] else 1
+        slower = ratio > 1 + tolerance
+        more_queries = result['queries_p95'] > base['queries_p95']
+        regressed |= slower or more_queries
+        mark = ' РЕГРЕССИЯ' if slower or more_queries else ''
+        lines.append(
+            f'{name}: p95 {base["p95_ms"]} -> {result["p95_ms"]} мс '
+            f'({ratio:.2f}x), запросов {base["queries_p95"]} -> '
+            f'{result["queries_p95"]}{mark}'
+        )
+    return lines, regressed
+
+
+def _calls(context: BenchmarkContext, scenarios, requests: int):
+    calls = []
+    for number in range(requests):
+        auth, build = SCENARIOS[scenarios[number % len(scenarios)]]
+        calls.append((auth, build(context)))
+    return calls
+
+
+def _throughput(latencies: List[float], statuses, seconds: float) -> dict:
+    p50, p95 = np.percentile(latencies, (50, 95)) * 1000
+    error_rate = _error_rate(statuses)
+    return {
+        'requests': len(latencies),
+        'seconds': round(seconds, 3),
+        'rps': round(len(latencies) / seconds, 1),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'statuses': {str(code): count for code, count in statuses.items()},
+        'error_rate': error_rate,
+        'failed': error_rate > MAX_ERROR_RATE,
+    }
+
+
+def _wsgi_worker(context, calls) -> Tuple[List[float], Counter]:
+    client = Client(HTTP_HOST=_host())
+    latencies, statuses = [], Counter()
+    try:
+        for auth, call in calls:
+            start = time.perf_counter()
+            response = _request(client, context, auth, call)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+    finally:
+        connections.close_all()
+    return latencies, statuses
+
+
+def _run_wsgi(context, calls, concurrency: int) -> dict:
+    """Синхронный стек (WSGIHandler) в concurrency потоках."""
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(
+            lambda part: _wsgi_worker(context, calls[part::concurrency]),
+            range(concurrency),
+        ))
+    seconds = time.perf_counter() - start
+    latencies = [value for part, _ in results for value in part]
+    return _throughput(
+        latencies, sum((part for _, part in results), Counter()), seconds
+    )
+
+
+async def _asgi_get(application, path: str, headers) -> int:
+    """GET-запрос к ASGI-приложению так, как его передаёт сервер."""
+
+    path, _, query = quote(path, safe=SAFE_CHARS).partition('?')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': unquote(path),
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', _host().encode()), *headers],
+        'client': ('127.0.0.1', 0),
+        'server': (_host(), 80),
+    }
+    messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    disconnected = asyncio.Event()
+    started = {}
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            started.update(message)
+
+    await application(scope, receive, send)
+    return started['status']
+
+
+async def _asgi_requests(context, calls, concurrency: int):
+    application = get_asgi_application()
+    semaphore = asyncio.Semaphore(concurrency)
+    token = [(b'authorization', f'Token {context.token}'.encode())]
+    statuses = Counter()
+
+    async def send(auth: bool, call: Call) -> float:
+        async with semaphore:
+            start = time.perf_counter()
+            status = await _asgi_get(
+                application, call[1], token if auth else []
+            )
+            statuses[status] += 1
+            return time.perf_counter() - start
+
+    latencies = await asyncio.gather(
+        *(send(auth, call) for auth, call in calls)
+    )
+    return list(latencies), statuses
+
+
+def _run_asgi(context, calls, concurrency: int) -> dict:
+    """Асинхронный стек: ASGIHandler, как под ASGI-сервером,
+    с concurrency одновременными запросами в одном цикле событий."""
+
+    start = time.perf_counter()
+    latencies, statuses = asyncio.run(
+        _asgi_requests(context, calls, concurrency)
+    )
+    return _throughput(latencies, statuses, time.perf_counter() - start)
+
+
+def _live_request(base_url: str, token: str, auth: bool, call: Call):
+    request = Request(
+        base_url.rstrip('/') + quote(call[1], safe=SAFE_CHARS)
+    )
+    if auth:
+        request.add_header('Authorization', f'Token {token}')
+    start = time.perf_counter()
+    try:
+        with urlopen(request) as response:
+            response.read()
+            status = response.status
+    except HTTPError as error:
+        status = error.code
+    return time.perf_counter() - start, status
+
+
+def _run_live(base_url: str, context, calls, concurrency: int) -> dict:
+    """Запросы по HTTP к запущенному серверу."""
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(
+            lambda item: _live_request(base_url, context.token, *item),
+            calls,
+        ))
+    seconds = time.perf_counter() - start
+    return _throughput(
+        [latency for latency, _ in results],
+        Counter(status for _, status in results), seconds,
+    )
+
+
+def compare_servers(user, scenarios: List[str], requests: int,
+                    concurrency: int, seed: int,
+                    urls: Optional[List[str]] = None) -> dict:
+    """Пропускная способность эндпоинтов чтения: одинаковая
+    последовательность запросов через синхронный (WSGI) и асинхронный
+    (ASGI) стек Django в текущем процессе или, если заданы urls,
+    по HTTP к запущенным серверам (например, gunicorn с синхронными
+    воркерами и с UvicornWorker)."""
+
+    context = BenchmarkContext(user, seed)
+    calls = _calls(context, scenarios, requests)
+    if urls:
+        modes = {url: _run_live(url, context, calls, concurrency)
+                 for url in urls}
+    else:
+        modes = {
+            'wsgi': _run_wsgi(context, calls, concurrency),
+            'asgi': _run_asgi(context, calls, concurrency),
+        }
+    return {
+        'meta': {
+            'database': connection.vendor,
+            'user': user.username,
+            'recipes': Recipe.objects.count(),
+            'requests': requests,
+            'concurrency': concurrency,
+            'scenarios': scenarios,
+            'seed': seed,
+        },
+        'modes': modes,
+    }
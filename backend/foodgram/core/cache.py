@@ -0,0 +1,195 @@
+import atexit
+import threading
+
+from collections import defaultdict
+from typing import Callable, Dict, Iterable
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from core.db_router import use_primary
+
+cache_conf = settings.API_CACHE_SETTINGS
+
+STATS_KEY: str = 'cache_stats:{}:{}'
+
+
+class CacheStats:
+    """Счётчики попаданий и промахов кеша по пространствам имён.
+    Счётчики копятся в памяти процесса и каждые STATS_FLUSH_EVERY
+    обращений переносятся в общий кеш, чтобы их можно было
+    суммировать по всем воркерам."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {'hits': 0, 'misses': 0}
+        )
+        self._pending = 0
+        self.namespaces = set()
+        atexit.register(self.flush)
+
+    def record(self, namespace: str, hits: int = 0, misses: int = 0):
+        with self._lock:
+            self._local[namespace]['hits'] += hits
+            self._local[namespace]['misses'] += misses
+            self._pending += hits + misses
+            if self._pending < cache_conf['STATS_FLUSH_EVERY']:
+                return
+            local, self._local = self._local, defaultdict(
+                lambda: {'hits': 0, 'misses': 0}
+            )
+            self._pending = 0
+        self._flush(local)
+
+    def _flush(self, local) -> None:
+        backend = caches[cache_conf['ALIAS']]
+        for namespace, counters in local.items():
+            for name, value in counters.items():
+                if not value:
+                    continue
+                key = STATS_KEY.format(namespace, name)
+                backend.add(key, 0, timeout=None)
+                try:
+                    backend.incr(key, value)
+                except ValueError:
+                    backend.set(key, value, timeout=None)
+
+    def flush(self) -> None:
+        with self._lock:
+            local, self._local = self._local, defaultdict(
+                lambda: {'hits': 0, 'misses': 0}
+            )
+            self._pending = 0
+        if local:
+            self._flush(local)
+
+    def totals(self) -> Dict[str, Dict[str, int]]:
+        """Суммарные счётчики по всем процессам."""
+
+        self.flush()
+        backend = caches[cache_conf['ALIAS']]
+        keys = {
+            STATS_KEY.format(namespace, name): (namespace, name)
+            for namespace in sorted(self.namespaces)
+            for name in ('hits', 'misses')
+        }
+        values = backend.get_many(keys)
+        result = {}
+        for key, (namespace, name) in keys.items():
+            result.setdefault(namespace, {})[name] = values.get(key, 0)
+        return result
+
+
+stats = CacheStats()
+
+
+def user_flag_key(user_id, name: str) -> str:
+    return f'{user_id}:{name}'
+
+
+class CacheNamespace:
+    """Пространство имён в кеше с версионированием ключей.
+    invalidate_all() увеличивает версию пространства, после чего
+    все ранее сохранённые ключи перестают читаться и вытесняются
+    по таймауту - это позволяет сбросить весь набор одной операцией
+    на любом бэкенде, включая файловый и Redis."""
+
+    def __init__(self, prefix: str, timeout: int):
+        self.prefix = prefix
+        self.timeout = timeout
+        stats.namespaces.add(prefix)
+
+    @property
+    def _cache(self):
+        return caches[cache_conf['ALIAS']]
+
+    def _version(self) -> int:
+        key = f'{self.prefix}:version'
+        version = self._cache.get(key)
+        if version is None:
+            self._cache.add(key, 1, timeout=None)
+            return self._cache.get(key, 1)
+        return version
+
+    def _key(self, version: int, key) -> str:
+        return f'{self.prefix}:{version}:{key}'
+
+    def get_many(self, keys: Iterable) -> dict:
+        keys = list(keys)
+        if not keys:
+            return {}
+        version = self._version()
+        found = self._cache.get_many(
+            [self._key(version, key) for key in keys]
+        )
+        result = {
+            key: found[self._key(version, key)]
+            for key in keys if self._key(version, key) in found
+        }
+        stats.record(
+            self.prefix, hits=len(result), misses=len(keys) - len(result)
+        )
+        return result
+
+    def set_many(self, data: dict) -> None:
+        if not data:
+            return
+        version = self._version()
+        self._cache.set_many(
+            {self._key(version, key): value for key, value in data.items()},
+            timeout=self.timeout,
+        )
+
+    def get_or_set(self, key, default: Callable):
+        value = self.get_many([key]).get(key)
+        if value is None:
+            value = default()
+            self.set_many({key: value})
+        return value
+
+    def delete_many(self, keys: Iterable) -> None:
+        keys = list(keys)
+        if keys:
+            version = self._version()
+            self._cache.delete_many([self._key(version, key) for key in keys])
+
+    def invalidate_all(self) -> None:
+        key = f'{self.prefix}:version'
+        self._cache.add(key, 1, timeout=None)
+        try:
+            self._cache.incr(key)
+        except ValueError:
+            self._cache.set(key, 2, timeout=None)
+
+
+recipe_cards = CacheNamespace(
+    'recipe_card', cache_conf['RECIPE_CARD_TIMEOUT']
+)
+reference_lists = CacheNamespace(
+    'reference', cache_conf['REFERENCE_TIMEOUT']
+)
+user_flags = CacheNamespace(
+    'user_flags', cache_conf['USER_FLAGS_TIMEOUT']
+)
+recommendations = CacheNamespace(
+    'recommended', settings.RECOMMENDATION_SETTINGS['CACHE_TIMEOUT']
+)
+
+
+class CachedListMixin:
+    """Кеширует сериализованный ответ list во вьюсетах справочников.
+    Ключ включает путь запроса вместе с параметрами, весь набор
+    сбрасывается через reference_lists.invalidate_all()."""
+
+    list_cache_prefix: str = ''
+
+    def list(self, request, *args, **kwargs):
+        key = f'{self.list_cache_prefix}:{request.get_full_path()}'
+        data = reference_lists.get_many([key]).get(key)
+        if data is None:
+            with use_primary():
+                data = super().list(request, *args, **kwargs).data
+            reference_lists.set_many({key: data})
+        return Response(data)
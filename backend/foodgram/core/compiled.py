@@ -0,0 +1,148 @@
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from django.db.models import ForeignObjectRel
+from rest_framework import serializers
+
+Row = Dict[str, Any]
+Builder = Callable[[Row, dict], Any]
+# Функция для SerializerMethodField: поля .values(), которые она
+# получает аргументами, и сама функция.
+MethodSpec = Tuple[Sequence[str], Callable]
+
+PLAIN_FIELDS = (
+    serializers.BooleanField, serializers.CharField,
+    serializers.IntegerField, serializers.PrimaryKeyRelatedField,
+)
+
+
+class SerializerCompileError(Exception):
+    """Поле сериализатора не поддерживается компиляцией."""
+
+
+def _lookup(source: str) -> str:
+    return source.replace('.', '__')
+
+
+class CompiledSerializer:
+    """Представления ModelSerializer, собранные из строк .values()
+    обычными словарями, без создания моделей и вызова
+    to_representation каждого поля. Набор, порядок и источники
+    полей берутся из сериализатора (он остаётся описанием схемы).
+    Поддерживаются поля модели, файлы (URL без request), вложенные
+    ModelSerializer (один объект и many=True - отдельным запросом)
+    и SerializerMethodField, для которых в methods передана функция
+    по пути поля ('author.is_subscribed')."""
+
+    def __init__(self, serializer, methods: Dict[str, MethodSpec],
+                 prefix: str = '', path: str = ''):
+        self.model = serializer.Meta.model
+        self.prefix = prefix
+        self.lookups: List[str] = []
+        self.relations: Dict[str, Relation] = {}
+        self.pk = self._column('pk')
+        self.builders: List[Tuple[str, Builder]] = [
+            (name, self._compile(f'{path}{name}', field, methods))
+            for name, field in serializer.fields.items()
+        ]
+
+    def _column(self, lookup: str) -> str:
+        column = f'{self.prefix}{lookup}'
+        if column not in self.lookups:
+            self.lookups.append(column)
+        return column
+
+    def _method(self, key: str, methods: Dict[str, MethodSpec]) -> Builder:
+        if key not in methods:
+            raise SerializerCompileError(f'Нет функции для поля {key}')
+        lookups, method = methods[key]
+        columns = [self._column(lookup) for lookup in lookups]
+        return lambda row, related: method(*(row[col] for col in columns))
+
+    def _nested(self, key: str, field, methods) -> Builder:
+        nested = CompiledSerializer(
+            field, methods,
+            prefix=f'{self.prefix}{_lookup(field.source)}__', path=f'{key}.',
+        )
+        if nested.relations:
+            raise SerializerCompileError(
+                f'Связи many=True внутри {key} не поддерживаются'
+            )
+        for column in nested.lookups:
+            self._column(column[len(self.prefix):])
+        return lambda row, related: (
+            None if row[nested.pk] is None else nested.build(row, related)
+        )
+
+    def _file(self, field) -> Builder:
+        storage = self.model._meta.get_field(field.source).storage
+        column = self._column(field.source)
+        return lambda row, related: (
+            storage.url(row[column]) if row[column] else None
+        )
+
+    def _compile(self, key: str, field, methods) -> Builder:
+        if isinstance(field, serializers.SerializerMethodField):
+            return self._method(key, methods)
+        if isinstance(field, serializers.ListSerializer):
+            self.relations[key] = Relation(self.model, field, methods, key)
+            return lambda row, related: related[key].get(row[self.pk], [])
+        if isinstance(field, serializers.BaseSerializer):
+            return self._nested(key, field, methods)
+        if isinstance(field, serializers.FileField):
+            return self._file(field)
+        if isinstance(field, PLAIN_FIELDS):
+            column = self._column(_lookup(field.source))
+            return lambda row, related: row[column]
+        raise SerializerCompileError(
+            f'Поле {key} ({type(field).__name__}) не поддерживается'
+        )
+
+    def build(self, row: Row, related: dict) -> dict:
+        return {name: build(row, related) for name, build in self.builders}
+
+    def serialize_rows(self, rows: List[Row]) -> List[dict]:
+        ids = [row[self.pk] for row in rows]
+        related = {
+            key: relation.fetch(ids)
+            for key, relation in self.relations.items()
+        }
+        return [self.build(row, related) for row in rows]
+
+    def serialize(self, queryset) -> List[dict]:
+        """Представления объектов queryset: один запрос .values()
+        и по одному на каждую связь many=True."""
+
+        return self.serialize_rows(list(queryset.values(*self.lookups)))
+
+
+class Relation:
+    """Вложенный сериализатор many=True: обратный ForeignKey
+    или ManyToMany. Объекты всех родителей читаются одним
+    запросом и группируются по id родителя."""
+
+    def __init__(self, model, field, methods, key: str):
+        descriptor = model._meta.get_field(field.source)
+        if not (descriptor.one_to_many or descriptor.many_to_many):
+            raise SerializerCompileError(f'Связь {key} не поддерживается')
+        self.parent = (
+            descriptor.field.name
+            if isinstance(descriptor, ForeignObjectRel)
+            else descriptor.related_query_name()
+        )
+        self.serializer = CompiledSerializer(
+            field.child, methods, path=f'{key}.'
+        )
+        self.columns = [*self.serializer.lookups]
+        if self.parent not in self.columns:
+            self.columns.append(self.parent)
+
+    def fetch(self, parent_ids) -> Dict[Any, List[dict]]:
+        model = self.serializer.model
+        rows = list(model._default_manager.filter(
+            **{f'{self.parent}__in': parent_ids}
+        ).values(*self.columns))
+        grouped = defaultdict(list)
+        for row, data in zip(rows, self.serializer.serialize_rows(rows)):
+            grouped[row[self.parent]].append(data)
+        return grouped
@@ -0,0 +1,105 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(request, version, renderer_format: str) -> str:
+    """ETag ответа: версия данных, пользователь, путь с параметрами
+    и формат ответа."""
+
+    user = request.user
+    key = '|'.join(map(str, (
+        version,
+        user.pk if user.is_authenticated else '',
+        request.get_full_path(),
+        renderer_format,
+    )))
+    return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+
+def patch_conditional_headers(response, etag: str, last_modified,
+                              anonymous: bool, public_max_age: int):
+    """Валидаторы и политика кеширования ответа."""
+
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    if anonymous:
+        patch_cache_control(response, public=True, max_age=public_max_age)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+class ConditionalGetMixin:
+    """Условные GET-запросы (ETag/Last-Modified) для вьюсетов.
+    Валидаторы ответа вычисляются по версии данных, без сериализации:
+    если клиент прислал актуальный ETag, вьюсет отвечает 304 и не
+    обращается к сериализатору. Анонимным пользователям отдаётся
+    публичный Cache-Control, который может учитывать nginx,
+    авторизованным - приватный с обязательной перепроверкой."""
+
+    public_max_age: int = 0
+    modified_field: str = 'updated_at'
+
+    def get_cache_validators(self, request):
+        """Возвращает пару (версия, дата изменения) или None,
+        если условный ответ для запроса не поддерживается.
+        По умолчанию версия - число записей и дата последнего
+        изменения среди них."""
+
+        queryset = self.get_queryset()
+        if self.action == 'retrieve':
+            lookup = self.lookup_url_kwarg or self.lookup_field
+            try:
+                queryset = queryset.filter(
+                    **{self.lookup_field: self.kwargs[lookup]}
+                )
+            except (TypeError, ValueError, ValidationError):
+                return None
+        version = queryset.order_by().aggregate(
+            count=Count('pk'), modified=Max(self.modified_field)
+        )
+        return tuple(version.values()), version['modified']
+
+    def _get_etag(self, request, version) -> str:
+        return make_etag(
+            request, version, request.accepted_renderer.format
+        )
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        validators = self.get_cache_validators(request)
+        if validators is None:
+            return handler(request, *args, **kwargs)
+        version, modified = validators
+        etag = self._get_etag(request, version)
+        anonymous = request.user.is_anonymous
+        last_modified = None
+        if anonymous and modified and self.action == 'retrieve':
+            last_modified = int(modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return patch_conditional_headers(
+            response, etag, last_modified, anonymous, self.public_max_age
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
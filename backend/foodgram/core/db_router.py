@@ -0,0 +1,175 @@
+import hashlib
+import random
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from asgiref.sync import (
+    iscoroutinefunction, markcoroutinefunction, sync_to_async,
+)
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+replica_conf = settings.DB_REPLICA_SETTINGS
+
+PIN_KEY: str = 'db_pin:{}'
+
+_UNSET = object()
+
+
+def _client_key(request) -> Optional[str]:
+    """Ключ клиента для привязки к основной базе: хеш заголовка
+    Authorization (пользователь определяется DRF уже во вьюсете)."""
+
+    header = request.headers.get('Authorization')
+    if not header:
+        return None
+    return PIN_KEY.format(hashlib.md5(header.encode()).hexdigest())
+
+
+class RequestRouting:
+    """Выбор базы для чтения в рамках одного запроса: реплика
+    выбирается один раз, когда известен маршрут, и не меняется
+    до конца запроса."""
+
+    def __init__(self, request):
+        self.request = request
+        self._replica = _UNSET
+
+    def _pinned(self) -> bool:
+        key = _client_key(self.request)
+        return key is not None and bool(
+            caches[replica_conf['CACHE_ALIAS']].get(key)
+        )
+
+    def _choose(self, match) -> Optional[str]:
+        basename = getattr(match.func, 'initkwargs', {}).get('basename')
+        if (
+            self.request.method not in SAFE_METHODS
+            or basename not in replica_conf['ROUTES']
+            or self._pinned()
+        ):
+            return None
+        return random.choice(replica_conf['REPLICAS'])
+
+    def wrote(self) -> None:
+        """После записи запрос до конца читает с основной базы."""
+
+        self._replica = None
+
+    @property
+    def replica(self) -> Optional[str]:
+        if self._replica is _UNSET:
+            match = self.request.resolver_match
+            if match is None:
+                return None
+            self._replica = self._choose(match)
+        return self._replica
+
+
+_routing: ContextVar[Optional[RequestRouting]] = ContextVar(
+    'db_routing', default=None
+)
+
+
+@contextmanager
+def use_primary():
+    """Чтение с основной базы внутри блока. Нужен там, где
+    прочитанное попадает в общий кеш: устаревшие данные реплики
+    остались бы в нём до следующего сброса."""
+
+    token = _routing.set(None)
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+class ReplicaRouter:
+    """GET-запросы к вьюсетам из ROUTES читают с реплик
+    (до первой записи в запросе), всё остальное - с основной
+    базы. Связанные объекты читаются из той же базы, что и
+    исходный объект. Миграции применяются только к основной базе."""
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        routing = _routing.get()
+        if (
+            routing is None
+            or model._meta.app_label in replica_conf['PRIMARY_APPS']
+        ):
+            return None
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """Делает запрос доступным роутеру. После успешной записи
+    клиент на PIN_SECONDS привязывается к основной базе, чтобы
+    сразу видеть свои изменения, пока они доходят до реплик."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _wrote(request, response) -> bool:
+        return (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+        )
+
+    @staticmethod
+    def _pin(request) -> None:
+        key = _client_key(request)
+        if key is not None:
+            caches[replica_conf['CACHE_ALIAS']].set(
+                key, True, replica_conf['PIN_SECONDS']
+            )
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not replica_conf['REPLICAS']:
+            return self.get_response(request)
+        token = _routing.set(RequestRouting(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if self._wrote(request, response):
+            self._pin(request)
+        return response
+
+    async def __acall__(self, request):
+        if not replica_conf['REPLICAS']:
+            return await self.get_response(request)
+        token = _routing.set(RequestRouting(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if self._wrote(request, response):
+            await sync_to_async(self._pin)(request)
+        return response
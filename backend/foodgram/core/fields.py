@@ -0,0 +1,82 @@
+import base64
+import binascii
+import hashlib
+import re
+
+from tempfile import SpooledTemporaryFile
+
+import filetype
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+
+from recipes import images
+
+image_conf = settings.IMAGE_SETTINGS
+
+BASE64_HEADER: str = ';base64,'
+WHITESPACE = re.compile(r'\s+')
+
+
+class StreamingBase64ImageField(Base64ImageField):
+    """Изображение в base64 с потоковым декодированием.
+    Строка декодируется частями во временный файл (в памяти до
+    SPOOL_SIZE, дальше на диске) с одновременным подсчётом sha256,
+    без промежуточной копии всего файла. Поле возвращает
+    проверенное изображение (images.PendingImage): в хранилище
+    под именем по содержимому его сохраняет сериализатор при
+    записи рецепта; уменьшенные копии строятся позже, в фоне."""
+
+    def _payload(self, data: str) -> str:
+        payload = data.rpartition(BASE64_HEADER)[2]
+        if WHITESPACE.search(payload):
+            payload = WHITESPACE.sub('', payload)
+        if len(payload) * 3 // 4 > image_conf['MAX_UPLOAD_SIZE']:
+            limit = image_conf['MAX_UPLOAD_SIZE'] // (1024 * 1024)
+            raise ValidationError(
+                f'Размер изображения не должен превышать {limit} МБ.'
+            )
+        return payload
+
+    def _decode(self, payload: str, file) -> str:
+        digest = hashlib.sha256()
+        chunk_size = image_conf['DECODE_CHUNK_SIZE'] // 4 * 4
+        try:
+            for start in range(0, len(payload), chunk_size):
+                chunk = base64.b64decode(
+                    payload[start:start + chunk_size], validate=True
+                )
+                digest.update(chunk)
+                file.write(chunk)
+        except (binascii.Error, ValueError):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        return digest.hexdigest()
+
+    def _extension(self, file) -> str:
+        file.seek(0)
+        extension = filetype.guess_extension(file.read(261))
+        if extension not in self.ALLOWED_TYPES:
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+        file.seek(0)
+        try:
+            Image.open(file).verify()
+        except Exception:
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        return extension
+
+    def to_internal_value(self, data):
+        if data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(data, str):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        payload = self._payload(data)
+        file = SpooledTemporaryFile(max_size=image_conf['SPOOL_SIZE'])
+        try:
+            digest = self._decode(payload, file)
+            extension = self._extension(file)
+        except ValidationError:
+            file.close()
+            raise
+        return images.PendingImage(file, digest, extension)
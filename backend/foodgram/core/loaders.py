@@ -0,0 +1,73 @@
+from collections import defaultdict
+from typing import Dict, Iterable, Set
+
+from django.contrib.auth.models import AnonymousUser
+from rest_framework import serializers
+
+from recipes.counters import Favorited, ShoppingCart
+from users.models import Follow
+
+LOADER_ATTR: str = '_flag_loader'
+
+FLAG_QUERIES: dict = {
+    'favorites': lambda user, ids: Favorited.objects.filter(
+        foodgramuser=user, recipe_id__in=ids
+    ).values_list('recipe_id', flat=True),
+    'cart': lambda user, ids: ShoppingCart.objects.filter(
+        foodgramuser=user, recipe_id__in=ids
+    ).values_list('recipe_id', flat=True),
+    'followings': lambda user, ids: Follow.objects.filter(
+        follower=user, author_id__in=ids
+    ).values_list('author_id', flat=True),
+}
+
+
+class FlagLoader:
+    """Флаги текущего пользователя (избранное, корзина, подписки)
+    в духе DataLoader. Сериализаторы списков заранее сообщают
+    id объектов (prime), а первый запрошенный флаг загружает
+    все накопленные id одним запросом IN на каждый вид флага.
+    Загруженные значения живут до конца запроса."""
+
+    def __init__(self, user):
+        self.user = user
+        self._pending: Dict[str, Set[int]] = defaultdict(set)
+        self._loaded: Dict[str, Dict[int, bool]] = defaultdict(dict)
+
+    def prime(self, name: str, ids: Iterable[int]) -> None:
+        loaded = self._loaded[name]
+        self._pending[name].update(pk for pk in ids if pk not in loaded)
+
+    def load(self, name: str, pk: int) -> bool:
+        if self.user.is_anonymous:
+            return False
+        loaded = self._loaded[name]
+        if pk not in loaded:
+            ids = self._pending.pop(name, set()) | {pk}
+            found = set(FLAG_QUERIES[name](self.user, ids))
+            loaded.update((key, key in found) for key in ids)
+        return loaded[pk]
+
+
+def get_flag_loader(request) -> FlagLoader:
+    """Загрузчик флагов, общий для всех сериализаторов запроса."""
+
+    if request is None:
+        return FlagLoader(AnonymousUser())
+    loader = getattr(request, LOADER_ATTR, None)
+    if loader is None or loader.user != request.user:
+        loader = FlagLoader(request.user)
+        setattr(request, LOADER_ATTR, loader)
+    return loader
+
+
+class FlagListSerializer(serializers.ListSerializer):
+    """Перед сериализацией списка передаёт загрузчику флагов
+    id всех его элементов (prime_flags дочернего сериализатора)."""
+
+    def to_representation(self, data):
+        if hasattr(data, 'all'):
+            data = data.all()
+        data = list(data)
+        self.child.prime_flags(data)
+        return super().to_representation(data)
@@ -0,0 +1,359 @@
+import atexit
+import hashlib
+import hmac
+import logging
+import re
+import threading
+import time
+
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+
+logger = logging.getLogger(__name__)
+
+metrics_conf = settings.METRICS_SETTINGS
+
+ROUTE_ATTR: str = '_metrics_route'
+RECORDER_ATTR: str = '_metrics_recorder'
+SERIES_KEY: str = 'metrics:{}'
+INDEX_KEY: str = 'metrics:series'
+CONTENT_TYPE: str = 'text/plain; version=0.0.4; charset=utf-8'
+
+METRIC_TYPES: Dict[str, str] = {
+    'foodgram_requests_total': 'counter',
+    'foodgram_request_duration_seconds': 'histogram',
+    'foodgram_db_queries_total': 'counter',
+    'foodgram_db_query_duration_seconds_total': 'counter',
+    'foodgram_db_duplicate_queries_total': 'counter',
+    'foodgram_query_budget_exceeded_total': 'counter',
+    'foodgram_tasks_total': 'counter',
+    'foodgram_task_duration_seconds': 'histogram',
+}
+# Длительности хранятся в микросекундах: в кеше - только целые счётчики.
+MICROSECONDS = frozenset((
+    'foodgram_request_duration_seconds_sum',
+    'foodgram_db_query_duration_seconds_total',
+    'foodgram_task_duration_seconds_sum',
+))
+
+IN_LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+Labels = Tuple[Tuple[str, str], ...]
+Series = Tuple[str, Labels]
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Обработка запроса потребовала больше SQL-запросов,
+    чем разрешено для маршрута."""
+
+
+def fingerprint(sql: str) -> str:
+    """Форма SQL-запроса без значений: запросы, отличающиеся только
+    параметрами и длиной списков IN, считаются повторами (N+1)."""
+
+    return LITERAL_RE.sub('?', IN_LIST_RE.sub('(...)', sql))
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper: число, время и формы SQL-запросов,
+    выполненных при обработке одного HTTP-запроса."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints: Counter = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self) -> int:
+        return sum(
+            count - 1 for count in self.fingerprints.values() if count > 1
+        )
+
+    def repeated(self, limit: int = 3):
+        return [
+            (sql, count)
+            for sql, count in self.fingerprints.most_common(limit)
+            if count > 1
+        ]
+
+
+def _order(series: Series):
+    """Порядок рядов: корзины гистограммы - по возрастанию границы."""
+
+    name, labels = series
+    return name, tuple(
+        (key, float(value)) if key == 'le' else (key, value)
+        for key, value in labels
+    )
+
+
+def _series_key(series: Series) -> str:
+    return SERIES_KEY.format(
+        hashlib.md5(repr(series).encode()).hexdigest()
+    )
+
+
+class RequestStats:
+    """Метрики запросов по маршрутам и фоновых задач. Как и
+    статистика кеша, копятся в памяти процесса и каждые FLUSH_EVERY
+    запросов (или задач) переносятся в общий кеш, чтобы эндпоинт
+    метрик отдавал сумму по всем воркерам."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local: Dict[Series, int] = defaultdict(int)
+        self._pending = 0
+        self._known = set()
+        atexit.register(self.flush)
+
+    def _series(self, route, method, status, duration, recorder, over):
+        labels = (('route', route),)
+        series = {
+            ('foodgram_requests_total',
+             (*labels, ('method', method), ('status', str(status)))): 1,
+            ('foodgram_request_duration_seconds_count', labels): 1,
+            ('foodgram_request_duration_seconds_sum', labels):
+                int(duration * 1e6),
+            ('foodgram_db_queries_total', labels): recorder.count,
+            ('foodgram_db_query_duration_seconds_total', labels):
+                int(recorder.duration * 1e6),
+            ('foodgram_db_duplicate_queries_total', labels):
+                recorder.duplicates,
+            ('foodgram_query_budget_exceeded_total', labels): int(over),
+        }
+        for bound in metrics_conf['DURATION_BUCKETS']:
+            bucket = (*labels, ('le', str(bound)))
+            series[('foodgram_request_duration_seconds_bucket', bucket)] = (
+                int(duration <= bound)
+            )
+        bucket = (*labels, ('le', '+Inf'))
+        series[('foodgram_request_duration_seconds_bucket', bucket)] = 1
+        return series
+
+    @staticmethod
+    def _task_series(name: str, status: str, duration: float):
+        labels = (('task', name),)
+        series = {
+            ('foodgram_tasks_total', (*labels, ('status', status))): 1,
+            ('foodgram_task_duration_seconds_count', labels): 1,
+            ('foodgram_task_duration_seconds_sum', labels):
+                int(duration * 1e6),
+        }
+        for bound in metrics_conf['TASK_DURATION_BUCKETS']:
+            bucket = (*labels, ('le', str(bound)))
+            series[('foodgram_task_duration_seconds_bucket', bucket)] = (
+                int(duration <= bound)
+            )
+        bucket = (*labels, ('le', '+Inf'))
+        series[('foodgram_task_duration_seconds_bucket', bucket)] = 1
+        return series
+
+    def record(self, route: str, method: str, status: int,
+               duration: float, recorder: QueryRecorder, over: bool):
+        self._add(
+            self._series(route, method, status, duration, recorder, over)
+        )
+
+    def record_task(self, name: str, status: str, duration: float):
+        """Запуск фоновой задачи: итог (done, retry, failed)
+        и длительность."""
+
+        self._add(self._task_series(name, status, duration))
+
+    def _add(self, series: Dict[Series, int]) -> None:
+        with self._lock:
+            for key, value in series.items():
+                self._local[key] += value
+            self._pending += 1
+            if self._pending < metrics_conf['FLUSH_EVERY']:
+                return
+            local, self._local = self._local, defaultdict(int)
+            self._pending = 0
+        self._flush(local)
+
+    def _register(self, backend, series) -> None:
+        """Добавляет новые ряды в общий список рядов в кеше."""
+
+        new = set(series) - self._known
+        if not new:
+            return
+        index = backend.get(INDEX_KEY) or set()
+        if not new <= index:
+            backend.set(INDEX_KEY, index | new, timeout=None)
+        self._known |= new
+
+    def _flush(self, local) -> None:
+        backend = caches[metrics_conf['CACHE_ALIAS']]
+        self._register(backend, local)
+        for series, value in local.items():
+            key = _series_key(series)
+            backend.add(key, 0, timeout=None)
+            if not value:
+                continue
+            try:
+                backend.incr(key, value)
+            except ValueError:
+                backend.set(key, value, timeout=None)
+
+    def flush(self) -> None:
+        with self._lock:
+            local, self._local = self._local, defaultdict(int)
+            self._pending = 0
+        if local:
+            self._flush(local)
+
+    def totals(self) -> Dict[Series, int]:
+        """Значения всех рядов по всем процессам."""
+
+        self.flush()
+        backend = caches[metrics_conf['CACHE_ALIAS']]
+        index = sorted(backend.get(INDEX_KEY) or (), key=_order)
+        values = backend.get_many([_series_key(series) for series in index])
+        return {
+            series: values.get(_series_key(series), 0) for series in index
+        }
+
+
+stats = RequestStats()
+
+
+def _format_value(name: str, value: int) -> str:
+    if name in MICROSECONDS:
+        return f'{value / 1e6:.6f}'
+    return str(value)
+
+
+def exposition() -> str:
+    """Метрики в текстовом формате Prometheus."""
+
+    grouped = defaultdict(list)
+    for (name, labels), value in stats.totals().items():
+        family = re.sub(r'_(bucket|sum|count)$', '', name)
+        if family not in METRIC_TYPES:
+            family = name
+        grouped[family].append((name, labels, value))
+    lines = []
+    for family in sorted(grouped):
+        lines.append(f'# TYPE {family} {METRIC_TYPES.get(family, "untyped")}')
+        for name, labels, value in grouped[family]:
+            rendered = ','.join(f'{key}="{label}"' for key, label in labels)
+            lines.append(
+                f'{name}{{{rendered}}} {_format_value(name, value)}'
+            )
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Эндпоинт для Prometheus. Если задан METRICS_SETTINGS['TOKEN'],
+    требуется заголовок Authorization: Bearer <токен>; без токена
+    метрики видны только сотрудникам, вошедшим в админку."""
+
+    token = metrics_conf['TOKEN']
+    if not token:
+        if not request.user.is_staff:
+            raise Http404
+    elif not hmac.compare_digest(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(exposition(), content_type=CONTENT_TYPE)
+
+
+def route_name(view_func, request) -> str:
+    """Имя маршрута: basename роутера и действие вьюсета
+    (recipes-list, users-subscriptions), для остальных
+    представлений - имя URL."""
+
+    basename = getattr(view_func, 'initkwargs', {}).get('basename')
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(request.method.lower())
+    if basename and action:
+        return f'{basename}-{action}'
+    match = request.resolver_match
+    return match.view_name if match and match.view_name else 'unnamed'
+
+
+def query_budget(route: str) -> Optional[int]:
+    return metrics_conf['QUERY_BUDGETS'].get(
+        route, metrics_conf['DEFAULT_QUERY_BUDGET']
+    )
+
+
+def server_timing(duration: float, recorder: QueryRecorder) -> str:
+    return ', '.join((
+        f'db;dur={recorder.duration * 1000:.1f};'
+        f'desc="{recorder.count} queries, {recorder.duplicates} repeated"',
+        f'app;dur={(duration - recorder.duration) * 1000:.1f}',
+        f'total;dur={duration * 1000:.1f}',
+    ))
+
+
+class RequestMetricsMiddleware(MiddlewareMixin):
+    """Время обработки запроса, число и время SQL-запросов
+    (через execute_wrapper всех подключений) и повторы запросов
+    одной формы. Пишет заголовок Server-Timing, копит метрики
+    для Prometheus и проверяет бюджет запросов маршрута:
+    превышение пишется в лог или, при BUDGET_ACTION='raise'
+    (для тестов), вызывает QueryBudgetExceeded.
+    Под ASGI process_request и process_response выполняются
+    в том же потоке, что и запросы ORM, поэтому обёртки
+    подключений видят и запросы асинхронных представлений."""
+
+    def process_request(self, request):
+        if not metrics_conf['ENABLED']:
+            return
+        recorder = QueryRecorder()
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        setattr(request, RECORDER_ATTR, (recorder, stack, time.perf_counter()))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        setattr(request, ROUTE_ATTR, route_name(view_func, request))
+
+    def process_response(self, request, response):
+        state = getattr(request, RECORDER_ATTR, None)
+        if state is None:
+            return response
+        recorder, stack, start = state
+        stack.close()
+        duration = time.perf_counter() - start
+        route = getattr(request, ROUTE_ATTR, 'unmatched')
+        budget = query_budget(route)
+        over = budget is not None and recorder.count > budget
+        if metrics_conf['SERVER_TIMING']:
+            response['Server-Timing'] = server_timing(duration, recorder)
+        stats.record(
+            route, request.method, response.status_code, duration,
+            recorder, over,
+        )
+        if over:
+            self._report(route, budget, recorder)
+        return response
+
+    @staticmethod
+    def _report(route: str, budget: int, recorder: QueryRecorder):
+        message = (
+            f'{route}: {recorder.count} SQL-запросов при бюджете {budget}; '
+            f'повторы: {recorder.repeated()}'
+        )
+        if metrics_conf['BUDGET_ACTION'] == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
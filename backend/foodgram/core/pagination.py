@@ -1,5 +1,192 @@
+import base64
+import binascii
+import hashlib
+import json
+
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+pagination_conf = settings.PAGINATION_SETTINGS
+
+COUNT_KEY: str = 'page_count:{}'
+
+
+class CountingPaginator(Paginator):
+    """Пагинатор с настраиваемым подсчётом общего числа записей.
+    exact - обычный COUNT(*) на каждой странице;
+    cached - точный COUNT(*), который кешируется на COUNT_CACHE_TIMEOUT;
+    estimate - оценка планировщика PostgreSQL (без выполнения запроса),
+    для небольших выборок и других СУБД - cached."""
+
+    @cached_property
+    def count(self):
+        mode = pagination_conf['COUNT_MODE']
+        if mode == 'exact' or not hasattr(self.object_list, 'query'):
+            return super().count
+        if mode == 'estimate':
+            estimate = self._estimate()
+            if estimate is not None:
+                return estimate
+        return self._cached_count()
+
+    def _count_key(self) -> str:
+        query = str(self.object_list.query)
+        return COUNT_KEY.format(hashlib.md5(query.encode()).hexdigest())
+
+    def _cached_count(self) -> int:
+        backend = caches[settings.API_CACHE_SETTINGS['ALIAS']]
+        return backend.get_or_set(
+            self._count_key(),
+            lambda: self.object_list.count(),
+            pagination_conf['COUNT_CACHE_TIMEOUT'],
+        )
+
+    def _estimate(self) -> Optional[int]:
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+        if estimate < pagination_conf['ESTIMATE_THRESHOLD']:
+            return None
+        return estimate
 
 
 class FoodGramPagination(PageNumberPagination):
+    """Постраничная пагинация (page/limit), совместимая с фронтендом.
+    Если в запросе есть параметр cursor, а вьюсет задаёт
+    keyset_ordering, включается пагинация по ключу: страница
+    выбирается условием WHERE по последней записи предыдущей
+    страницы, без OFFSET и COUNT(*). Первая страница - ?cursor=,
+    следующие - по ссылке next из ответа."""
+
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    django_paginator_class = CountingPaginator
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = getattr(view, 'keyset_ordering', None)
+        self.keyset_ordering = ordering
+        if ordering and self.cursor_query_param in request.query_params:
+            return self._paginate_keyset(queryset, request, ordering)
+        self.keyset_ordering = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if not self.keyset_ordering:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self._next_link()),
+            ('results', data),
+        ]))
+
+    def get_cursor_page_size(self, request) -> int:
+        return (
+            self.get_page_size(request)
+            or pagination_conf['CURSOR_PAGE_SIZE']
+        )
+
+    def _paginate_keyset(self, queryset, request, ordering: Sequence[str]):
+        self.request = request
+        fields = [field.lstrip('-') for field in ordering]
+        position = self._decode_cursor(
+            request.query_params[self.cursor_query_param],
+            [self._model_field(queryset, field) for field in fields],
+        )
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(
+                self._after_position(ordering, position)
+            )
+        page_size = self.get_cursor_page_size(request)
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        page = page[:page_size]
+        self.last_position = (
+            [self._key(page[-1], field) for field in fields]
+            if page else None
+        )
+        return page
+
+    @staticmethod
+    def _after_position(ordering: Sequence[str], position: list) -> Q:
+        """Условие "строго после позиции" для составного ключа:
+        (a < x) OR (a = x AND b < y) OR ... с учётом направления."""
+
+        condition = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': position[index]})
+            for prev_field, prev_value in zip(ordering[:index], position):
+                step &= Q(**{prev_field.lstrip('-'): prev_value})
+            condition |= step
+        return condition
+
+    @staticmethod
+    def _key(item, field: str):
+        if isinstance(item, dict):
+            return item[field]
+        return getattr(item, field)
+
+    @staticmethod
+    def _model_field(queryset, name: str):
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return queryset.model._meta.get_field(name)
+
+    def _decode_cursor(self, encoded: str, fields) -> Optional[list]:
+        """Позиция из курсора; значения приводятся к типам полей
+        ключа, иначе ошибка возникла бы при построении запроса."""
+
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if not isinstance(position, list) or len(position) != len(fields):
+                raise ValueError
+            position = [
+                field.to_python(value)
+                for field, value in zip(fields, position)
+            ]
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    @staticmethod
+    def _encode_cursor(position: list) -> str:
+        data = json.dumps(position, default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def _next_link(self) -> Optional[str]:
+        if not self.has_next:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param,
+            self._encode_cursor(self.last_position),
+        )
@@ -0,0 +1,156 @@
+import itertools
+import json
+import re
+
+from contextlib import ExitStack
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Count
+from django.test import RequestFactory
+
+from core.filters import TAGS_ALL, RecipeFilter
+from recipes.models import Recipe, Tag
+
+User = get_user_model()
+
+plan_conf = settings.QUERY_PLAN_SETTINGS
+
+FILTERS: Tuple[str, ...] = (
+    'author', 'tags', 'tags_match', 'is_favorited', 'is_in_shopping_cart',
+)
+# Строка EXPLAIN QUERY PLAN SQLite для полного просмотра таблицы:
+# SCAN без USING INDEX (в старых версиях - SCAN TABLE).
+SQLITE_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+
+Statement = Tuple[str, tuple]
+
+
+def combinations() -> Iterator[Tuple[str, ...]]:
+    """Все сочетания фильтров RecipeFilter, от пустого до полного."""
+
+    for size in range(len(FILTERS) + 1):
+        yield from itertools.combinations(FILTERS, size)
+
+
+def samples() -> dict:
+    """Значения фильтров с наибольшими выборками в текущих данных:
+    самый плодовитый автор, два самых частых тэга и пользователь
+    с самым большим избранным."""
+
+    return {
+        'tags_match': TAGS_ALL,
+        'author': Recipe.objects.order_by().values('author').annotate(
+            recipes=Count('pk')
+        ).order_by('-recipes').values_list('author', flat=True).first(),
+        'tags': list(Tag.objects.annotate(
+            used=Count('recipes')
+        ).order_by('-used').values_list('slug', flat=True)[:2]),
+        'user': User.objects.annotate(
+            favorites=Count('favorited_recipes')
+        ).order_by('-favorites').first(),
+    }
+
+
+def _request(combo: Sequence[str], sample: dict):
+    data = {'limit': plan_conf['PAGE_SIZE']}
+    for name in combo:
+        data[name] = sample.get(name, 1)
+    request = RequestFactory().get('/api/recipes/', data)
+    request.user = sample['user']
+    return request
+
+
+def statements(combo: Sequence[str], sample: dict) -> Dict[str, Statement]:
+    """SQL страницы списка рецептов и подсчёта числа записей
+    для сочетания фильтров - те же запросы, что выполняет
+    RecipeViewSet.list. Запросы выполняются и перехватываются
+    обёрткой подключения."""
+
+    request = _request(combo, sample)
+    rows = RecipeFilter(
+        request.GET, queryset=Recipe.objects.all(), request=request
+    ).qs.values('id', 'pub_date')
+    captured = {}
+    for name, run in (
+        ('page', lambda: list(rows[:plan_conf['PAGE_SIZE']])),
+        ('count', rows.count),
+    ):
+        executed = []
+        with ExitStack() as stack:
+            stack.enter_context(connection.execute_wrapper(
+                lambda execute, sql, params, many, context: (
+                    executed.append((sql, tuple(params or ())))
+                    or execute(sql, params, many, context)
+                )
+            ))
+            run()
+        captured[name] = executed[-1]
+    return captured
+
+
+def _pg_seq_scans(node: dict) -> Iterator[str]:
+    if node.get('Node Type') == 'Seq Scan':
+        yield node['Relation Name']
+    for child in node.get('Plans', ()):
+        yield from _pg_seq_scans(child)
+
+
+def explain(statement: Statement) -> Tuple[List[str], List[str]]:
+    """План запроса (строки) и таблицы, которые читаются
+    полным просмотром."""
+
+    sql, params = statement
+    vendor = connection.vendor
+    prefix = connection.ops.explain_query_prefix(
+        'JSON' if vendor == 'postgresql' else None
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}', params)
+        rows = cursor.fetchall()
+    if vendor == 'postgresql':
+        plan = rows[0][0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        root = plan[0]['Plan']
+        return (
+            json.dumps(root, indent=2).splitlines(),
+            list(_pg_seq_scans(root)),
+        )
+    details = [str(row[-1]) for row in rows]
+    # SCAN по подзапросу (CO-ROUTINE) - просмотр уже отобранных строк.
+    tables = set(connection.introspection.table_names())
+    scans = [
+        match.group(1) for match in map(SQLITE_SCAN_RE.match, details)
+        if match and match.group(1) in tables
+    ]
+    return details, scans
+
+
+def analyze() -> None:
+    """Обновляет статистику планировщика."""
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def check(sample: dict) -> List[dict]:
+    """Планы страницы и подсчёта для всех сочетаний фильтров.
+    violations - таблицы с полным просмотром, кроме разрешённых
+    в QUERY_PLAN_SETTINGS['ALLOW_SEQ_SCAN']."""
+
+    allowed = set(plan_conf['ALLOW_SEQ_SCAN'])
+    results = []
+    for combo in combinations():
+        for name, statement in statements(combo, sample).items():
+            plan, scans = explain(statement)
+            results.append({
+                'filters': list(combo),
+                'query': name,
+                'plan': plan,
+                'seq_scans': scans,
+                'violations': sorted(set(scans) - allowed),
+            })
+    return results
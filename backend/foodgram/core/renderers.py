@@ -0,0 +1,42 @@
+import orjson
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+ORJSON_OPTIONS: int = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson с тем же результатом: компактный
+    UTF-8 без экранирования, U+2028/U+2029 экранируются, даты,
+    Decimal и ленивые строки - кодировщиком DRF. Отступы, настройки
+    COMPACT_JSON/UNICODE_JSON не по умолчанию и всё, что orjson
+    не сериализует (ключи не-строки, большие целые), отдаются
+    обычному JSONRenderer. Числа с плавающей точкой orjson пишет
+    без '+' в экспоненте (1e16, а не 1e+16)."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (
+            self.get_indent(accepted_media_type, renderer_context or {})
+            or not api_settings.COMPACT_JSON
+            or not api_settings.UNICODE_JSON
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        try:
+            ret = orjson.dumps(
+                data, default=JSONEncoder().default, option=ORJSON_OPTIONS
+            )
+        except orjson.JSONEncodeError:
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        return ret.replace(
+            b'\xe2\x80\xa8', b'\\u2028'
+        ).replace(b'\xe2\x80\xa9', b'\\u2029')
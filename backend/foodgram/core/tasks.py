@@ -0,0 +1,236 @@
+import logging
+import threading
+import time
+import traceback
+
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.core import checks
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.metrics import stats
+from recipes.models import Task
+
+logger = logging.getLogger(__name__)
+
+task_conf = settings.TASK_SETTINGS
+
+_registry: Dict[str, Callable] = {}
+
+# Кеши, которые не видны воркеру в отдельном контейнере:
+# в памяти процесса и в файлах (общие только на одной машине).
+LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache': True,
+    'django.core.cache.backends.filebased.FileBasedCache': False,
+}
+
+
+class UnknownTaskError(Exception):
+    """Задача с таким именем не зарегистрирована."""
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Воркер сбрасывает кеш карточек и пишет метрики задач,
+    поэтому с очередью кеш должен быть общим с веб-сервером
+    (CACHE_BACKEND=redis). Файловый кеш допустим с
+    TASK_SETTINGS['ALLOW_FILE_CACHE'] (по умолчанию - в режиме DEBUG)."""
+
+    if not task_conf['ENABLED']:
+        return []
+    return [
+        checks.Error(
+            f'Кеш {alias} ({cache["BACKEND"]}) не общий для веб-сервера '
+            'и воркера очереди задач.',
+            hint='Укажите CACHE_BACKEND=redis и REDIS_URL '
+                 'или выключите очередь: TASK_QUEUE=False.',
+            id='foodgram.E001',
+        )
+        for alias, cache in settings.CACHES.items()
+        if cache['BACKEND'] in LOCAL_CACHES
+        and (
+            LOCAL_CACHES[cache['BACKEND']]
+            or not task_conf['ALLOW_FILE_CACHE']
+        )
+    ]
+
+
+def task(name: str):
+    """Регистрирует функцию как задачу name. Аргументы задачи
+    передаются именованными и должны сериализоваться в JSON."""
+
+    def decorator(func):
+        _registry[name] = func
+        return func
+
+    return decorator
+
+
+def enqueue(name: str, /, key: Optional[str] = None, **kwargs) -> None:
+    """Ставит задачу в очередь в текущей транзакции. Пока задача
+    с тем же key ожидает запуска, повторная не добавляется.
+    При выключенной очереди (TASK_SETTINGS['ENABLED']) задача
+    выполняется сразу после фиксации транзакции."""
+
+    if name not in _registry:
+        raise UnknownTaskError(name)
+    if not task_conf['ENABLED']:
+        transaction.on_commit(lambda: _run_inline(name, kwargs))
+        return
+    Task.objects.bulk_create(
+        [Task(name=name, key=key, kwargs=kwargs)], ignore_conflicts=True
+    )
+
+
+def _run_inline(name: str, kwargs: dict) -> None:
+    started = time.perf_counter()
+    result = 'done'
+    try:
+        _registry[name](**kwargs)
+    except Exception:
+        logger.exception('Задача %s завершилась ошибкой', name)
+        result = 'failed'
+    stats.record_task(name, result, time.perf_counter() - started)
+
+
+def claim(limit: int) -> List[Task]:
+    """Забирает до limit готовых к запуску задач, а также задачи,
+    срок блокировки которых истёк (воркер завершился аварийно).
+    Задача забирается условным UPDATE по числу попыток, поэтому
+    её не получат два воркера."""
+
+    now = timezone.now()
+    candidates = Task.objects.filter(
+        Q(status=Task.PENDING, run_after__lte=now)
+        | Q(status=Task.RUNNING, locked_until__lt=now)
+    ).order_by('run_after').values_list('pk', 'status', 'attempts')[:limit]
+    claimed = [
+        pk for pk, status, attempts in candidates
+        if Task.objects.filter(
+            pk=pk, status=status, attempts=attempts
+        ).update(
+            status=Task.RUNNING, attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=task_conf['LEASE_SECONDS']),
+        )
+    ]
+    return list(Task.objects.filter(pk__in=claimed))
+
+
+def _retry(job: Task, error: str, duration: float) -> str:
+    """Откладывает задачу с экспоненциальной задержкой или,
+    если попытки исчерпаны, отмечает её проваленной."""
+
+    fields = {'error': error, 'duration': duration, 'locked_until': None}
+    if job.attempts >= task_conf['MAX_ATTEMPTS']:
+        Task.objects.filter(pk=job.pk).update(
+            status=Task.FAILED, finished_at=timezone.now(), **fields
+        )
+        return 'failed'
+    delay = task_conf['RETRY_DELAY'] * 2 ** (job.attempts - 1)
+    try:
+        with transaction.atomic():
+            Task.objects.filter(pk=job.pk).update(
+                status=Task.PENDING,
+                run_after=timezone.now() + timedelta(seconds=delay),
+                **fields,
+            )
+    except IntegrityError:
+        # Такая же задача уже снова в очереди и выполнит ту же работу.
+        Task.objects.filter(pk=job.pk).delete()
+    return 'retry'
+
+
+def execute(job: Task) -> str:
+    """Выполняет забранную задачу; результат для метрик:
+    done, retry или failed."""
+
+    started = time.perf_counter()
+    error = None
+    try:
+        func = _registry.get(job.name)
+        if func is None:
+            raise UnknownTaskError(job.name)
+        func(**job.kwargs)
+    except Exception:
+        logger.exception('Задача %s (%s) завершилась ошибкой',
+                         job.name, job.pk)
+        error = traceback.format_exc()
+    duration = time.perf_counter() - started
+    if error is None:
+        Task.objects.filter(pk=job.pk).update(
+            status=Task.DONE, finished_at=timezone.now(), locked_until=None,
+            duration=duration, error='',
+        )
+        result = 'done'
+    else:
+        result = _retry(job, error, duration)
+    stats.record_task(job.name, result, duration)
+    return result
+
+
+def _execute_in_worker(job: Task) -> str:
+    try:
+        return execute(job)
+    finally:
+        close_old_connections()
+
+
+def purge() -> int:
+    """Удаляет выполненные задачи старше KEEP_DONE_SECONDS."""
+
+    border = timezone.now() - timedelta(seconds=task_conf['KEEP_DONE_SECONDS'])
+    return Task.objects.filter(
+        status=Task.DONE, finished_at__lt=border
+    ).delete()[0]
+
+
+class Worker:
+    """Пул потоков, выполняющий задачи из очереди. Между пустыми
+    проверками очереди ждёт POLL_INTERVAL секунд; stop() дожидается
+    задач, которые уже выполняются."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='tasks'
+        )
+        self.stopping = threading.Event()
+        self._purged_at = 0.0
+
+    def run_once(self) -> int:
+        """Выполняет доступные сейчас задачи; их число."""
+
+        jobs = claim(self.workers * task_conf['CLAIM_FACTOR'])
+        wait([self.executor.submit(_execute_in_worker, job) for job in jobs])
+        return len(jobs)
+
+    def _maybe_purge(self) -> None:
+        if time.monotonic() - self._purged_at >= task_conf['PURGE_INTERVAL']:
+            self._purged_at = time.monotonic()
+            purge()
+
+    def run(self, once: bool = False) -> int:
+        done = 0
+        try:
+            while not self.stopping.is_set():
+                count = self.run_once()
+                done += count
+                if count:
+                    continue
+                self._maybe_purge()
+                if once:
+                    break
+                close_old_connections()
+                self.stopping.wait(task_conf['POLL_INTERVAL'])
+        finally:
+            self.executor.shutdown(wait=True)
+            stats.flush()
+        return done
+
+    def stop(self, *args) -> None:
+        self.stopping.set()
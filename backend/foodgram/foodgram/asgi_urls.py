@@ -0,0 +1,12 @@
+"""Маршруты для ASGI-сервера: асинхронные представления горячих
+эндпоинтов чтения, затем все маршруты foodgram.urls.
+Подключаются AsyncRoutesMiddleware."""
+
+from django.urls import include, path
+
+from foodgram.urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/', include('api.v1.async_urls')),
+    *sync_urlpatterns,
+]
@@ -45,6 +45,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.RequestMetricsMiddleware',
+    'core.asgi.AsyncRoutesMiddleware',
+    'core.db_router.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,6 +81,13 @@ WSGI_APPLICATION = 'foodgram.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# Реплики: DB_REPLICAS - через запятую адреса host[:port] реплик
+# PostgreSQL, в режиме DEBUG - пути к файлам SQLite.
+DB_REPLICAS = [
+    value.strip() for value in os.getenv('DB_REPLICAS', '').split(',')
+    if value.strip()
+]
+
 if DEBUG:
     DATABASES = {
         'default': {
@@ -85,6 +95,10 @@ if DEBUG:
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
+    for number, name in enumerate(DB_REPLICAS, 1):
+        DATABASES[f'replica_{number}'] = {
+            **DATABASES['default'], 'NAME': name,
+        }
 else:
     DATABASES = {
         'default': {
@@ -93,9 +107,82 @@ else:
             'USER': os.getenv('POSTGRES_USER'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
             'HOST': os.getenv('DB_HOST'),
-            'PORT': os.getenv('DB_PORT')
+            'PORT': os.getenv('DB_PORT'),
+            # Постоянные подключения: секунды жизни (0 - на запрос,
+            # как и нужно под ASGI без пулера), проверка перед
+            # повторным использованием.
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
+            'CONN_HEALTH_CHECKS': True,
+            # За PgBouncer в режиме transaction серверные курсоры
+            # (iterator()) не работают.
+            'DISABLE_SERVER_SIDE_CURSORS': debug_state[
+                os.getenv('DB_PGBOUNCER', 'False')
+            ],
         }
     }
+    for number, address in enumerate(DB_REPLICAS, 1):
+        host, _, port = address.partition(':')
+        DATABASES[f'replica_{number}'] = {
+            **DATABASES['default'],
+            'HOST': host,
+            'PORT': port or DATABASES['default']['PORT'],
+        }
+    if 'postgresql' in (os.getenv('DB_ENGINE') or ''):
+        INSTALLED_APPS.append('django.contrib.postgres')
+
+for alias in DATABASES:
+    if alias != 'default':
+        DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', BASE_DIR / '.cache'),
+    },
+    # Общий для всех процессов и контейнеров; нужен очереди задач
+    # (TASK_QUEUE): воркер сбрасывает кеш карточек и пишет метрики.
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    },
+}
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'file')
+
+# Счётчики метрик не должны вытесняться вместе с данными кеша:
+# отдельное хранилище с запасом по числу записей.
+METRICS_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'metrics',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(
+            os.getenv('CACHE_LOCATION', BASE_DIR / '.cache'), 'metrics'
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'redis': {
+        **CACHE_BACKENDS['redis'],
+        'KEY_PREFIX': 'metrics',
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE_BACKEND],
+    'metrics': METRICS_CACHE_BACKENDS[CACHE_BACKEND],
+}
 
 
 # Password validation
@@ -163,6 +250,10 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 DJOSER = {
@@ -187,5 +278,163 @@ USER_CREDENTIAL_SETTINGS = {
     'EMAIL_MAX_LENGTH': 254,
 }
 
+INGREDIENT_SEARCH_SETTINGS = {
+    'IN_MEMORY_INDEX': debug_state[os.getenv('INGREDIENT_INDEX', 'True')],
+    'INDEX_TTL': 300,
+}
+
+API_CACHE_SETTINGS = {
+    'ALIAS': 'default',
+    'RECIPE_CARD_TIMEOUT': 60 * 60,
+    'USER_FLAGS_TIMEOUT': 60 * 60,
+    'REFERENCE_TIMEOUT': 60 * 60 * 24,
+    'STATS_FLUSH_EVERY': 100,
+}
+
+FEED_SETTINGS = {
+    'MAX_ENTRIES': 500,
+    'FANOUT_LIMIT': 10000,
+    'BATCH_SIZE': 1000,
+    'PULL_TIMEOUT': 60 * 60 * 24,
+    # Перекрытие подгрузки ленты, секунд: дольше самой длинной
+    # транзакции записи рецепта.
+    'PULL_OVERLAP': 60,
+}
+
+METRICS_SETTINGS = {
+    'ENABLED': debug_state[os.getenv('METRICS_ENABLED', 'True')],
+    'SERVER_TIMING': debug_state[os.getenv('SERVER_TIMING', 'True')],
+    'TOKEN': os.getenv('METRICS_TOKEN', ''),
+    'CACHE_ALIAS': 'metrics',
+    'FLUSH_EVERY': 50,
+    'DURATION_BUCKETS': (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+    'TASK_DURATION_BUCKETS': (0.1, 0.5, 1, 5, 15, 60, 300),
+    'BUDGET_ACTION': os.getenv('QUERY_BUDGET_ACTION', 'log'),
+    'DEFAULT_QUERY_BUDGET': None,
+    'QUERY_BUDGETS': {
+        'recipes-list': 12,
+        'recipes-retrieve': 8,
+        'recipes-search': 10,
+        'recipes-feed': 10,
+        'recipes-match': 10,
+        'recipes-similar': 10,
+        'recipes-recommended': 12,
+        'recipes-download_shopping_cart': 4,
+        'users-list': 6,
+        'users-retrieve': 6,
+        'users-me': 6,
+        'users-subscriptions': 8,
+        'tags-list': 4,
+        'tags-retrieve': 4,
+        'ingredients-list': 4,
+        'ingredients-retrieve': 4,
+    },
+}
+
+RECOMMENDATION_SETTINGS = {
+    'NEIGHBOURS': 20,
+    'FAVORITE_WEIGHT': 1.0,
+    'CART_WEIGHT': 0.5,
+    'MIN_SUPPORT': 2,
+    'MAX_BASKET': 500,
+    'PAIR_CHUNK': 2_000_000,
+    'MAX_SEEDS': 100,
+    'RECOMMENDED_SIZE': 100,
+    'CACHE_TIMEOUT': 60 * 30,
+    'BATCH_SIZE': 1000,
+}
+
+INGREDIENT_MATCH_SETTINGS = {
+    'INDEX_TTL': 300,
+    'OVERLAY_LIMIT': 1000,
+    'MAX_INGREDIENTS': 200,
+}
+
+RECIPE_SEARCH_SETTINGS = {
+    'BACKEND': os.getenv('RECIPE_SEARCH_BACKEND', 'auto'),
+    'CONFIG': 'russian',
+    'TRIGRAM_THRESHOLD': 0.3,
+    'MIN_TOKEN_LENGTH': 2,
+    'INDEX_TTL': 300,
+    'BATCH_SIZE': 500,
+}
+
+IMAGE_SETTINGS = {
+    'MAX_UPLOAD_SIZE': 20 * 1024 * 1024,
+    'DECODE_CHUNK_SIZE': 64 * 1024,
+    'SPOOL_SIZE': 1024 * 1024,
+    'VARIANTS': {'thumb': 320, 'medium': 960},
+    'FORMATS': ('webp', 'jpeg'),
+    'QUALITY': 80,
+    # Сколько секунд хранится оригинал без рецептов, прежде чем
+    # его удалит build_image_variants --drop-orphans.
+    'ORPHAN_GRACE': 24 * 60 * 60,
+}
+
+PAGINATION_SETTINGS = {
+    'COUNT_MODE': os.getenv('PAGINATION_COUNT_MODE', 'exact'),
+    'COUNT_CACHE_TIMEOUT': 60,
+    'ESTIMATE_THRESHOLD': 1000,
+    'CURSOR_PAGE_SIZE': 6,
+}
+
+RECIPE_CARD_SETTINGS = {
+    # Карточки рецептов собираются из .values() по схеме
+    # RecipeReadSerializer (core.compiled), а не самим сериализатором.
+    'COMPILED': debug_state[os.getenv('COMPILED_RECIPE_CARDS', 'True')],
+    # Схема карточки, которая хранится в recipes.RecipeDocument.
+    'SERIALIZER': 'api.v1.serializers.RecipeReadSerializer',
+    'BATCH_SIZE': 500,
+}
+
+HTTP_CACHE_SETTINGS = {
+    'REFERENCE_MAX_AGE': 60,
+}
+
+DB_REPLICA_SETTINGS = {
+    'REPLICAS': [alias for alias in DATABASES if alias != 'default'],
+    # GET-запросы к этим вьюсетам (basename роутера) читают с реплик.
+    'ROUTES': ('tags', 'ingredients', 'recipes'),
+    # Токены, сессии и права всегда читаются с основной базы:
+    # только что выданный токен может ещё не дойти до реплики.
+    'PRIMARY_APPS': ('admin', 'auth', 'authtoken', 'contenttypes', 'sessions'),
+    # Сколько секунд после записи клиент читает с основной базы.
+    'PIN_SECONDS': int(os.getenv('DB_REPLICA_PIN_SECONDS', 5)),
+    'CACHE_ALIAS': 'default',
+}
+
+QUERY_PLAN_SETTINGS = {
+    'PAGE_SIZE': 6,
+    # Таблицы, которые планировщик вправе читать целиком (справочник
+    # тэгов - несколько строк).
+    'ALLOW_SEQ_SCAN': ('recipes_tag',),
+}
+
+TASK_SETTINGS = {
+    # Без очереди задачи выполняются в процессе веб-сервера сразу
+    # после фиксации транзакции (как до появления воркера). Очередь
+    # требует общего кеша (CACHE_BACKEND=redis), поэтому включается
+    # явно вместе с ним.
+    'ENABLED': debug_state[os.getenv('TASK_QUEUE', 'False')],
+    'WORKERS': int(os.getenv('TASK_WORKERS', 4)),
+    # Сколько задач на поток забирается за один проход.
+    'CLAIM_FACTOR': 2,
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 5,
+    # Задержка перед повтором, секунд; удваивается с каждой попыткой.
+    'RETRY_DELAY': 10,
+    'LEASE_SECONDS': 15 * 60,
+    'KEEP_DONE_SECONDS': 60 * 60 * 24,
+    'PURGE_INTERVAL': 60 * 10,
+    # Файловый кеш общий для веб-сервера и воркера, только если
+    # оба запущены на одной машине (локальная разработка).
+    'ALLOW_FILE_CACHE': DEBUG,
+}
+
+ASGI_SETTINGS = {
+    'ENABLED': debug_state[os.getenv('ASGI_READ_VIEWS', 'True')],
+    'URLCONF': 'foodgram.asgi_urls',
+}
+
 DEFAULT_FOR_EMPTY: str = '-пусто-'
 TAG_COLOR_MASK: str = '^#([A-Fa-f0-9]{6}|[A-Fa-f0-9]{3})$'
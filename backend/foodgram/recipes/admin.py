@@ -4,6 +4,7 @@ from django.contrib import admin
 from django.contrib.auth import get_user_model
 
 from core.forms import RecipeIngridientFormSet
+from recipes import counters
 from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
 
 User = get_user_model()
@@ -60,6 +61,7 @@ class IngredientAdmin(admin.ModelAdmin):
 class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'pk', 'name', 'author', 'pub_date', 'cooking_time',
+        'favorites_count', 'carts_count',
     )
     exclude = ('tags', 'favorited', 'in_shopping_cart')
     list_editable = ('name',)
@@ -70,6 +72,14 @@ class RecipeAdmin(admin.ModelAdmin):
         TagInline, RecipeIngredientInline, FavoritedInline, InCartInline
     )
 
+    def save_related(self, request, form, formsets, change):
+        """Отметки в инлайнах сохраняются напрямую, без m2m_changed,
+        поэтому счётчики рецепта пересчитываются после сохранения."""
+
+        super().save_related(request, form, formsets, change)
+        for counter in (counters.FAVORITES, counters.CARTS):
+            counters.recount(counter, [form.instance.pk])
+
 
 @admin.register(RecipeIngredient)
 class RecipeIngredientAdmin(admin.ModelAdmin):
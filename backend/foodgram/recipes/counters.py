@@ -0,0 +1,70 @@
+from typing import Iterable, NamedTuple
+
+from django.contrib.auth import get_user_model
+from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import Recipe
+from users.models import Follow
+
+User = get_user_model()
+
+Favorited = Recipe.favorited.through
+ShoppingCart = Recipe.in_shopping_cart.through
+
+
+class Counter(NamedTuple):
+    """Денормализованный счётчик: поле model.field хранит число
+    записей source, у которых source_field ссылается на объект."""
+
+    model: type
+    field: str
+    source: type
+    source_field: str
+
+    def actual(self) -> Coalesce:
+        """Фактическое значение счётчика коррелированным подзапросом."""
+
+        counted = self.source.objects.filter(
+            **{self.source_field: OuterRef('pk')}
+        ).order_by().values(self.source_field).annotate(
+            count=Count('pk')
+        ).values('count')
+        return Coalesce(
+            Subquery(counted), 0, output_field=models.IntegerField()
+        )
+
+
+FAVORITES = Counter(Recipe, 'favorites_count', Favorited, 'recipe')
+CARTS = Counter(Recipe, 'carts_count', ShoppingCart, 'recipe')
+RECIPES = Counter(User, 'recipes_count', Recipe, 'author')
+FOLLOWERS = Counter(User, 'followers_count', Follow, 'author')
+
+COUNTERS = (FAVORITES, CARTS, RECIPES, FOLLOWERS)
+
+
+def change(counter: Counter, pks: Iterable[int], delta: int,
+           **fields) -> None:
+    """Атомарно изменяет счётчик выражением F() без чтения значения
+    (и заодно поля fields тем же запросом).
+    Уменьшение не опускает счётчик ниже нуля."""
+
+    counter.model.objects.filter(pk__in=list(pks)).update(
+        **{counter.field: Greatest(F(counter.field) + delta, 0)}, **fields
+    )
+
+
+def recount(counter: Counter, pks=None, dry_run: bool = False) -> int:
+    """Пересчитывает счётчик одним UPDATE и возвращает число
+    записей, в которых значение расходилось с фактическим."""
+
+    queryset = counter.model.objects.all()
+    if pks is not None:
+        queryset = queryset.filter(pk__in=list(pks))
+    drifted = queryset.annotate(actual=counter.actual()).exclude(
+        **{counter.field: F('actual')}
+    ).count()
+    if drifted and not dry_run:
+        queryset.update(**{counter.field: counter.actual()})
+    return drifted
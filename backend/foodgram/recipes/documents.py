@@ -0,0 +1,98 @@
+import functools
+
+from typing import Dict, Iterable
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.utils.module_loading import import_string
+
+from core.cache import recipe_cards
+from core.compiled import CompiledSerializer
+from recipes import images
+from recipes.models import Recipe, RecipeDocument
+
+card_conf = settings.RECIPE_CARD_SETTINGS
+
+
+def _variant_urls(image, image_variants):
+    # images импортирует этот модуль, функция берётся при вызове.
+    return images.stored_variant_urls(image, image_variants)
+
+
+# SerializerMethodField карточки. Карточка общая для всех
+# пользователей: флаги в ней ложные, их заполняет _personalize.
+CARD_METHODS: dict = {
+    'image_variants': (('image', 'image_variants'), _variant_urls),
+    'is_favorited': ((), lambda: False),
+    'is_in_shopping_cart': ((), lambda: False),
+    'author.is_subscribed': ((), lambda: False),
+}
+
+
+def card_serializer():
+    """Сериализатор карточки (RECIPE_CARD_SETTINGS['SERIALIZER'])."""
+
+    return import_string(card_conf['SERIALIZER'])
+
+
+@functools.lru_cache(maxsize=None)
+def compiled_cards() -> CompiledSerializer:
+    return CompiledSerializer(card_serializer()(), CARD_METHODS)
+
+
+def serialize_cards(recipe_ids, compiled: bool) -> Dict[int, dict]:
+    """Карточки рецептов {id: карточка}: собранные из .values()
+    (compiled) или самим сериализатором."""
+
+    recipes = Recipe.objects.filter(pk__in=list(recipe_ids))
+    if compiled:
+        cards = compiled_cards().serialize(recipes)
+    else:
+        cards = card_serializer()(
+            recipes.with_read_data(AnonymousUser()), many=True
+        ).data
+    return {card['id']: card for card in cards}
+
+
+def load(recipe_ids: Iterable[int]) -> Dict[int, dict]:
+    return dict(RecipeDocument.objects.filter(
+        recipe_id__in=list(recipe_ids)
+    ).values_list('recipe_id', 'card'))
+
+
+def _save(cards: Dict[int, dict], replace: bool) -> None:
+    options = {'ignore_conflicts': True}
+    if replace:
+        options = {
+            'update_conflicts': True,
+            'unique_fields': ('recipe',),
+            'update_fields': ('card', 'built_at'),
+        }
+    RecipeDocument.objects.bulk_create(
+        [
+            RecipeDocument(recipe_id=pk, card=card)
+            for pk, card in cards.items()
+        ],
+        batch_size=card_conf['BATCH_SIZE'], **options,
+    )
+
+
+def build(recipe_ids: Iterable[int]) -> Dict[int, dict]:
+    """Собирает недостающие карточки и сохраняет их. Уже
+    сохранённые не перезаписываются: их могла пересобрать
+    запись, зафиксированная после чтения данных для сборки."""
+
+    cards = serialize_cards(recipe_ids, card_conf['COMPILED'])
+    _save(cards, replace=False)
+    return cards
+
+
+def refresh(recipe_ids: Iterable[int]) -> None:
+    """Пересобирает карточки рецептов после изменения и только
+    затем сбрасывает их в кеше, чтобы в кеш не попала старая."""
+
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), card_conf['BATCH_SIZE']):
+        batch = recipe_ids[start:start + card_conf['BATCH_SIZE']]
+        _save(serialize_cards(batch, card_conf['COMPILED']), replace=True)
+    recipe_cards.delete_many(recipe_ids)
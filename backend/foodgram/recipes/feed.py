@@ -0,0 +1,176 @@
+from datetime import timedelta
+from typing import Iterable, List
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from core import tasks
+from core.db_router import use_primary
+from recipes.models import FeedEntry, Recipe
+from users.models import Follow
+
+feed_conf = settings.FEED_SETTINGS
+
+PULL_KEY: str = 'feed_pulled:{}'
+
+
+def _cache():
+    return caches[settings.API_CACHE_SETTINGS['ALIAS']]
+
+
+def _entries(user_ids: Iterable[int], recipes) -> List[FeedEntry]:
+    return [
+        FeedEntry(
+            user_id=user_id, recipe_id=recipe_id,
+            author_id=author_id, pub_date=pub_date,
+        )
+        for user_id in user_ids
+        for recipe_id, author_id, pub_date in recipes
+    ]
+
+
+def trim(user_ids: Iterable[int]) -> None:
+    """Оставляет в лентах пользователей MAX_ENTRIES новейших записей.
+    Лишние записи находятся оконной функцией одним запросом."""
+
+    ranked = FeedEntry.objects.filter(
+        user_id__in=list(user_ids)
+    ).order_by().annotate(
+        row_number=Window(
+            RowNumber(),
+            partition_by=F('user_id'),
+            order_by=(F('pub_date').desc(), F('recipe_id').desc()),
+        )
+    ).values('id', 'row_number')
+    sql, params = ranked.query.sql_with_params()
+    table = FeedEntry._meta.db_table
+    with connections[FeedEntry.objects.db].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE id IN (SELECT ranked.id FROM '
+            f'({sql}) ranked WHERE ranked.row_number > %s)',
+            (*params, feed_conf['MAX_ENTRIES']),
+        )
+
+
+def is_fanned_out(author) -> bool:
+    """Рецепты авторов с огромным числом подписчиков не рассылаются
+    по лентам, а подтягиваются читателем (fan-out on read)."""
+
+    return author.followers_count <= feed_conf['FANOUT_LIMIT']
+
+
+@tasks.task('feed.fan_out')
+def fan_out(recipe_id: int) -> None:
+    """Добавляет новый рецепт в ленты подписчиков автора."""
+
+    recipe = Recipe.objects.select_related('author').only(
+        'author_id', 'pub_date', 'author__followers_count'
+    ).filter(pk=recipe_id).first()
+    if recipe is None or not is_fanned_out(recipe.author):
+        return
+    followers = Follow.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('follower_id', flat=True).iterator()
+    row = [(recipe.pk, recipe.author_id, recipe.pub_date)]
+    batch = []
+    for follower_id in followers:
+        batch.append(follower_id)
+        if len(batch) == feed_conf['BATCH_SIZE']:
+            _push(batch, row)
+            batch = []
+    if batch:
+        _push(batch, row)
+
+
+def _push(user_ids: List[int], recipes) -> None:
+    FeedEntry.objects.bulk_create(
+        _entries(user_ids, recipes), ignore_conflicts=True
+    )
+    trim(user_ids)
+
+
+def _recent(author_ids, since=None):
+    recipes = Recipe.objects.filter(author_id__in=author_ids)
+    if since is not None:
+        recipes = recipes.filter(pub_date__gt=since)
+    return list(recipes.order_by('-pub_date', '-id').values_list(
+        'id', 'author_id', 'pub_date'
+    )[:feed_conf['MAX_ENTRIES']])
+
+
+@tasks.task('feed.backfill')
+def backfill(user_id: int, author_id: int) -> None:
+    """Последние рецепты автора в ленту нового подписчика. Задача
+    выполняется позже подписки: если подписку уже отменили, лента
+    не меняется, а отменённую во время заполнения - очищается."""
+
+    following = Follow.objects.filter(follower_id=user_id, author_id=author_id)
+    if not following.exists():
+        return
+    _push([user_id], _recent([author_id]))
+    if not following.exists():
+        remove_author(user_id, author_id)
+
+
+def remove_author(user_id: int, author_id: int) -> None:
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def pull(user) -> None:
+    """Подтягивает в ленту новые рецепты авторов, которые не
+    рассылаются по лентам. Время последней подгрузки хранится
+    в кеше; если его нет, подгрузка повторяется целиком
+    (повторные записи игнорируются). Рецепты читаются с основной
+    базы: отставшая реплика пропустила бы их до следующей отметки.
+    pub_date ставится до фиксации транзакции, поэтому подгрузка
+    захватывает PULL_OVERLAP секунд до отметки: рецепт, записанный
+    раньше неё, но зафиксированный позже чтения, не теряется."""
+
+    author_ids = list(Follow.objects.filter(
+        follower=user,
+        author__followers_count__gt=feed_conf['FANOUT_LIMIT'],
+    ).values_list('author_id', flat=True))
+    if not author_ids:
+        return
+    key = PULL_KEY.format(user.pk)
+    now = timezone.now()
+    since = _cache().get(key)
+    if since is not None:
+        since -= timedelta(seconds=feed_conf['PULL_OVERLAP'])
+    with use_primary():
+        recipes = _recent(author_ids, since=since)
+    if recipes:
+        _push([user.pk], recipes)
+    _cache().set(key, now, feed_conf['PULL_TIMEOUT'])
+
+
+def feed_queryset(user):
+    """Записи ленты пользователя, новые сначала."""
+
+    pull(user)
+    return FeedEntry.objects.filter(user=user).order_by(
+        '-pub_date', '-recipe_id'
+    ).values('recipe_id', 'pub_date')
+
+
+def rebuild(user_ids: Iterable[int]) -> int:
+    """Заново заполняет ленты пользователей по их подпискам."""
+
+    count = 0
+    for user_id in user_ids:
+        FeedEntry.objects.filter(user_id=user_id).delete()
+        author_ids = [
+            author_id for author_id, followers in Follow.objects.filter(
+                follower_id=user_id
+            ).values_list('author_id', 'author__followers_count')
+            if followers <= feed_conf['FANOUT_LIMIT']
+        ]
+        if author_ids:
+            _push([user_id], _recent(author_ids))
+        _cache().delete(PULL_KEY.format(user_id))
+        count += 1
+    return count
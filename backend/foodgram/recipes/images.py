@@ -0,0 +1,238 @@
+import io
+import logging
+import os
+
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core import tasks
+from recipes import documents
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+image_conf = settings.IMAGE_SETTINGS
+
+IMAGE_DIR: str = 'recipes/images'
+VARIANT_DIR: str = 'recipes/variants'
+
+SAVE_OPTIONS: dict = {
+    'webp': {'format': 'WEBP', 'method': 4},
+    'jpeg': {'format': 'JPEG', 'optimize': True, 'progressive': True},
+}
+
+
+def _save_once(name: str, content) -> str:
+    """Сохраняет файл под заданным именем. Если параллельный
+    обработчик успел раньше, хранилище выдаёт новое имя -
+    такая копия удаляется, остаётся существующий файл."""
+
+    saved = default_storage.save(name, content)
+    if saved != name:
+        default_storage.delete(saved)
+    return name
+
+
+def original_name(digest: str, extension: str) -> str:
+    """Имя оригинала определяется его содержимым (sha256),
+    поэтому одинаковые изображения хранятся один раз."""
+
+    return f'{IMAGE_DIR}/{digest[:2]}/{digest}.{extension}'
+
+
+class PendingImage:
+    """Проверенное загруженное изображение во временном файле.
+    В хранилище попадает только при сохранении рецепта
+    (stored_image), а не при проверке данных запроса."""
+
+    def __init__(self, file, digest: str, extension: str):
+        self.file = file
+        self.name = original_name(digest, extension)
+
+    def store(self) -> bool:
+        """Сохраняет оригинал; True, если файла ещё не было."""
+
+        if default_storage.exists(self.name):
+            return False
+        self.file.seek(0)
+        saved = default_storage.save(
+            self.name, File(self.file, name=self.name)
+        )
+        if saved != self.name:
+            # Параллельная загрузка успела раньше.
+            default_storage.delete(saved)
+            return False
+        return True
+
+    def close(self) -> None:
+        self.file.close()
+
+
+@contextmanager
+def stored_image(validated_data: dict):
+    """Сохраняет загруженное изображение из validated_data
+    и подставляет вместо него имя файла. Если запись рецепта
+    не удалась, файл не удаляется: одинаковые изображения хранятся
+    один раз, и параллельный запрос мог уже сослаться на него.
+    Файлы без рецептов удаляет drop_orphans."""
+
+    pending = validated_data.get('image')
+    if not isinstance(pending, PendingImage):
+        yield
+        return
+    try:
+        pending.store()
+    finally:
+        pending.close()
+    validated_data['image'] = pending.name
+    yield
+
+
+def variant_names(name: str) -> Dict[str, Dict[str, str]]:
+    """Имена производных изображений: {вариант: {формат: путь}}."""
+
+    digest = os.path.splitext(os.path.basename(name))[0]
+    return {
+        variant: {
+            fmt: f'{VARIANT_DIR}/{digest[:2]}/{digest}/{variant}.{fmt}'
+            for fmt in image_conf['FORMATS']
+        }
+        for variant in image_conf['VARIANTS']
+    }
+
+
+def _render(image: Image.Image, size: int, fmt: str) -> ContentFile:
+    resized = image.copy()
+    resized.thumbnail((size, size), Image.LANCZOS)
+    if fmt == 'jpeg' and resized.mode not in ('RGB', 'L'):
+        resized = resized.convert('RGB')
+    buffer = io.BytesIO()
+    resized.save(buffer, quality=image_conf['QUALITY'], **SAVE_OPTIONS[fmt])
+    return ContentFile(buffer.getvalue())
+
+
+def build_variants(name: str) -> Dict[str, Dict[str, str]]:
+    """Создаёт уменьшенные копии в форматах из IMAGE_SETTINGS.
+    Уже существующие файлы не пересоздаются: для повторно
+    загруженного изображения оригинал даже не декодируется."""
+
+    names = variant_names(name)
+    missing = [
+        (variant, fmt, path)
+        for variant, formats in names.items()
+        for fmt, path in formats.items()
+        if not default_storage.exists(path)
+    ]
+    if not missing:
+        return names
+    with default_storage.open(name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    for variant, fmt, path in missing:
+        _save_once(
+            path, _render(image, image_conf['VARIANTS'][variant], fmt)
+        )
+    return names
+
+
+@tasks.task('recipes.process_image')
+def apply_variants(name: str) -> None:
+    """Строит варианты изображения и отмечает их у всех рецептов
+    с этим изображением. Ошибки не перехватываются: задачу
+    повторит очередь."""
+
+    variants = build_variants(name)
+    recipes = Recipe.objects.filter(image=name)
+    recipe_ids = list(recipes.values_list('pk', flat=True))
+    recipes.update(
+        image_variants={'source': name, 'variants': variants},
+        updated_at=timezone.now(),
+    )
+    documents.refresh(recipe_ids)
+
+
+def process_image(name: str) -> None:
+    try:
+        apply_variants(name)
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', name)
+
+
+def schedule(name: str) -> None:
+    """Ставит обработку изображения в очередь задач в текущей
+    транзакции; повторная, пока первая ждёт запуска, не ставится."""
+
+    tasks.enqueue('recipes.process_image', key=f'image:{name}', name=name)
+
+
+def orphan_images(grace: int) -> List[str]:
+    """Оригиналы, на которые не ссылается ни один рецепт и которые
+    сохранены больше grace секунд назад. Более новые файлы могут
+    принадлежать рецептам, транзакции которых ещё не завершились."""
+
+    border = timezone.now() - timedelta(seconds=grace)
+    dirs, _ = default_storage.listdir(IMAGE_DIR)
+    names = [
+        f'{IMAGE_DIR}/{folder}/{file_name}'
+        for folder in dirs
+        for file_name in default_storage.listdir(f'{IMAGE_DIR}/{folder}')[1]
+    ]
+    used = set(Recipe.objects.filter(
+        image__in=names
+    ).values_list('image', flat=True))
+    return [
+        name for name in names
+        if name not in used
+        and default_storage.get_modified_time(name) < border
+    ]
+
+
+def drop_orphans(grace: Optional[int] = None) -> List[str]:
+    """Удаляет оригиналы без рецептов (запись рецепта не удалась
+    или рецепт удалён) вместе с их уменьшенными копиями."""
+
+    if grace is None:
+        grace = image_conf['ORPHAN_GRACE']
+    if not default_storage.exists(IMAGE_DIR):
+        return []
+    orphans = orphan_images(grace)
+    for name in orphans:
+        for formats in variant_names(name).values():
+            for path in formats.values():
+                default_storage.delete(path)
+        default_storage.delete(name)
+    return orphans
+
+
+def variants_ready(recipe) -> bool:
+    variants = recipe.image_variants or {}
+    return bool(recipe.image) and variants.get('source') == recipe.image.name
+
+
+def stored_variant_urls(image: Optional[str],
+                        image_variants: dict) -> Dict[str, Dict[str, str]]:
+    """URL готовых вариантов по имени файла изображения и значению
+    поля image_variants (пусто, пока изображение обрабатывается)."""
+
+    if not image or (image_variants or {}).get('source') != image:
+        return {}
+    return {
+        variant: {
+            fmt: default_storage.url(path) for fmt, path in formats.items()
+        }
+        for variant, formats in image_variants['variants'].items()
+    }
+
+
+def variant_urls(recipe) -> Dict[str, Dict[str, str]]:
+    """URL готовых вариантов изображения рецепта."""
+
+    return stored_variant_urls(recipe.image.name, recipe.image_variants)
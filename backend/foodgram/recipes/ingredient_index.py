@@ -0,0 +1,90 @@
+import threading
+import time
+
+from bisect import bisect_left
+from typing import List, Optional
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+
+search_conf = settings.INGREDIENT_SEARCH_SETTINGS
+
+PREFIX_END: str = chr(0x10FFFF)
+
+
+class IngredientIndex:
+    """Индекс ингридиентов в памяти процесса для автодополнения.
+    Хранит названия в отсортированном массиве (эквивалент
+    сжатого префиксного дерева): поиск по префиксу - это два
+    бинарных поиска, поиск по подстроке - проход по массиву.
+    Индекс строится лениво при первом обращении, помечается
+    устаревшим сигналами модели Ingredient и дополнительно
+    перестраивается по истечении INDEX_TTL секунд, чтобы изменения,
+    сделанные другими процессами, не терялись."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: tuple = ([], [], ())
+        self._built_at: Optional[float] = None
+
+    def _build(self) -> None:
+        rows = sorted(
+            (name.lower(), pk, name, unit, updated_at)
+            for pk, name, unit, updated_at
+            in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit', 'updated_at'
+            ).iterator()
+        )
+        keys = [key for key, *_ in rows]
+        items = [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for _, pk, name, unit, _ in rows
+        ]
+        version = len(rows), max((row[-1] for row in rows), default=None)
+        self._state = keys, items, version
+        self._built_at = time.monotonic()
+
+    def _ensure_fresh(self) -> None:
+        built_at = self._built_at
+        if (built_at is not None
+                and time.monotonic() - built_at < search_conf['INDEX_TTL']):
+            return
+        with self._lock:
+            if self._built_at is built_at:
+                self._build()
+
+    def invalidate(self) -> None:
+        self._built_at = None
+
+    @property
+    def version(self) -> tuple:
+        """Число ингридиентов и дата последнего изменения
+        на момент построения индекса."""
+
+        self._ensure_fresh()
+        return self._state[2]
+
+    def all(self) -> List[dict]:
+        self._ensure_fresh()
+        return self._state[1]
+
+    def search(self, query: str) -> List[dict]:
+        """Ингридиенты, название которых начинается с query,
+        затем ингридиенты, содержащие query в середине названия;
+        внутри групп - по названию в нижнем регистре и id,
+        в том же порядке, что и core.filters.search_ingredients."""
+
+        self._ensure_fresh()
+        keys, items, _ = self._state
+        query = query.lower()
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + PREFIX_END, start)
+        substring = [
+            item for key, item in zip(keys, items)
+            if query in key and not key.startswith(query)
+        ]
+        return items[start:end] + substring
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,211 @@
+import threading
+import time
+
+from collections import defaultdict
+from collections.abc import Sequence
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from django.conf import settings
+
+from recipes.models import RecipeIngredient
+
+match_conf = settings.INGREDIENT_MATCH_SETTINGS
+
+Items = Tuple[Tuple[int, int], ...]
+
+
+class MatchState:
+    """Снимок индекса: разреженная матрица рецепт x ингридиент
+    в двух представлениях. По столбцам (ингридиент -> номера строк)
+    считается покрытие, по строкам (CSR: indptr/indices/amounts) -
+    недостающие ингридиенты рецепта."""
+
+    def __init__(self, recipe_ids, indptr, indices, amounts):
+        self.recipe_ids = recipe_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.amounts = amounts
+        self.totals = np.diff(indptr).astype(np.int32)
+        rows = np.repeat(
+            np.arange(len(recipe_ids), dtype=np.int32), self.totals
+        )
+        order = np.argsort(indices, kind='stable')
+        columns, starts = np.unique(indices[order], return_index=True)
+        self.postings: Dict[int, np.ndarray] = dict(zip(
+            columns.tolist(), np.split(rows[order], starts[1:])
+        ))
+
+    def row(self, recipe_id: int) -> Optional[int]:
+        row = int(np.searchsorted(self.recipe_ids, recipe_id))
+        if row < len(self.recipe_ids) and self.recipe_ids[row] == recipe_id:
+            return row
+        return None
+
+    def items(self, row: int) -> Items:
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return tuple(zip(
+            self.indices[start:end].tolist(), self.amounts[start:end].tolist()
+        ))
+
+
+class MatchResult(Sequence):
+    """Упорядоченные id подобранных рецептов. Массив в список
+    Python превращается только для запрошенного среза (страницы)."""
+
+    def __init__(self, recipe_ids: np.ndarray):
+        self.recipe_ids = recipe_ids
+
+    def __len__(self) -> int:
+        return len(self.recipe_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.recipe_ids[index].tolist()
+        return int(self.recipe_ids[index])
+
+
+class IngredientMatchIndex:
+    """Подбор рецептов по имеющимся ингридиентам ("что приготовить
+    из того, что есть"). Покрытие рецепта - доля его ингридиентов,
+    которые есть у пользователя; считается векторно по столбцам
+    разреженной матрицы для всех рецептов сразу.
+    Изменённые рецепты этого процесса попадают в небольшой оверлей,
+    который учитывается поверх снимка; при переполнении оверлея
+    и по истечении INDEX_TTL снимок перестраивается."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: Optional[MatchState] = None
+        self._overlay: Dict[int, Optional[Items]] = {}
+        self._built_at: Optional[float] = None
+
+    def _build(self) -> None:
+        rows = RecipeIngredient.objects.order_by(
+            'recipe_id', 'ingredient_id'
+        ).values_list('recipe_id', 'ingredient_id', 'amount')
+        data = np.fromiter(
+            (value for row in rows.iterator() for value in row),
+            dtype=np.int64,
+        ).reshape(-1, 3)
+        recipe_ids, starts = np.unique(data[:, 0], return_index=True)
+        indptr = np.append(starts, len(data)).astype(np.int64)
+        self._state = MatchState(
+            recipe_ids, indptr,
+            data[:, 1].astype(np.int32), data[:, 2].astype(np.int32),
+        )
+        self._overlay = {}
+        self._built_at = time.monotonic()
+
+    def _ensure_fresh(self) -> Tuple[MatchState, dict]:
+        built_at = self._built_at
+        if (built_at is None
+                or time.monotonic() - built_at >= match_conf['INDEX_TTL']):
+            with self._lock:
+                if self._built_at is built_at:
+                    self._build()
+        with self._lock:
+            return self._state, dict(self._overlay)
+
+    def invalidate(self) -> None:
+        self._built_at = None
+
+    def update(self, recipe_ids: Iterable[int]) -> None:
+        """Заносит актуальный состав рецептов в оверлей
+        (удалённые рецепты - как None)."""
+
+        if self._built_at is None:
+            return
+        recipe_ids = list(recipe_ids)
+        rows = RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('ingredient_id').values_list(
+            'recipe_id', 'ingredient_id', 'amount'
+        )
+        items = defaultdict(list)
+        for recipe_id, ingredient_id, amount in rows:
+            items[recipe_id].append((ingredient_id, amount))
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._overlay[recipe_id] = tuple(items[recipe_id]) or None
+            if len(self._overlay) > match_conf['OVERLAY_LIMIT']:
+                self._built_at = None
+
+    def _score_snapshot(self, state: MatchState, pantry: set, overlay):
+        have = np.zeros(len(state.recipe_ids), dtype=np.int32)
+        for ingredient_id in pantry:
+            rows = state.postings.get(ingredient_id)
+            if rows is not None:
+                have[rows] += 1
+        for recipe_id in overlay:
+            row = state.row(recipe_id)
+            if row is not None:
+                have[row] = 0
+        candidates = np.flatnonzero(have)
+        return (
+            state.recipe_ids[candidates], have[candidates],
+            state.totals[candidates],
+        )
+
+    @staticmethod
+    def _score_overlay(pantry: set, overlay):
+        scored = [
+            (recipe_id, sum(pk in pantry for pk, _ in items), len(items))
+            for recipe_id, items in overlay.items() if items
+        ]
+        scored = [row for row in scored if row[1]]
+        if not scored:
+            empty = np.empty(0, dtype=np.int32)
+            return np.empty(0, dtype=np.int64), empty, empty
+        recipe_ids, have, totals = zip(*scored)
+        return (
+            np.array(recipe_ids, dtype=np.int64),
+            np.array(have, dtype=np.int32),
+            np.array(totals, dtype=np.int32),
+        )
+
+    def match(self, ingredient_ids: Iterable[int],
+              min_coverage: float = 0) -> MatchResult:
+        """id рецептов по убыванию покрытия (затем по числу
+        имеющихся ингридиентов и новизне)."""
+
+        state, overlay = self._ensure_fresh()
+        pantry = set(ingredient_ids)
+        parts = (
+            self._score_snapshot(state, pantry, overlay),
+            self._score_overlay(pantry, overlay),
+        )
+        recipe_ids, have, totals = (
+            np.concatenate(arrays) for arrays in zip(*parts)
+        )
+        coverage = have / np.maximum(totals, 1)
+        selected = coverage >= min_coverage
+        recipe_ids = recipe_ids[selected]
+        have, coverage = have[selected], coverage[selected]
+        order = np.lexsort((-recipe_ids, -have, -coverage))
+        return MatchResult(recipe_ids[order])
+
+    def missing(self, recipe_ids: Iterable[int], ingredient_ids: Iterable[int]
+                ) -> Dict[int, Tuple[float, Items]]:
+        """Покрытие рецептов и их ингридиенты (id, количество),
+        которых нет среди ingredient_ids."""
+
+        state, overlay = self._ensure_fresh()
+        pantry = set(ingredient_ids)
+        result = {}
+        for recipe_id in recipe_ids:
+            if recipe_id in overlay:
+                items = overlay[recipe_id] or ()
+            else:
+                row = state.row(recipe_id)
+                items = state.items(row) if row is not None else ()
+            missing = tuple(
+                (pk, amount) for pk, amount in items if pk not in pantry
+            )
+            coverage = 1 - len(missing) / len(items) if items else 0
+            result[recipe_id] = coverage, missing
+        return result
+
+
+ingredient_match_index = IngredientMatchIndex()
@@ -1,8 +1,17 @@
 import csv
+import io
+import json
 import logging
 import os
+import time
+
+from itertools import islice
+from typing import Iterable, Iterator, List
 
 from django.apps import apps
+from django.db import connection, transaction
+
+from core.cache import reference_lists
 
 logger = logging.getLogger(__name__)
 handler = logging.StreamHandler()
@@ -20,10 +29,16 @@ ERROR_MESSAGE_FILENOTFOUND: str = ('Ошибка обработки запрос
 ERROR_MESSAGE_CONSTRAINT: str = ('Для корректной обработки импорта '
                                  'имя файла должно соответствовать '
                                  'указанному в таблице соответствия.')
+ERROR_MESSAGE_FORMAT: str = ('Неподдерживаемый формат файла {}. '
+                             'Допустимые форматы: .csv, .json.')
+ERROR_MESSAGE_JSON: str = 'Файл {} не является JSON-массивом объектов.'
 
 
 FILE_NAME = 'ingredients.csv'
 APP_MODEL = 'recipes.Ingredient'
+HEADER: tuple = ('name', 'measurement_unit',)
+JSON_CHUNK_SIZE: int = 64 * 1024
+STAGING_TABLE: str = 'fill_db_staging'
 
 
 def confirmation() -> None:
@@ -52,16 +67,15 @@ def get_file_path(folder_path, file_name) -> str:
     for root, dirs, files in os.walk(folder_path):
         if file_name in files:
             return str(os.path.join(root, file_name))
-        logger.error(err_msg(file_name))
-        raise SystemExit(ERROR_MESSAGE_CONSTRAINT)
+    logger.error(err_msg(file_name))
+    raise SystemExit(ERROR_MESSAGE_CONSTRAINT)
 
 
 def process_table(reader, _model, file_name) -> None:
-    header = ('name', 'measurement_unit',)
     row_count = row_success = 0
     for row in reader:
         _object_dict = {key: value for key, value
-                        in zip(header, row)}
+                        in zip(HEADER, row)}
         _, is_create = _model.objects.get_or_create(**_object_dict)
         row_count += 1
         if is_create:
@@ -80,3 +94,137 @@ def run(folder_path) -> None:
     with open(file_path, 'r') as csv_file:
         reader = csv.reader(csv_file, delimiter=',', quotechar='"')
         process_table(reader, _model, FILE_NAME)
+
+
+def read_csv(file) -> Iterator[tuple]:
+    reader = csv.reader(file, delimiter=',', quotechar='"')
+    for row in reader:
+        if row:
+            yield tuple(row[:len(HEADER)])
+
+
+def read_json(file) -> Iterator[tuple]:
+    """Поэлементно разбирает JSON-массив объектов,
+    не загружая файл в память целиком."""
+
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise SystemExit(ERROR_MESSAGE_JSON.format(file.name))
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                raise SystemExit(ERROR_MESSAGE_JSON.format(file.name))
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        yield tuple(item[key] for key in HEADER)
+
+
+READERS: dict = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+def batched(rows: Iterable, batch_size: int) -> Iterator[List]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def copy_batch(_model, rows: List[tuple]) -> None:
+    """Загружает пачку строк через COPY во временную таблицу
+    и переносит в основную только отсутствующие в ней записи."""
+
+    table = _model._meta.db_table
+    columns = ', '.join(HEADER)
+    timestamps = [
+        field.column for field in _model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    target_columns = ', '.join((*HEADER, *timestamps))
+    values = ', '.join((*HEADER, *['now()'] * len(timestamps)))
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} '
+            f'(name varchar(200), measurement_unit varchar(20))'
+        )
+        cursor.execute(f'TRUNCATE {STAGING_TABLE}')
+        cursor.copy_expert(
+            f'COPY {STAGING_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+        cursor.execute(
+            f'INSERT INTO {table} ({target_columns}) '
+            f'SELECT {values} FROM {STAGING_TABLE} s '
+            f'WHERE NOT EXISTS (SELECT 1 FROM {table} t '
+            f'WHERE t.name = s.name '
+            f'AND t.measurement_unit = s.measurement_unit)'
+        )
+
+
+def insert_batch(_model, rows: List[tuple]) -> None:
+    if connection.vendor == 'postgresql':
+        copy_batch(_model, rows)
+        return
+    _model.objects.bulk_create(
+        [_model(**dict(zip(HEADER, row))) for row in rows],
+        batch_size=len(rows),
+        ignore_conflicts=True,
+    )
+
+
+def bulk_import(file_path, _model, batch_size, dry_run) -> None:
+    """Пакетный импорт без подтверждения.
+    Файл читается потоково, дубликаты отсеиваются в памяти
+    (включая уже существующие в базе записи), новые строки
+    записываются пачками по batch_size."""
+
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in READERS:
+        raise SystemExit(ERROR_MESSAGE_FORMAT.format(file_path))
+    seen = set(_model.objects.values_list(*HEADER).iterator())
+    row_count = row_success = 0
+    started = time.monotonic()
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for batch in batched(READERS[extension](file), batch_size):
+            row_count += len(batch)
+            new_rows = []
+            for row in batch:
+                if row not in seen:
+                    seen.add(row)
+                    new_rows.append(row)
+            if new_rows and not dry_run:
+                insert_batch(_model, new_rows)
+            row_success += len(new_rows)
+    if row_success and not dry_run:
+        reference_lists.invalidate_all()
+    elapsed = time.monotonic() - started
+    rate = row_count / elapsed if elapsed else row_count
+    action = 'будет создано' if dry_run else 'успешно создано'
+    logger.info(f'Конец обработки файла {os.path.basename(file_path)}, '
+                f'обработано строк - {row_count}, {action} - {row_success}, '
+                f'{elapsed:.2f} с ({rate:.0f} строк/с).')
+
+
+def run_bulk(folder_path, file_name, batch_size, dry_run) -> None:
+    app_name, model_name = APP_MODEL.split('.')
+    file_path = get_file_path(folder_path, file_name)
+    logger.info(f'Начало пакетной обработки модели {app_name}.{model_name}')
+    _model = apps.get_model(app_label=app_name, model_name=model_name)
+    bulk_import(file_path, _model, batch_size, dry_run)
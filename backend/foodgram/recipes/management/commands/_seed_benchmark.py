@@ -0,0 +1,233 @@
+import datetime as dt
+
+from typing import Dict, List
+
+import numpy as np
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from core.cache import recipe_cards, reference_lists, user_flags
+from recipes import counters, feed, recommendations, search
+from recipes.ingredient_match import ingredient_match_index
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import Follow
+
+User = get_user_model()
+
+USER_PREFIX: str = 'bench_'
+TAG_PREFIX: str = 'bench-'
+PASSWORD: str = 'benchmark-password'
+BASE_DATE = dt.datetime(2023, 1, 1, tzinfo=dt.timezone.utc)
+
+TAGS: tuple = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+    ('Десерт', '#F2C14E', 'dessert'),
+    ('Выпечка', '#C97B3D', 'bakery'),
+    ('Суп', '#4E9BF2', 'soup'),
+    ('Салат', '#7BC96F', 'salad'),
+    ('Постное', '#9E9E9E', 'vegan'),
+)
+NAMES: tuple = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Сергей')
+WORDS: tuple = (
+    'домашний', 'быстрый', 'пирог', 'суп', 'салат', 'запеканка',
+    'с курицей', 'с грибами', 'по-деревенски', 'сливочный', 'острый',
+    'овощной', 'рагу', 'каша', 'десерт', 'с сыром', 'постный', 'лёгкий',
+)
+
+# Параметры распределений: популярность авторов, рецептов
+# и ингридиентов убывает по закону Ципфа.
+ZIPF_EXPONENT: float = 1.1
+INGREDIENTS_MEAN: float = 8
+INGREDIENTS_STD: float = 3
+
+
+def zipf_weights(size: int, rng: np.random.Generator) -> np.ndarray:
+    """Веса по закону Ципфа, случайно (но воспроизводимо)
+    распределённые между элементами."""
+
+    weights = 1 / np.arange(1, size + 1) ** ZIPF_EXPONENT
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def clear() -> int:
+    """Удаляет данные прошлой генерации (рецепты, подписки
+    и отметки удаляются каскадно вместе с пользователями)."""
+
+    deleted, _ = User.objects.filter(
+        username__startswith=USER_PREFIX
+    ).delete()
+    Tag.objects.filter(slug__startswith=TAG_PREFIX).delete()
+    return deleted
+
+
+def _users(count: int) -> List[int]:
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        User(
+            username=f'{USER_PREFIX}{number}',
+            email=f'{USER_PREFIX}{number}@benchmark.local',
+            first_name=NAMES[number % len(NAMES)],
+            last_name=f'Тестовый {number}',
+            password=password,
+        )
+        for number in range(count)
+    )
+    return list(User.objects.filter(
+        username__startswith=USER_PREFIX
+    ).order_by('pk').values_list('pk', flat=True))
+
+
+def _tags() -> List[int]:
+    Tag.objects.bulk_create(
+        Tag(name=f'{name} (тест)', color=color, slug=f'{TAG_PREFIX}{slug}')
+        for name, color, slug in TAGS
+    )
+    return list(Tag.objects.filter(
+        slug__startswith=TAG_PREFIX
+    ).order_by('pk').values_list('pk', flat=True))
+
+
+def _recipes(user_ids, count: int, rng, batch_size: int) -> List[int]:
+    authors = rng.choice(
+        user_ids, size=count, p=zipf_weights(len(user_ids), rng)
+    )
+    cooking_times = np.clip(
+        rng.lognormal(3.3, 0.6, size=count).astype(int), 1, 240
+    )
+    recipes = []
+    for number, (author_id, cooking_time) in enumerate(
+        zip(authors.tolist(), cooking_times.tolist())
+    ):
+        words = rng.choice(len(WORDS), size=3, replace=False)
+        title = ' '.join(WORDS[index] for index in words)
+        recipes.append(Recipe(
+            author_id=author_id,
+            name=f'{title.capitalize()} №{number}',
+            text=f'{title.capitalize()}. ' * int(rng.integers(1, 6)),
+            cooking_time=cooking_time,
+        ))
+    Recipe.objects.bulk_create(recipes, batch_size=batch_size)
+    recipe_ids = list(Recipe.objects.filter(
+        author__username__startswith=USER_PREFIX
+    ).order_by('pk').values_list('pk', flat=True))
+    Recipe.objects.bulk_update(
+        [
+            Recipe(pk=pk, pub_date=BASE_DATE + dt.timedelta(minutes=number))
+            for number, pk in enumerate(recipe_ids)
+        ],
+        ('pub_date',), batch_size=batch_size,
+    )
+    return recipe_ids
+
+
+def _compositions(recipe_ids, tag_ids, rng, batch_size: int) -> None:
+    ingredient_ids = np.array(
+        Ingredient.objects.order_by('pk').values_list('pk', flat=True)
+    )
+    ingredient_p = zipf_weights(len(ingredient_ids), rng)
+    tag_p = zipf_weights(len(tag_ids), rng)
+    sizes = np.clip(
+        rng.normal(INGREDIENTS_MEAN, INGREDIENTS_STD, len(recipe_ids)),
+        2, min(20, len(ingredient_ids)),
+    ).astype(int)
+    items, tags = [], []
+    for recipe_id, size in zip(recipe_ids, sizes.tolist()):
+        chosen = rng.choice(
+            ingredient_ids, size=size, replace=False, p=ingredient_p
+        )
+        amounts = rng.integers(1, 500, size=size)
+        items.extend(
+            RecipeIngredient(
+                recipe_id=recipe_id, ingredient_id=pk, amount=amount
+            )
+            for pk, amount in zip(chosen.tolist(), amounts.tolist())
+        )
+        tags.extend(
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=pk)
+            for pk in rng.choice(
+                tag_ids, size=int(rng.integers(1, 4)), replace=False, p=tag_p
+            ).tolist()
+        )
+    RecipeIngredient.objects.bulk_create(items, batch_size=batch_size)
+    Recipe.tags.through.objects.bulk_create(tags, batch_size=batch_size)
+
+
+def _pick(rng, ids, weights, mean: float, exclude=None) -> List[int]:
+    size = min(int(rng.poisson(mean)), len(ids) - 1)
+    chosen = rng.choice(ids, size=size, replace=False, p=weights).tolist()
+    return [pk for pk in chosen if pk != exclude]
+
+
+def _relations(user_ids, recipe_ids, rng, options) -> Dict[str, int]:
+    batch_size = options['batch_size']
+    author_p = zipf_weights(len(user_ids), rng)
+    recipe_p = zipf_weights(len(recipe_ids), rng)
+    follows, favorites, carts = [], [], []
+    for user_id in user_ids:
+        follows.extend(
+            Follow(follower_id=user_id, author_id=author_id)
+            for author_id in _pick(
+                rng, user_ids, author_p, options['follows'], user_id
+            )
+        )
+        favorites.extend(
+            counters.Favorited(foodgramuser_id=user_id, recipe_id=pk)
+            for pk in _pick(rng, recipe_ids, recipe_p, options['favorites'])
+        )
+        carts.extend(
+            counters.ShoppingCart(foodgramuser_id=user_id, recipe_id=pk)
+            for pk in _pick(rng, recipe_ids, recipe_p, options['carts'])
+        )
+    for model, rows in (
+        (Follow, follows),
+        (counters.Favorited, favorites),
+        (counters.ShoppingCart, carts),
+    ):
+        model.objects.bulk_create(rows, batch_size=batch_size)
+    return {
+        'follows': len(follows),
+        'favorites': len(favorites),
+        'carts': len(carts),
+    }
+
+
+def _refresh(user_ids, recipe_ids, batch_size: int) -> None:
+    """Пакетная вставка не вызывает сигналы: счётчики, поисковые
+    документы, ленты, рекомендации и кеши обновляются явно."""
+
+    for counter in counters.COUNTERS:
+        counters.recount(counter)
+    for start in range(0, len(recipe_ids), batch_size):
+        search.update_documents(recipe_ids[start:start + batch_size])
+    feed.rebuild(user_ids)
+    recommendations.build()
+    for namespace in (recipe_cards, reference_lists, user_flags):
+        namespace.invalidate_all()
+    search.recipe_index.invalidate()
+    ingredient_match_index.invalidate()
+
+
+def seed(options) -> Dict[str, int]:
+    """Воспроизводимый набор данных для нагрузочных замеров:
+    при одинаковых параметрах и seed получаются одинаковые данные."""
+
+    rng = np.random.default_rng(options['seed'])
+    batch_size = options['batch_size']
+    with transaction.atomic():
+        user_ids = _users(options['users'])
+        tag_ids = _tags()
+        recipe_ids = _recipes(user_ids, options['recipes'], rng, batch_size)
+        _compositions(recipe_ids, tag_ids, rng, batch_size)
+        created = _relations(user_ids, recipe_ids, rng, options)
+        _refresh(user_ids, recipe_ids, batch_size)
+    return {
+        'users': len(user_ids),
+        'tags': len(tag_ids),
+        'recipes': len(recipe_ids),
+        **created,
+    }
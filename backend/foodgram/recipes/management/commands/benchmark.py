@@ -0,0 +1,74 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark
+from recipes.management.commands._seed_benchmark import USER_PREFIX
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный замер основных эндпоинтов API в текущем '
+            'процессе: перцентили времени ответа и числа SQL-запросов '
+            'в формате JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-s', '--scenario',
+            dest='scenarios',
+            nargs='*',
+            choices=sorted(benchmark.SCENARIOS),
+            help='Сценарии (по умолчанию - все)',
+        )
+        parser.add_argument('--iterations', type=int, default=50,
+                            help='Количество замеров на сценарий')
+        parser.add_argument('--warmup', type=int, default=5,
+                            help='Количество прогревочных запросов')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Начальное значение выбора параметров')
+        parser.add_argument('--user', default=f'{USER_PREFIX}0',
+                            help='Имя пользователя для авторизованных '
+                                 'запросов')
+        parser.add_argument('-o', '--output',
+                            help='Файл для результатов в JSON')
+        parser.add_argument('--compare',
+                            help='JSON прошлого прогона для сравнения')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Допустимый рост p95 при сравнении')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations должен быть больше 0')
+        user = User.objects.filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(
+                f'Пользователь {options["user"]} не найден, '
+                'сгенерируйте данные: manage.py seed_benchmark'
+            )
+        result = benchmark.run(
+            user, options['scenarios'] or list(benchmark.SCENARIOS),
+            options['iterations'], options['warmup'], options['seed'],
+        )
+        report = json.dumps(result, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(report)
+        else:
+            self.stdout.write(report)
+        if options['compare']:
+            with open(options['compare']) as file:
+                baseline = json.load(file)
+            lines, regressed = benchmark.compare(
+                result, baseline, options['tolerance']
+            )
+            for line in lines:
+                self.stderr.write(line)
+            if regressed:
+                raise CommandError('Обнаружена регрессия.')
+        if result['meta']['failed']:
+            raise CommandError(
+                'Большинство ответов - ошибки, замер недействителен: '
+                + ', '.join(result['meta']['failed'])
+            )
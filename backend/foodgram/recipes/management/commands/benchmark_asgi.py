@@ -0,0 +1,67 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark
+from recipes.management.commands._seed_benchmark import USER_PREFIX
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнение пропускной способности эндпоинтов чтения '
+            'под WSGI и ASGI: запросов в секунду и перцентили времени '
+            'ответа при заданном числе одновременных запросов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-s', '--scenario',
+            dest='scenarios',
+            nargs='*',
+            choices=benchmark.READ_SCENARIOS,
+            help='Сценарии (по умолчанию - все сценарии чтения)',
+        )
+        parser.add_argument('--requests', type=int, default=500,
+                            help='Количество запросов в каждом режиме')
+        parser.add_argument('--concurrency', type=int, default=20,
+                            help='Число одновременных запросов')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Начальное значение выбора параметров')
+        parser.add_argument('--user', default=f'{USER_PREFIX}0',
+                            help='Имя пользователя для авторизованных '
+                                 'запросов')
+        parser.add_argument('--url', dest='urls', nargs='*',
+                            help='Адреса запущенных серверов; без них '
+                                 'оба стека замеряются в текущем процессе')
+        parser.add_argument('-o', '--output',
+                            help='Файл для результатов в JSON')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError(
+                '--requests и --concurrency должны быть больше 0'
+            )
+        user = User.objects.filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(
+                f'Пользователь {options["user"]} не найден, '
+                'сгенерируйте данные: manage.py seed_benchmark'
+            )
+        result = benchmark.compare_servers(
+            user, options['scenarios'] or list(benchmark.READ_SCENARIOS),
+            options['requests'], options['concurrency'], options['seed'],
+            options['urls'],
+        )
+        report = json.dumps(result, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(report)
+        else:
+            self.stdout.write(report)
+        failed = benchmark.failed_scenarios(result['modes'])
+        if failed:
+            raise CommandError(
+                'Большинство ответов - ошибки, замер недействителен: '
+                + ', '.join(failed)
+            )
@@ -0,0 +1,88 @@
+import json
+import time
+
+import numpy as np
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import FastJSONRenderer
+from recipes.documents import serialize_cards
+from recipes.models import Recipe
+
+# Режимы: сборка карточек и рендерер ответа.
+MODES = {
+    'serializer': (False, JSONRenderer),
+    'compiled': (True, FastJSONRenderer),
+}
+
+
+def _render(recipe_ids, mode: str) -> bytes:
+    compiled, renderer = MODES[mode]
+    cards = serialize_cards(recipe_ids, compiled)
+    return renderer().render([cards[pk] for pk in recipe_ids if pk in cards])
+
+
+class Command(BaseCommand):
+    help = ('Замер быстрой сборки карточек рецептов: время процессора '
+            'на страницу при сборке из .values() с orjson и через '
+            'RecipeReadSerializer с JSONRenderer (без кеша карточек). '
+            'Побайтное совпадение ответов проверяют тесты API.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=20,
+                            help='Количество страниц для замера')
+        parser.add_argument('--page-size', type=int, default=50,
+                            help='Рецептов на странице')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Повторов каждой страницы')
+        parser.add_argument('-o', '--output',
+                            help='Файл для результатов в JSON')
+
+    @staticmethod
+    def _measure(pages, mode: str, repeat: int) -> dict:
+        timings = []
+        for page in pages:
+            for _ in range(repeat):
+                started = time.process_time()
+                _render(page, mode)
+                timings.append((time.process_time() - started) * 1000)
+        return {
+            'cpu_ms_p50': round(float(np.percentile(timings, 50)), 2),
+            'cpu_ms_p95': round(float(np.percentile(timings, 95)), 2),
+            'cpu_ms_mean': round(float(np.mean(timings)), 2),
+        }
+
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+        if min(options['pages'], page_size, options['repeat']) < 1:
+            raise CommandError(
+                '--pages, --page-size и --repeat должны быть больше 0'
+            )
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        if not recipe_ids:
+            raise CommandError(
+                'Рецептов нет, сгенерируйте данные: manage.py seed_benchmark'
+            )
+        pages = [
+            recipe_ids[start:start + page_size]
+            for start in range(0, len(recipe_ids), page_size)
+        ][:options['pages']]
+        result = {
+            'page_size': page_size,
+            'pages': len(pages),
+            **{
+                mode: self._measure(pages, mode, options['repeat'])
+                for mode in MODES
+            },
+        }
+        result['speedup'] = round(
+            result['serializer']['cpu_ms_mean']
+            / max(result['compiled']['cpu_ms_mean'], 0.01), 2
+        )
+        report = json.dumps(result, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(report)
+        else:
+            self.stdout.write(report)
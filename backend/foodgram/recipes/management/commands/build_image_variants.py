@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from recipes import images
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Построение уменьшенных копий изображений рецептов, '
+            'для которых они ещё не готовы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--drop-orphans',
+            action='store_true',
+            help='Удалить изображения, на которые не ссылается '
+                 'ни один рецепт (старше IMAGE_SETTINGS["ORPHAN_GRACE"])',
+        )
+
+    def handle(self, *args, **options):
+        names = set()
+        for recipe in Recipe.objects.exclude(image='').exclude(
+            image__isnull=True
+        ).only('image', 'image_variants').iterator():
+            if not images.variants_ready(recipe):
+                names.add(recipe.image.name)
+        for name in sorted(names):
+            images.process_image(name)
+        self.stdout.write(f'Обработано изображений: {len(names)}')
+        if options['drop_orphans']:
+            dropped = images.drop_orphans()
+            self.stdout.write(f'Удалено изображений без рецептов: '
+                              f'{len(dropped)}')
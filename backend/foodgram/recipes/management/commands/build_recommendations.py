@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from recipes import recommendations
+
+
+class Command(BaseCommand):
+    help = ('Расчёт похожих рецептов по совместному добавлению '
+            'в избранное и корзину.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='пересчитать только рецепты, отметки которых изменились '
+                 'после прошлого расчёта',
+        )
+
+    def handle(self, *args, **options):
+        since = recommendations.last_built_at()
+        if options['incremental'] and since is not None:
+            count = recommendations.update(since)
+            self.stdout.write(f'Пересчитано рецептов: {count}')
+            return
+        count = recommendations.build()
+        self.stdout.write(f'Рецептов с похожими: {count}')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.cache import stats
+
+
+class Command(BaseCommand):
+    help = 'Счётчики попаданий и промахов кеша API по всем процессам.'
+
+    def handle(self, *args, **options):
+        for namespace, counters in stats.totals().items():
+            total = counters['hits'] + counters['misses']
+            ratio = counters['hits'] / total if total else 0
+            self.stdout.write(
+                f'{namespace}: hits={counters["hits"]} '
+                f'misses={counters["misses"]} hit_ratio={ratio:.2%}'
+            )
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import query_plans
+
+
+class Command(BaseCommand):
+    help = ('Проверка планов запросов списка рецептов: EXPLAIN страницы '
+            'и подсчёта для каждого сочетания фильтров RecipeFilter '
+            'на текущих данных. Ошибка, если какая-либо таблица '
+            'читается полным просмотром (Seq Scan).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true',
+                            help='Перед проверкой обновить статистику '
+                                 'планировщика (ANALYZE)')
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Выводить планы всех запросов')
+
+    def handle(self, *args, **options):
+        if options['analyze']:
+            query_plans.analyze()
+        sample = query_plans.samples()
+        if sample['author'] is None or len(sample['tags']) < 2:
+            raise CommandError(
+                'Недостаточно данных для проверки планов, '
+                'сгенерируйте их: manage.py seed_benchmark'
+            )
+        failed = 0
+        for result in query_plans.check(sample):
+            title = '{} [{}]'.format(
+                result['query'], ', '.join(result['filters']) or '-'
+            )
+            if result['violations']:
+                failed += 1
+                self.stdout.write(self.style.ERROR(
+                    f'{title}: полный просмотр '
+                    f'{", ".join(result["violations"])}'
+                ))
+            elif options['verbose_plans']:
+                self.stdout.write(self.style.SUCCESS(title))
+            if result['violations'] or options['verbose_plans']:
+                for line in result['plan']:
+                    self.stdout.write(f'    {line}')
+        if failed:
+            raise CommandError(f'Запросов с полным просмотром: {failed}')
+        self.stdout.write(self.style.SUCCESS('Полных просмотров нет'))
@@ -1,4 +1,5 @@
-from django.core.management.base import BaseCommand
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
 
 from recipes.management.commands import _fill_db_main
 
@@ -14,8 +15,45 @@ class Command(BaseCommand):
             help='Определяет путь к папке с импортируемыми файлами',
             default=''
         )
+        parser.add_argument(
+            '-b', '--bulk',
+            action='store_true',
+            help='Пакетный импорт без подтверждения '
+                 '(поддерживаются файлы .csv и .json)',
+        )
+        parser.add_argument(
+            '-f', '--file',
+            dest='file_name',
+            type=str,
+            help='Имя импортируемого файла (только для --bulk)',
+            default=_fill_db_main.FILE_NAME
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Количество строк в одной пачке (только для --bulk)',
+            default=1000
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Прочитать файл и подсчитать новые записи, '
+                 'ничего не записывая в базу (только для --bulk)',
+        )
 
     def handle(self, *args, **options):
-        _fill_db_main.confirmation()
-        _fill_db_main.run(options['path'])
+        if options['bulk']:
+            if options['batch_size'] < 1:
+                raise CommandError('--batch-size должен быть больше 0')
+            _fill_db_main.run_bulk(
+                options['path'], options['file_name'],
+                options['batch_size'], options['dry_run']
+            )
+            if not options['dry_run']:
+                # COPY и bulk_create не вызывают сигналов,
+                # поэтому счётчики сверяются после импорта.
+                call_command('recount_counters', stdout=self.stdout)
+        else:
+            _fill_db_main.confirmation()
+            _fill_db_main.run(options['path'])
         print('Complete!')
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from recipes import feed
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Заполнение лент подписок пользователей заново.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-u', '--user',
+            dest='user_ids',
+            type=int,
+            nargs='*',
+            help='id пользователей (по умолчанию - все)',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids'] or User.objects.values_list(
+            'pk', flat=True
+        ).iterator()
+        count = feed.rebuild(user_ids)
+        self.stdout.write(f'Обновлено лент: {count}')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipes import documents
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Пересборка сохранённых карточек всех рецептов '
+            '(после изменения схемы RecipeReadSerializer).')
+
+    def handle(self, *args, **options):
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        documents.refresh(recipe_ids)
+        self.stdout.write(f'Собрано карточек: {len(recipe_ids)}')
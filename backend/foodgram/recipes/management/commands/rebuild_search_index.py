@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipes import search
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт поисковых документов всех рецептов.'
+
+    def handle(self, *args, **options):
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        batch_size = search.search_conf['BATCH_SIZE']
+        for start in range(0, len(recipe_ids), batch_size):
+            search.update_documents(recipe_ids[start:start + batch_size])
+        self.stdout.write(f'Проиндексировано рецептов: {len(recipe_ids)}')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes import counters
+
+
+class Command(BaseCommand):
+    help = ('Пересчёт денормализованных счётчиков '
+            '(избранное, корзины, рецепты и подписчики авторов).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только подсчитать записи с расхождениями',
+        )
+
+    def handle(self, *args, **options):
+        for counter in counters.COUNTERS:
+            with transaction.atomic():
+                drifted = counters.recount(
+                    counter, dry_run=options['dry_run']
+                )
+            self.stdout.write(
+                f'{counter.model._meta.model_name}.{counter.field}: '
+                f'расхождений {drifted}'
+            )
@@ -0,0 +1,30 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.tasks import Worker
+
+
+class Command(BaseCommand):
+    help = ('Выполнение фоновых задач из очереди (таблица tasks) '
+            'пулом потоков. SIGTERM и SIGINT завершают обработчик '
+            'после выполнения уже забранных задач.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int,
+            default=settings.TASK_SETTINGS['WORKERS'],
+            help='Количество потоков',
+        )
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи и завершиться')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers должно быть больше 0')
+        worker = Worker(options['workers'])
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        done = worker.run(once=options['once'])
+        self.stdout.write(f'Выполнено задач: {done}')
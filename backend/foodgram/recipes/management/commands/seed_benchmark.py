@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.management.commands import _seed_benchmark
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = ('Генерация воспроизводимого набора данных для нагрузочных '
+            'замеров: пользователи, рецепты, подписки, избранное, корзины.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200,
+                            help='Количество пользователей')
+        parser.add_argument('--recipes', type=int, default=2000,
+                            help='Количество рецептов')
+        parser.add_argument('--follows', type=float, default=10,
+                            help='Среднее число подписок пользователя')
+        parser.add_argument('--favorites', type=float, default=20,
+                            help='Среднее число рецептов в избранном')
+        parser.add_argument('--carts', type=float, default=5,
+                            help='Среднее число рецептов в корзине')
+        parser.add_argument('--seed', type=int, default=42,
+                            help='Начальное значение генератора')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Количество строк в одной пачке')
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Удалить данные предыдущей генерации',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['recipes'] < 1:
+            raise CommandError('Нужно не меньше двух пользователей '
+                               'и одного рецепта.')
+        if not Ingredient.objects.exists():
+            raise CommandError('Сначала загрузите ингридиенты: '
+                               'manage.py fill_db --bulk')
+        if options['clear']:
+            _seed_benchmark.clear()
+        elif _seed_benchmark.User.objects.filter(
+            username__startswith=_seed_benchmark.USER_PREFIX
+        ).exists():
+            raise CommandError('Данные уже сгенерированы, '
+                               'используйте --clear для пересоздания.')
+        created = _seed_benchmark.seed(options)
+        self.stdout.write(', '.join(
+            f'{name}: {count}' for name, count in created.items()
+        ))
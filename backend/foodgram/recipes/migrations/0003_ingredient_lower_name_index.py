@@ -0,0 +1,34 @@
+from django.db import migrations
+
+INDEX_NAME = 'ingredient_lower_name_idx'
+
+
+def create_index(apps, schema_editor):
+    """Индекс для поиска по началу названия без учёта регистра.
+    text_pattern_ops позволяет использовать его в LIKE 'x%'
+    при любой сортировке (collation) базы, поэтому индекс создаётся
+    только на PostgreSQL."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = apps.get_model('recipes', 'Ingredient')._meta.db_table
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} '
+        f'ON {table} (lower(name) text_pattern_ops)'
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_ingredient_lower_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='Дата последнего изменения ингридиента', verbose_name='Дата обновления'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='Дата последнего изменения рецепта', verbose_name='Дата обновления'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='Дата последнего изменения тэга', verbose_name='Дата обновления'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(source, field):
+    counted = source.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counted), 0, output_field=models.IntegerField())
+
+
+def fill_counters(apps, schema_editor):
+    """Начальные значения денормализованных счётчиков."""
+
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('users', 'FoodGramUser')
+    Follow = apps.get_model('users', 'Follow')
+    Recipe.objects.update(
+        favorites_count=_count(Recipe.favorited.through, 'recipe'),
+        carts_count=_count(Recipe.in_shopping_cart.through, 'recipe'),
+    )
+    User.objects.update(
+        recipes_count=_count(Recipe, 'author'),
+        followers_count=_count(Follow, 'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_updated_at'),
+        ('users', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='В скольких корзинах находится рецепт', verbose_name='В корзинах'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Сколько раз рецепт добавлен в избранное', verbose_name='В избранном'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Уменьшенные копии изображения в разных форматах', verbose_name='Варианты изображения'),
+        ),
+    ]
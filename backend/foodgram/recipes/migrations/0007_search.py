@@ -0,0 +1,94 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:15
+
+from collections import defaultdict
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+VECTOR_INDEX = 'recipe_search_vector_idx'
+TRIGRAM_INDEX = 'recipe_search_document_trgm_idx'
+
+
+def _clean(text):
+    return ' '.join((text or '').split())
+
+
+def fill_documents(apps, schema_editor):
+    """Поисковые документы для существующих рецептов:
+    название, тэги и ингридиенты, описание - по строке на часть."""
+
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    keywords = defaultdict(list)
+    tags = Recipe.tags.through.objects.values_list('recipe_id', 'tag__name')
+    ingredients = RecipeIngredient.objects.values_list(
+        'recipe_id', 'ingredient__name'
+    )
+    for recipe_id, name in (*tags, *ingredients):
+        keywords[recipe_id].append(name)
+    recipes = [
+        Recipe(pk=pk, search_document='\n'.join((
+            _clean(name), _clean(' '.join(keywords[pk])), _clean(text)
+        )))
+        for pk, name, text in Recipe.objects.values_list('pk', 'name', 'text')
+    ]
+    Recipe.objects.bulk_update(recipes, ('search_document',), batch_size=500)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = Recipe._meta.db_table
+    schema_editor.execute(
+        f"UPDATE {table} SET search_vector = "
+        "setweight(to_tsvector('russian', "
+        "split_part(search_document, E'\\n', 1)), 'A') || "
+        "setweight(to_tsvector('russian', "
+        "split_part(search_document, E'\\n', 2)), 'B') || "
+        "setweight(to_tsvector('russian', "
+        "split_part(search_document, E'\\n', 3)), 'C')"
+    )
+
+
+def create_indexes(apps, schema_editor):
+    """GIN-индексы по tsvector и по триграммам документа.
+    Создаются только на PostgreSQL."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = apps.get_model('recipes', 'Recipe')._meta.db_table
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {VECTOR_INDEX} '
+        f'ON {table} USING gin (search_vector)'
+    )
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} '
+        f'ON {table} USING gin (search_document gin_trgm_ops)'
+    )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {VECTOR_INDEX}')
+    schema_editor.execute(f'DROP INDEX IF EXISTS {TRIGRAM_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_image_variants'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Название, тэги, ингридиенты и описание для поиска', verbose_name='Поисковый документ'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='tsvector поискового документа (только PostgreSQL)', null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(fill_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='marks_changed_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, help_text='Когда рецепт последний раз добавляли в избранное или корзину (или убирали оттуда)', null=True, verbose_name='Изменение отметок'),
+        ),
+        migrations.CreateModel(
+            name='RecipeSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(help_text='Косинусное сходство рецептов', verbose_name='Сходство')),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Дата расчёта сходства', verbose_name='Дата расчёта')),
+                ('neighbour', models.ForeignKey(help_text='Похожий рецепт', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.recipe', verbose_name='Похожий рецепт')),
+                ('recipe', models.ForeignKey(help_text='Рецепт', on_delete=django.db.models.deletion.CASCADE, related_name='similar', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Похожий рецепт',
+                'verbose_name_plural': 'Похожие рецепты',
+                'db_table': 'recipe_similarities',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipesimilarity',
+            index=models.Index(fields=['recipe', '-score'], name='similarity_recipe_score_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipesimilarity',
+            constraint=models.UniqueConstraint(fields=('recipe', 'neighbour'), name='unique_recipe_neighbour'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recommendations'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'ordering': ('-pub_date', '-id'), 'verbose_name': 'Рецепт', 'verbose_name_plural': 'Рецепты'},
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+        # Составные индексы промежуточных таблиц: выборка рецептов по тэгу
+        # или пользователю читается из индекса целиком, без обращения
+        # к таблице (у Django есть только (recipe_id, ...) и одиночные).
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS recipe_tags_tag_recipe_idx '
+                'ON recipes_tags (tag_id, recipe_id)',
+            reverse_sql='DROP INDEX IF EXISTS recipe_tags_tag_recipe_idx',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS recipe_favorited_user_recipe_idx '
+                'ON recipes_favorited (foodgramuser_id, recipe_id)',
+            reverse_sql='DROP INDEX IF EXISTS recipe_favorited_user_recipe_idx',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS recipe_cart_user_recipe_idx '
+                'ON recipes_in_shopping_cart (foodgramuser_id, recipe_id)',
+            reverse_sql='DROP INDEX IF EXISTS recipe_cart_user_recipe_idx',
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeDocument',
+            fields=[
+                ('recipe', models.OneToOneField(help_text='Рецепт', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('card', models.JSONField(help_text='Карточка рецепта без флагов пользователя', verbose_name='Карточка')),
+                ('built_at', models.DateTimeField(auto_now=True, help_text='Когда карточка была собрана', verbose_name='Дата сборки')),
+            ],
+            options={
+                'verbose_name': 'Карточка рецепта',
+                'verbose_name_plural': 'Карточки рецептов',
+                'db_table': 'recipe_documents',
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:58
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_documents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Имя зарегистрированной задачи', max_length=100, verbose_name='Задача')),
+                ('kwargs', models.JSONField(blank=True, default=dict, help_text='Именованные аргументы задачи', verbose_name='Аргументы')),
+                ('key', models.CharField(blank=True, help_text='Пока задача ожидает, такая же не ставится повторно', max_length=255, null=True, verbose_name='Ключ идемпотентности')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('running', 'Выполняется'), ('done', 'Выполнена'), ('failed', 'Ошибка')], default='pending', help_text='Состояние задачи', max_length=10, verbose_name='Состояние')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, help_text='Сколько раз задача запускалась', verbose_name='Попытки')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, help_text='Не раньше этого времени (отсрочка повтора)', verbose_name='Запуск после')),
+                ('locked_until', models.DateTimeField(blank=True, help_text='После этого времени задачу зависшего воркера может взять другой', null=True, verbose_name='Занята до')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Когда задача поставлена в очередь', verbose_name='Дата создания')),
+                ('finished_at', models.DateTimeField(blank=True, help_text='Когда задача выполнена или окончательно провалена', null=True, verbose_name='Дата завершения')),
+                ('duration', models.FloatField(blank=True, help_text='Время последнего запуска, секунд', null=True, verbose_name='Длительность')),
+                ('error', models.TextField(blank=True, default='', help_text='Трассировка последней ошибки', verbose_name='Ошибка')),
+            ],
+            options={
+                'verbose_name': 'Задача',
+                'verbose_name_plural': 'Задачи',
+                'db_table': 'tasks',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status', 'run_after'], name='task_status_run_after_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('key',), name='unique_pending_task_key'),
+        ),
+    ]
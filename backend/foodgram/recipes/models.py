@@ -1,7 +1,13 @@
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import Exists, F, OuterRef, Prefetch, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from users.models import Follow
 
 User = get_user_model()
 
@@ -22,6 +28,11 @@ class Tag(models.Model):
         help_text='Укажите слаг для тэга. Используйте только '
                   'латиницу, цифры, дефисы и знаки подчёркивания'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата обновления',
+        help_text='Дата последнего изменения тэга',
+    )
 
     class Meta:
         verbose_name = 'Тег'
@@ -45,6 +56,11 @@ class Ingredient(models.Model):
         verbose_name='Единица измерения',
         help_text='Введите единицу измерения ингридиента'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата обновления',
+        help_text='Дата последнего изменения ингридиента',
+    )
 
     class Meta:
         verbose_name = 'Ингредиент'
@@ -55,6 +71,71 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов для рецептов."""
+
+    def with_flags(self, user):
+        """Добавляет аннотации is_favorited и is_in_shopping_cart
+        для переданного пользователя."""
+
+        if user.is_anonymous:
+            return self
+        favorited = self.model.favorited.through
+        in_shopping_cart = self.model.in_shopping_cart.through
+        return self.annotate(
+            is_favorited=Exists(favorited.objects.filter(
+                foodgramuser=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(in_shopping_cart.objects.filter(
+                foodgramuser=user, recipe=OuterRef('pk')
+            )),
+        )
+
+    def with_read_data(self, user):
+        """Подготавливает рецепты к сериализации для чтения.
+        Связанные объекты подгружаются фиксированным числом запросов,
+        а флаги избранного, корзины и подписки на автора вычисляются
+        в виде аннотаций для переданного пользователя."""
+
+        authors = User.objects.all()
+        if user.is_authenticated:
+            authors = authors.annotate(
+                is_subscribed=Exists(Follow.objects.filter(
+                    follower=user, author=OuterRef('pk')
+                ))
+            )
+        return self.with_flags(user).defer(
+            'search_document', 'search_vector'
+        ).prefetch_related(
+            Prefetch('author', queryset=authors),
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+
+    def latest_by_author(self, author_ids, limit: int):
+        """Последние limit рецептов каждого из авторов одним запросом.
+        Рецепты нумеруются оконной функцией ROW_NUMBER() в пределах
+        автора, отбор по номеру делается во внешнем запросе
+        (фильтр по оконным аннотациям ORM не поддерживает)."""
+
+        ranked = self.filter(author_id__in=author_ids).order_by().annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('pub_date').desc(), F('id').desc()),
+            )
+        )
+        sql, params = ranked.query.sql_with_params()
+        return self.raw(
+            f'SELECT * FROM ({sql}) ranked WHERE ranked.row_number <= %s '
+            'ORDER BY ranked.author_id, ranked.row_number',
+            (*params, limit),
+        )
+
+
 class Recipe(models.Model):
     """Модель рецепта"""
     author = models.ForeignKey(
@@ -69,6 +150,11 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         help_text='Дата публикации рецепта',
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата обновления',
+        help_text='Дата последнего изменения рецепта',
+    )
     name = models.CharField(
         max_length=200,
         verbose_name='Название рецепта',
@@ -81,6 +167,13 @@ class Recipe(models.Model):
         null=True,
         blank=True,
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты изображения',
+        help_text='Уменьшенные копии изображения в разных форматах',
+    )
     text = models.TextField(
         blank=True,
         null=True,
@@ -129,12 +222,58 @@ class Recipe(models.Model):
         help_text='Корзина',
         blank=True
     )
+    search_document = models.TextField(
+        default='',
+        blank=True,
+        editable=False,
+        verbose_name='Поисковый документ',
+        help_text='Название, тэги, ингридиенты и описание для поиска',
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор',
+        help_text='tsvector поискового документа (только PostgreSQL)',
+    )
+    marks_changed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name='Изменение отметок',
+        help_text='Когда рецепт последний раз добавляли в избранное '
+                  'или корзину (или убирали оттуда)',
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном',
+        help_text='Сколько раз рецепт добавлен в избранное',
+    )
+    carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В корзинах',
+        help_text='В скольких корзинах находится рецепт',
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         db_table = 'recipes'
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -181,3 +320,242 @@ class RecipeIngredient(models.Model):
 
     def __str__(self):
         return f'{self.recipe} >>> {self.ingredient} : {self.amount}'
+
+
+class RecipeDocument(models.Model):
+    """Материализованная карточка рецепта: общая для всех
+    пользователей часть ответа RecipeReadSerializer (автор, тэги,
+    ингридиенты, URL изображения). Пересобирается после изменения
+    рецепта, его ингридиентов и тэгов или профиля автора, поэтому
+    карточки страницы читаются одним запросом по первичному ключу."""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='document',
+        verbose_name='Рецепт',
+        help_text='Рецепт'
+    )
+    card = models.JSONField(
+        verbose_name='Карточка',
+        help_text='Карточка рецепта без флагов пользователя',
+    )
+    built_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата сборки',
+        help_text='Когда карточка была собрана',
+    )
+
+    class Meta:
+        db_table = 'recipe_documents'
+        verbose_name = 'Карточка рецепта'
+        verbose_name_plural = 'Карточки рецептов'
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.built_at}'
+
+
+class FeedEntry(models.Model):
+    """Запись ленты подписок: рецепт автора, на которого подписан
+    пользователь. Ленты заполняются при публикации рецепта
+    (fan-out on write), поэтому страница ленты читается одним
+    проходом по индексу (user, pub_date, recipe)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Читатель',
+        help_text='Владелец ленты'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт',
+        help_text='Рецепт в ленте'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+        help_text='Автор рецепта'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+        help_text='Дата публикации рецепта',
+    )
+
+    class Meta:
+        db_table = 'feed_entries'
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} <<< {self.recipe}'
+
+
+class RecipeSimilarity(models.Model):
+    """Ближайшие соседи рецепта по совместному добавлению
+    в избранное и корзину (косинусная мера). Строится командой
+    build_recommendations, для каждого рецепта хранится
+    не более RECOMMENDATION_SETTINGS['NEIGHBOURS'] соседей."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar',
+        verbose_name='Рецепт',
+        help_text='Рецепт'
+    )
+    neighbour = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт',
+        help_text='Похожий рецепт'
+    )
+    score = models.FloatField(
+        verbose_name='Сходство',
+        help_text='Косинусное сходство рецептов',
+    )
+    computed_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Дата расчёта',
+        help_text='Дата расчёта сходства',
+    )
+
+    class Meta:
+        db_table = 'recipe_similarities'
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'neighbour'],
+                name='unique_recipe_neighbour'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'],
+                name='similarity_recipe_score_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} ~ {self.neighbour}: {self.score:.3f}'
+
+
+class Task(models.Model):
+    """Фоновая задача: побочное действие записи, которое выполняет
+    воркер (manage.py run_worker) вне HTTP-запроса. Задача
+    сохраняется в той же транзакции, что и данные, поэтому
+    не теряется и не выполняется для откатившейся записи."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(
+        max_length=100,
+        verbose_name='Задача',
+        help_text='Имя зарегистрированной задачи',
+    )
+    kwargs = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Аргументы',
+        help_text='Именованные аргументы задачи',
+    )
+    key = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        verbose_name='Ключ идемпотентности',
+        help_text='Пока задача ожидает, такая же не ставится повторно',
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Состояние',
+        help_text='Состояние задачи',
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попытки',
+        help_text='Сколько раз задача запускалась',
+    )
+    run_after = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Запуск после',
+        help_text='Не раньше этого времени (отсрочка повтора)',
+    )
+    locked_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Занята до',
+        help_text='После этого времени задачу зависшего воркера '
+                  'может взять другой',
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания',
+        help_text='Когда задача поставлена в очередь',
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Дата завершения',
+        help_text='Когда задача выполнена или окончательно провалена',
+    )
+    duration = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Длительность',
+        help_text='Время последнего запуска, секунд',
+    )
+    error = models.TextField(
+        blank=True,
+        default='',
+        verbose_name='Ошибка',
+        help_text='Трассировка последней ошибки',
+    )
+
+    class Meta:
+        db_table = 'tasks'
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=models.Q(status='pending'),
+                name='unique_pending_task_key'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['status', 'run_after'],
+                name='task_status_run_after_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
@@ -0,0 +1,323 @@
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from core.cache import recommendations
+from core.db_router import use_primary
+from recipes.counters import Favorited, ShoppingCart
+from recipes.models import Recipe, RecipeSimilarity
+
+recommendation_conf = settings.RECOMMENDATION_SETTINGS
+
+# Виды отметок: (связующая таблица, вес). Вектор рецепта - отметки
+# пользователей в избранном и в корзине, каждая часть со своим весом.
+MARK_KINDS: Tuple[Tuple[type, str], ...] = (
+    (Favorited, 'FAVORITE_WEIGHT'),
+    (ShoppingCart, 'CART_WEIGHT'),
+)
+
+Pairs = Tuple[np.ndarray, np.ndarray, np.ndarray]
+Counts = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+Norms = Tuple[np.ndarray, np.ndarray]
+
+
+def _marks(user_ids: Optional[List[int]] = None):
+    """Отметки пользователей, отсортированные по корзинам:
+    корзина - отметки одного пользователя одного вида.
+    От каждой корзины берётся не более MAX_BASKET новейших рецептов."""
+
+    baskets, recipes, weights = [], [], []
+    for kind, (through, weight_name) in enumerate(MARK_KINDS):
+        weight = recommendation_conf[weight_name]
+        if not weight:
+            continue
+        rows = through.objects.all()
+        if user_ids is not None:
+            rows = rows.filter(foodgramuser_id__in=user_ids)
+        data = np.fromiter(
+            (value for row in rows.values_list(
+                'foodgramuser_id', 'recipe_id'
+            ).iterator() for value in row),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        baskets.append(data[:, 0] * len(MARK_KINDS) + kind)
+        recipes.append(data[:, 1])
+        weights.append(np.full(len(data), weight))
+    if not baskets:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0)
+    baskets, recipes = np.concatenate(baskets), np.concatenate(recipes)
+    weights = np.concatenate(weights)
+    order = np.lexsort((-recipes, baskets))
+    baskets, recipes = baskets[order], recipes[order]
+    _, starts, sizes = np.unique(
+        baskets, return_index=True, return_counts=True
+    )
+    position = np.arange(len(baskets)) - np.repeat(starts, sizes)
+    kept = position < recommendation_conf['MAX_BASKET']
+    return baskets[kept], recipes[kept], weights[order][kept]
+
+
+def _chunks(sizes: np.ndarray) -> Iterable[Tuple[int, int]]:
+    """Границы групп корзин, в каждой не больше PAIR_CHUNK пар."""
+
+    cost = np.cumsum(sizes.astype(np.int64) ** 2)
+    start = 0
+    while start < len(sizes):
+        done = cost[start - 1] if start else 0
+        end = int(np.searchsorted(
+            cost, done + recommendation_conf['PAIR_CHUNK'], side='right'
+        ))
+        end = max(end, start + 1)
+        yield start, end
+        start = end
+
+
+def _sum_pairs(keys: np.ndarray, scores: np.ndarray, support: np.ndarray):
+    keys, inverse = np.unique(keys, return_inverse=True)
+    return (
+        keys,
+        np.bincount(inverse, weights=scores),
+        np.bincount(inverse, weights=support).astype(np.int64),
+    )
+
+
+def cooccurrence(baskets, recipes, weights,
+                 rows: Optional[np.ndarray] = None) -> Counts:
+    """Совместная встречаемость рецептов: (рецепт, сосед, сумма
+    произведений весов, число корзин). Пары строятся векторно
+    по корзинам, порциями; если указан rows, считаются только пары,
+    где первый рецепт из rows."""
+
+    # Пара кодируется одним числом recipe * base + neighbour.
+    base = int(recipes.max()) + 1 if len(recipes) else 1
+    _, starts, sizes = np.unique(
+        baskets, return_index=True, return_counts=True
+    )
+    parts = []
+    for first, last in _chunks(sizes):
+        group_starts, group_sizes = starts[first:last], sizes[first:last]
+        marks = np.arange(
+            group_starts[0], group_starts[-1] + group_sizes[-1]
+        )
+        per_mark = np.repeat(group_sizes, group_sizes)
+        left = np.repeat(marks, per_mark)
+        offsets = np.arange(len(left)) - np.repeat(
+            np.cumsum(per_mark) - per_mark, per_mark
+        )
+        right = np.repeat(np.repeat(group_starts, group_sizes), per_mark)
+        right += offsets
+        selected = left != right
+        if rows is not None:
+            selected &= np.isin(recipes[left], rows)
+        left, right = left[selected], right[selected]
+        parts.append(_sum_pairs(
+            recipes[left] * base + recipes[right],
+            weights[left] * weights[right],
+            np.ones(len(left)),
+        ))
+    if not parts:
+        empty = np.empty(0, np.int64)
+        return empty, empty, np.empty(0), empty
+    keys, scores, support = (np.concatenate(arrays) for arrays in zip(*parts))
+    keys, scores, support = _sum_pairs(keys, scores, support)
+    return keys // base, keys % base, scores, support
+
+
+def norms(recipes: np.ndarray, weights: np.ndarray) -> Norms:
+    """Нормы векторов рецептов по тем же отметкам (с ограничением
+    MAX_BASKET), что и скалярные произведения в cooccurrence:
+    (рецепты по возрастанию, нормы)."""
+
+    unique, inverse = np.unique(recipes, return_inverse=True)
+    return unique, np.sqrt(np.bincount(inverse, weights=weights ** 2))
+
+
+def _supported(left, right, scores, support) -> Pairs:
+    """Пары с поддержкой не ниже MIN_SUPPORT."""
+
+    kept = support >= recommendation_conf['MIN_SUPPORT']
+    return left[kept], right[kept], scores[kept]
+
+
+def similarities(left, right, scores, recipe_norms: Norms) -> Pairs:
+    """Косинусное сходство пар."""
+
+    unique, values = recipe_norms
+    pair_norms = (
+        values[np.searchsorted(unique, left)]
+        * values[np.searchsorted(unique, right)]
+    )
+    scores = np.divide(
+        scores, pair_norms, out=np.zeros(len(scores)),
+        where=pair_norms > 0,
+    )
+    return left, right, np.minimum(scores, 1.0)
+
+
+def top_neighbours(left, right, scores) -> Pairs:
+    """NEIGHBOURS самых похожих соседей каждого рецепта."""
+
+    order = np.lexsort((right, -scores, left))
+    left, right, scores = left[order], right[order], scores[order]
+    _, starts, sizes = np.unique(left, return_index=True, return_counts=True)
+    position = np.arange(len(left)) - np.repeat(starts, sizes)
+    kept = position < recommendation_conf['NEIGHBOURS']
+    return left[kept], right[kept], scores[kept]
+
+
+def _store(left, right, scores, computed_at) -> int:
+    RecipeSimilarity.objects.bulk_create(
+        (
+            RecipeSimilarity(
+                recipe_id=recipe_id, neighbour_id=neighbour_id,
+                score=score, computed_at=computed_at,
+            )
+            for recipe_id, neighbour_id, score in zip(
+                left.tolist(), right.tolist(), scores.tolist()
+            )
+        ),
+        batch_size=recommendation_conf['BATCH_SIZE'],
+    )
+    return len(np.unique(left))
+
+
+def last_built_at():
+    return RecipeSimilarity.objects.aggregate(
+        built_at=Max('computed_at')
+    )['built_at']
+
+
+def build() -> int:
+    """Полный пересчёт соседей всех рецептов.
+    Возвращает число рецептов, у которых есть соседи."""
+
+    started = timezone.now()
+    baskets, recipes, weights = _marks()
+    pairs = _supported(*cooccurrence(baskets, recipes, weights))
+    left, right, scores = top_neighbours(
+        *similarities(*pairs, norms(recipes, weights))
+    )
+    with transaction.atomic():
+        RecipeSimilarity.objects.all().delete()
+        transaction.on_commit(recommendations.invalidate_all)
+        return _store(left, right, scores, started)
+
+
+def _marked_by(recipe_ids: np.ndarray) -> List[int]:
+    """Пользователи, отметившие хотя бы один из рецептов."""
+
+    user_ids = set()
+    for through, _ in MARK_KINDS:
+        user_ids.update(through.objects.filter(
+            recipe_id__in=recipe_ids.tolist()
+        ).values_list('foodgramuser_id', flat=True))
+    return list(user_ids)
+
+
+def update(since) -> int:
+    """Пересчёт после отметок, изменившихся с момента since.
+    Соседи изменившихся рецептов считаются заново по корзинам
+    пользователей, которые их отметили; у остальных рецептов
+    в списках соседей заменяются только сходства с изменившимися.
+    Рецепт, выпавший из чужого списка, освобождает место
+    до следующего полного пересчёта. Возвращает число
+    пересчитанных рецептов."""
+
+    started = timezone.now()
+    changed = np.fromiter(Recipe.objects.filter(
+        marks_changed_at__gte=since
+    ).values_list('pk', flat=True).iterator(), dtype=np.int64)
+    if not len(changed):
+        return 0
+    left, right, scores = _supported(*cooccurrence(
+        *_marks(_marked_by(changed)), rows=changed
+    ))
+    # Нормы соседей считаются по всем корзинам, где они есть,
+    # а не только по корзинам пользователей изменившихся рецептов.
+    _, recipes, weights = _marks(_marked_by(np.union1d(changed, right)))
+    left, right, scores = similarities(
+        left, right, scores, norms(recipes, weights)
+    )
+    affected = np.union1d(right, np.fromiter(
+        RecipeSimilarity.objects.filter(
+            neighbour_id__in=changed.tolist()
+        ).values_list('recipe_id', flat=True).iterator(),
+        dtype=np.int64,
+    ))
+    affected = np.setdiff1d(affected, changed)
+    kept = RecipeSimilarity.objects.filter(
+        recipe_id__in=affected.tolist()
+    ).exclude(neighbour_id__in=changed.tolist()).values_list(
+        'recipe_id', 'neighbour_id', 'score'
+    )
+    kept = np.array(list(kept), dtype=float).reshape(-1, 3)
+    reverse = np.isin(right, affected)
+    left, right, scores = top_neighbours(
+        np.concatenate((left, right[reverse], kept[:, 0].astype(np.int64))),
+        np.concatenate((right, left[reverse], kept[:, 1].astype(np.int64))),
+        np.concatenate((scores, scores[reverse], kept[:, 2])),
+    )
+    recomputed = np.union1d(changed, affected).tolist()
+    with transaction.atomic():
+        RecipeSimilarity.objects.filter(recipe_id__in=recomputed).delete()
+        _store(left, right, scores, started)
+        transaction.on_commit(recommendations.invalidate_all)
+    return len(recomputed)
+
+
+def similar(recipe_id: int) -> List[int]:
+    """Соседи рецепта из рассчитанной таблицы, по убыванию сходства."""
+
+    return list(RecipeSimilarity.objects.filter(
+        recipe_id=recipe_id
+    ).order_by('-score', 'neighbour_id').values_list(
+        'neighbour_id', flat=True
+    ))
+
+
+def _seeds(user_id: int) -> List[int]:
+    seeds = set()
+    for through, _ in MARK_KINDS:
+        seeds.update(through.objects.filter(
+            foodgramuser_id=user_id
+        ).order_by('-id').values_list(
+            'recipe_id', flat=True
+        )[:recommendation_conf['MAX_SEEDS']])
+    return list(seeds)
+
+
+def _recommend(user_id: int) -> List[int]:
+    seeds = _seeds(user_id)
+    size = recommendation_conf['RECOMMENDED_SIZE']
+    recipe_ids = list(RecipeSimilarity.objects.filter(
+        recipe_id__in=seeds
+    ).exclude(neighbour_id__in=seeds).values('neighbour_id').annotate(
+        rank=Sum('score')
+    ).order_by('-rank', '-neighbour_id').values_list(
+        'neighbour_id', flat=True
+    )[:size])
+    if len(recipe_ids) < size:
+        recipe_ids += Recipe.objects.exclude(
+            pk__in=[*seeds, *recipe_ids]
+        ).order_by('-favorites_count', '-pub_date', '-id').values_list(
+            'pk', flat=True
+        )[:size - len(recipe_ids)]
+    return recipe_ids
+
+
+def recommended(user) -> List[int]:
+    """Рекомендации пользователю: соседи рецептов из его избранного
+    и корзины по сумме сходств, дополненные популярными рецептами.
+    Список хранится в кеше до изменения отметок пользователя
+    или пересчёта модели. Список для кеша читается с основной базы."""
+
+    def fill() -> List[int]:
+        with use_primary():
+            return _recommend(user.pk)
+
+    return recommendations.get_or_set(user.pk, fill)
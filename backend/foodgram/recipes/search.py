@@ -0,0 +1,259 @@
+import math
+import re
+import threading
+import time
+
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity,
+)
+from django.db import connections
+from django.db.models import F, Func, TextField, Value
+
+from recipes.models import Recipe, RecipeIngredient
+
+search_conf = settings.RECIPE_SEARCH_SETTINGS
+
+PREFIX_END: str = chr(0x10FFFF)
+TOKEN_RE = re.compile(r'\w+')
+
+# Веса частей документа: название, тэги и ингридиенты, описание.
+# Совпадают с весами A, B, C ранжирования PostgreSQL по умолчанию.
+PART_WEIGHTS: Tuple[Tuple[str, float], ...] = (
+    ('A', 1.0), ('B', 0.4), ('C', 0.2),
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        token for token in TOKEN_RE.findall(text.lower())
+        if len(token) >= search_conf['MIN_TOKEN_LENGTH']
+    ]
+
+
+def _clean(text: Optional[str]) -> str:
+    return ' '.join((text or '').split())
+
+
+def build_documents(recipe_ids: Iterable[int]) -> Dict[int, str]:
+    """Документы для поиска: название, названия тэгов и ингридиентов,
+    описание - по одной строке на каждую часть."""
+
+    recipe_ids = list(recipe_ids)
+    keywords = defaultdict(list)
+    tags = Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'tag__name')
+    ingredients = RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'ingredient__name')
+    for recipe_id, name in (*tags, *ingredients):
+        keywords[recipe_id].append(name)
+    return {
+        pk: '\n'.join((
+            _clean(name), _clean(' '.join(keywords[pk])), _clean(text)
+        ))
+        for pk, name, text in Recipe.objects.filter(
+            pk__in=recipe_ids
+        ).values_list('pk', 'name', 'text')
+    }
+
+
+def uses_postgres() -> bool:
+    backend = search_conf['BACKEND']
+    if backend != 'auto':
+        return backend == 'postgres'
+    return connections['default'].vendor == 'postgresql'
+
+
+def _document_part(number: int) -> Func:
+    return Func(
+        F('search_document'), Value('\n'), Value(number),
+        function='SPLIT_PART', output_field=TextField(),
+    )
+
+
+def search_vector() -> SearchVector:
+    """tsvector из сохранённого документа с весами частей."""
+
+    vector = None
+    for number, (weight, _) in enumerate(PART_WEIGHTS, start=1):
+        part = SearchVector(
+            _document_part(number), weight=weight,
+            config=search_conf['CONFIG'],
+        )
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def update_documents(recipe_ids: Iterable[int]) -> None:
+    """Пересчитывает документы рецептов (и tsvector на PostgreSQL)
+    и обновляет индекс в памяти процесса."""
+
+    documents = build_documents(recipe_ids)
+    recipes = [
+        Recipe(pk=pk, search_document=document)
+        for pk, document in documents.items()
+    ]
+    Recipe.objects.bulk_update(
+        recipes, ('search_document',), batch_size=search_conf['BATCH_SIZE']
+    )
+    if uses_postgres():
+        Recipe.objects.filter(pk__in=list(documents)).update(
+            search_vector=search_vector()
+        )
+    else:
+        recipe_index.update(documents)
+
+
+def remove_documents(recipe_ids: Iterable[int]) -> None:
+    if not uses_postgres():
+        recipe_index.remove(recipe_ids)
+
+
+class RecipeSearchIndex:
+    """Инвертированный индекс рецептов в памяти процесса
+    для SQLite и разработки. Слова документа хранятся
+    в отсортированном массиве, поэтому каждое слово запроса
+    ищется как префикс (грубая замена стемминга). Ранг - сумма
+    по словам запроса весов частей документа, умноженных на idf.
+    Изменения рецептов этого процесса вносятся сразу,
+    изменения других процессов - при перестроении по INDEX_TTL."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._documents: Dict[int, List[str]] = {}
+        self._terms: List[str] = []
+        self._built_at: Optional[float] = None
+
+    def _add(self, pk: int, document: str) -> None:
+        terms = {}
+        parts = document.split('\n')
+        for (_, weight), part in zip(PART_WEIGHTS, parts):
+            for token in tokenize(part):
+                terms[token] = max(terms.get(token, 0), weight)
+        for token, weight in terms.items():
+            self._postings.setdefault(token, {})[pk] = weight
+        self._documents[pk] = list(terms)
+
+    def _discard(self, pk: int) -> None:
+        for token in self._documents.pop(pk, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(pk, None)
+            if not postings:
+                del self._postings[token]
+
+    def _build(self) -> None:
+        self._postings, self._documents = {}, {}
+        for pk, document in Recipe.objects.values_list(
+            'pk', 'search_document'
+        ).iterator():
+            self._add(pk, document)
+        self._terms = sorted(self._postings)
+        self._built_at = time.monotonic()
+
+    def _ensure_fresh(self) -> None:
+        built_at = self._built_at
+        if (built_at is not None
+                and time.monotonic() - built_at < search_conf['INDEX_TTL']):
+            return
+        with self._lock:
+            if self._built_at is built_at:
+                self._build()
+
+    def update(self, documents: Dict[int, str]) -> None:
+        with self._lock:
+            if self._built_at is None:
+                return
+            for pk, document in documents.items():
+                self._discard(pk)
+                self._add(pk, document)
+            self._terms = sorted(self._postings)
+
+    def remove(self, recipe_ids: Iterable[int]) -> None:
+        with self._lock:
+            if self._built_at is None:
+                return
+            for pk in recipe_ids:
+                self._discard(pk)
+            self._terms = sorted(self._postings)
+
+    def invalidate(self) -> None:
+        self._built_at = None
+
+    def _matches(self, token: str, terms: List[str]) -> Dict[int, float]:
+        """Лучший вес каждого рецепта среди слов с префиксом token,
+        умноженный на idf."""
+
+        start = bisect_left(terms, token)
+        end = bisect_left(terms, token + PREFIX_END, start)
+        matches: Dict[int, float] = {}
+        for term in terms[start:end]:
+            for pk, weight in self._postings.get(term, {}).items():
+                matches[pk] = max(matches.get(pk, 0), weight)
+        idf = math.log(1 + len(self._documents) / (1 + len(matches)))
+        return {pk: weight * idf for pk, weight in matches.items()}
+
+    def search(self, query: str) -> List[int]:
+        """id рецептов, содержащих все слова запроса, по убыванию ранга."""
+
+        self._ensure_fresh()
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self._lock:
+            terms = self._terms
+            ranks: Optional[Dict[int, float]] = None
+            for token in tokens:
+                matches = self._matches(token, terms)
+                if ranks is None:
+                    ranks = matches
+                    continue
+                ranks = {
+                    pk: rank + matches[pk]
+                    for pk, rank in ranks.items() if pk in matches
+                }
+        return sorted(ranks, key=lambda pk: (-ranks[pk], -pk))
+
+
+recipe_index = RecipeSearchIndex()
+
+
+def _search_postgres(queryset, query: str):
+    config = search_conf['CONFIG']
+    search_query = SearchQuery(query, search_type='websearch', config=config)
+    ranked = queryset.filter(search_vector=search_query).annotate(
+        rank=SearchRank(F('search_vector'), search_query)
+    ).order_by('-rank', '-pub_date', '-id')
+    if ranked.exists():
+        return ranked.values_list('id', flat=True)
+    return queryset.annotate(
+        similarity=TrigramWordSimilarity(query, 'search_document')
+    ).filter(
+        search_document__trigram_word_similar=query,
+        similarity__gte=search_conf['TRIGRAM_THRESHOLD'],
+    ).order_by('-similarity', '-pub_date', '-id').values_list(
+        'id', flat=True
+    )
+
+
+def search(queryset, query: str):
+    """id рецептов из queryset, подходящих под запрос,
+    в порядке релевантности. На PostgreSQL - полнотекстовый поиск
+    по индексу GIN, если он ничего не нашёл - поиск по триграммам
+    (опечатки, части слов); на других СУБД - индекс в памяти."""
+
+    if uses_postgres():
+        return _search_postgres(queryset, query)
+    ranked = recipe_index.search(query)
+    if not ranked:
+        return []
+    allowed = set(queryset.filter(pk__in=ranked).values_list('pk', flat=True))
+    return [pk for pk in ranked if pk in allowed]
@@ -0,0 +1,108 @@
+import csv
+
+from datetime import datetime
+from html import escape
+from typing import Iterable, Iterator, List, Tuple
+
+from django.core.cache import cache
+from django.db.models import Sum
+
+from core.db_router import use_primary
+from recipes.models import RecipeIngredient
+
+CACHE_KEY: str = 'shopping_cart:{}'
+CACHE_TIMEOUT: int = 60 * 60 * 24
+
+HEADER: str = 'Список покупок для {} на {}'
+CSV_HEADER: tuple = ('Ингредиент', 'Количество', 'Единица измерения',)
+
+ShoppingList = List[Tuple[str, str, int]]
+
+
+def _cache_key(user_id) -> str:
+    return CACHE_KEY.format(user_id)
+
+
+def get_shopping_list(user) -> ShoppingList:
+    """Возвращает сводный список покупок пользователя.
+    Количество ингридиентов суммируется по всем рецептам корзины,
+    результат кешируется до изменения корзины пользователя."""
+
+    key = _cache_key(user.pk)
+    shopping_list = cache.get(key)
+    if shopping_list is None:
+        with use_primary():
+            shopping_list = list(
+                RecipeIngredient.objects.filter(
+                    recipe__in_shopping_cart=user
+                ).values_list(
+                    'ingredient__name', 'ingredient__measurement_unit'
+                ).annotate(
+                    amount=Sum('amount')
+                ).order_by('ingredient__name')
+            )
+        cache.set(key, shopping_list, CACHE_TIMEOUT)
+    return shopping_list
+
+
+def invalidate_shopping_list(*user_ids) -> None:
+    """Сбрасывает кеш списка покупок указанных пользователей."""
+
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+class _Echo:
+    """Псевдо-буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def _header(user) -> str:
+    return HEADER.format(
+        user.username, datetime.today().strftime('%d/%m/%y')
+    )
+
+
+def _export_txt(user, items: Iterable) -> Iterator[str]:
+    yield f'{_header(user)}\n'
+    for name, unit, amount in items:
+        yield f'\n{name}: {amount} {unit}'
+
+
+def _export_csv(user, items: Iterable) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for name, unit, amount in items:
+        yield writer.writerow((name, amount, unit))
+
+
+def _export_html(user, items: Iterable) -> Iterator[str]:
+    title = escape(_header(user))
+    yield ('<!DOCTYPE html>\n<html lang="ru">\n<head>\n'
+           '<meta charset="utf-8">\n'
+           f'<title>{title}</title>\n'
+           '<style>@media print {@page {margin: 1.5cm;}} '
+           'body {font-family: sans-serif;} '
+           'li {padding: 0.2em 0;}</style>\n'
+           '</head>\n<body onload="window.print()">\n'
+           f'<h1>{title}</h1>\n<ul>\n')
+    for name, unit, amount in items:
+        yield (f'<li>&#9744; {escape(name)}: '
+               f'{amount} {escape(unit)}</li>\n')
+    yield '</ul>\n</body>\n</html>\n'
+
+
+EXPORT_FORMATS: dict = {
+    'txt': ('text/plain; charset=utf-8', _export_txt),
+    'csv': ('text/csv; charset=utf-8', _export_csv),
+    'html': ('text/html; charset=utf-8', _export_html),
+}
+
+
+def export(user, file_format: str) -> Tuple[str, Iterator[str]]:
+    """Возвращает тип содержимого и итератор по строкам файла
+    со списком покупок пользователя в указанном формате."""
+
+    content_type, exporter = EXPORT_FORMATS[file_format]
+    return content_type, exporter(user, get_shopping_list(user))
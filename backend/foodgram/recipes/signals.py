@@ -0,0 +1,216 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core import tasks
+from core.cache import (
+    recipe_cards, recommendations, reference_lists, user_flag_key, user_flags,
+)
+from recipes import counters, documents, feed, images, search
+from recipes.ingredient_index import ingredient_index
+from recipes.ingredient_match import ingredient_match_index
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.shopping_cart import invalidate_shopping_list
+from users.models import Follow
+
+Favorited = counters.Favorited
+ShoppingCart = counters.ShoppingCart
+
+USER_FLAG_NAMES: dict = {
+    Favorited: 'favorites',
+    ShoppingCart: 'cart',
+}
+
+MARK_COUNTERS: dict = {
+    Favorited: counters.FAVORITES,
+    ShoppingCart: counters.CARTS,
+}
+
+
+def _marked_by(through, recipe_id):
+    return list(through.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('foodgramuser_id', flat=True))
+
+
+def _update_mark_counter(sender, instance, action, reverse, pk_set,
+                         user_ids):
+    """Счётчик рецепта меняется на число добавленных или
+    удалённых отметок, со стороны рецепта или пользователя;
+    время изменения отметок нужно для пересчёта рекомендаций."""
+
+    delta = 1 if action == 'post_add' else -1
+    changed_at = timezone.now()
+    if not reverse:
+        counters.change(
+            MARK_COUNTERS[sender], [instance.pk], delta * len(user_ids),
+            marks_changed_at=changed_at,
+        )
+        return
+    if action == 'pre_clear':
+        pk_set = sender.objects.filter(
+            foodgramuser=instance
+        ).values_list('recipe_id', flat=True)
+    counters.change(
+        MARK_COUNTERS[sender], pk_set, delta, marks_changed_at=changed_at
+    )
+
+
+def _invalidate_on_commit(*user_ids):
+    transaction.on_commit(lambda: invalidate_shopping_list(*user_ids))
+
+
+@receiver(m2m_changed, sender=Favorited)
+@receiver(m2m_changed, sender=ShoppingCart)
+def recipe_marks_changed(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        user_ids = [instance.pk]
+    elif action == 'pre_clear':
+        user_ids = _marked_by(sender, instance.pk)
+    else:
+        user_ids = list(pk_set)
+    _update_mark_counter(sender, instance, action, reverse, pk_set, user_ids)
+    flag_keys = [
+        user_flag_key(user_id, USER_FLAG_NAMES[sender])
+        for user_id in user_ids
+    ]
+    transaction.on_commit(lambda: user_flags.delete_many(flag_keys))
+    transaction.on_commit(lambda: recommendations.delete_many(user_ids))
+    if sender is ShoppingCart:
+        _invalidate_on_commit(*user_ids)
+
+
+def _drop_card_on_commit(recipe_id):
+    transaction.on_commit(lambda: recipe_cards.delete_many([recipe_id]))
+
+
+_reindex = threading.local()
+
+
+def _flush_reindex():
+    recipe_ids, _reindex.ids = getattr(_reindex, 'ids', set()), set()
+    if recipe_ids:
+        search.update_documents(recipe_ids)
+        ingredient_match_index.update(recipe_ids)
+        documents.refresh(recipe_ids)
+
+
+def _reindex_on_commit(*recipe_ids):
+    """Поисковые документы, индекс подбора по ингридиентам
+    и карточки рецептов обновляются один раз на транзакцию,
+    после сохранения тэгов и ингридиентов рецепта."""
+
+    if not hasattr(_reindex, 'ids'):
+        _reindex.ids = set()
+    _reindex.ids.update(recipe_ids)
+    transaction.on_commit(_flush_reindex)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_changed(sender, instance, created, **kwargs):
+    """Ингридиенты рецепта сохраняются в той же транзакции,
+    что и сам рецепт, поэтому кеш сбрасывается после её фиксации."""
+
+    if instance.image and not images.variants_ready(instance):
+        images.schedule(instance.image.name)
+    _reindex_on_commit(instance.pk)
+    if created:
+        counters.change(counters.RECIPES, [instance.author_id], 1)
+        tasks.enqueue('feed.fan_out', key=f'fan_out:{instance.pk}',
+                      recipe_id=instance.pk)
+        return
+    transaction.on_commit(lambda: invalidate_shopping_list(
+        *_marked_by(ShoppingCart, instance.pk)
+    ))
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    _drop_card_on_commit(instance.pk)
+    _invalidate_on_commit(*_marked_by(ShoppingCart, instance.pk))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_removed(sender, instance, **kwargs):
+    counters.change(counters.RECIPES, [instance.author_id], -1)
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: search.remove_documents([recipe_id]))
+    _reindex_on_commit(recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        _reindex_on_commit(instance.pk)
+    elif pk_set:
+        _reindex_on_commit(*pk_set)
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    _reindex_on_commit(instance.recipe_id)
+
+
+def _touch_recipes(**lookup):
+    """Обновляет дату изменения рецептов, в которых участвует
+    изменённый тэг или ингридиент, чтобы сменилась версия карточек,
+    и их поисковые документы."""
+
+    recipe_ids = list(
+        Recipe.objects.filter(**lookup).values_list('pk', flat=True)
+    )
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        updated_at=timezone.now()
+    )
+    _reindex_on_commit(*recipe_ids)
+
+
+def _invalidate_reference_on_commit(cards: bool):
+    transaction.on_commit(reference_lists.invalidate_all)
+    if cards:
+        transaction.on_commit(recipe_cards.invalidate_all)
+
+
+@receiver((post_save, pre_delete), sender=Tag)
+def tag_changed(sender, instance, created=False, **kwargs):
+    _invalidate_reference_on_commit(cards=not created)
+    if not created:
+        _touch_recipes(tags=instance)
+
+
+@receiver((post_save, pre_delete), sender=Ingredient)
+def ingredient_changed(sender, instance, created=False, **kwargs):
+    _invalidate_reference_on_commit(cards=not created)
+    if not created:
+        _touch_recipes(ingredients=instance)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_index_changed(sender, **kwargs):
+    transaction.on_commit(ingredient_index.invalidate)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        tasks.enqueue(
+            'feed.backfill',
+            key=f'backfill:{instance.follower_id}:{instance.author_id}',
+            user_id=instance.follower_id, author_id=instance.author_id,
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    feed.remove_author(instance.follower_id, instance.author_id)
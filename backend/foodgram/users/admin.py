@@ -11,7 +11,7 @@ User = get_user_model()
 class UserAdmin(admin.ModelAdmin):
     list_display = (
         'pk', 'username', 'email', 'first_name', 'last_name',
-        'date_joined', 'updated_at',
+        'date_joined', 'updated_at', 'recipes_count', 'followers_count',
     )
     search_fields = ('username', 'email', 'first_name', 'last_name',)
     list_filter = ('date_joined', 'first_name', 'last_name',)
@@ -57,6 +57,20 @@ class FoodGramUser(AbstractUser):
         help_text='Дата последнего обновления профиля пользователя',
     )
 
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецептов',
+        help_text='Число рецептов автора',
+    )
+
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчиков',
+        help_text='Число подписчиков автора',
+    )
+
     class Meta:
         ordering = ('username',)
         verbose_name = 'Пользователь'
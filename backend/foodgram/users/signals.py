@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.cache import user_flag_key, user_flags
+from recipes import counters, documents
+from recipes.models import Recipe
+from users.models import Follow
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Follow)
+def follow_changed(sender, instance, created=None, **kwargs):
+    key = user_flag_key(instance.follower_id, 'followings')
+    transaction.on_commit(lambda: user_flags.delete_many([key]))
+    if created is None:
+        counters.change(counters.FOLLOWERS, [instance.author_id], -1)
+    elif created:
+        counters.change(counters.FOLLOWERS, [instance.author_id], 1)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    """Профиль автора входит в карточки его рецептов."""
+
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    recipe_ids = list(
+        Recipe.objects.filter(author=instance).values_list('pk', flat=True)
+    )
+    transaction.on_commit(lambda: documents.refresh(recipe_ids))
+
+
+@receiver(pre_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    """Отметки удаляемого пользователя удаляются каскадом,
+    без сигналов m2m_changed, поэтому счётчики рецептов
+    уменьшаются заранее."""
+
+    for counter in (counters.FAVORITES, counters.CARTS):
+        counters.change(counter, counter.source.objects.filter(
+            foodgramuser=instance
+        ).values_list('recipe_id', flat=True), -1,
+            marks_changed_at=timezone.now())